@@ -2,27 +2,244 @@
  * 寵物健康計算器 (Pet Health Calculator)
  * 用途：計算年齡換算、體況評估、營養需求等
  * 版本：1.0.0
- * 最後更新：2026-01-30
+ * 最後更新：2026-10-17
  */
 
+// 完整指引的快取：存在 localStorage，依 data/health-guidelines.version.json 的版本以 delta 更新
+const GUIDELINES_CACHE_KEY = 'yichai_health_guidelines';
+// 物種 bundle 的快取（key 後面接物種），依 data/health/manifest.json 各物種的 version / deltas 更新
+const SPECIES_CACHE_PREFIX = 'yichai_health_species_';
+
+/**
+ * 套用 JSON Patch（RFC 6902；scripts/guidelines_delta.py 產生的 add / remove / replace / move / test）
+ * @param {Object} doc - 原文件（不會被修改）
+ * @param {Array} ops - patch
+ * @returns {Object} 新文件；test 不符時丟出錯誤
+ */
+function applyJsonPatch(doc, ops) {
+    const result = JSON.parse(JSON.stringify(doc));
+    const resolve = (pointer) => {
+        const tokens = pointer.split('/').slice(1).map(t => t.replace(/~1/g, '/').replace(/~0/g, '~'));
+        let parent = result;
+        for (const token of tokens.slice(0, -1)) {
+            parent = parent[Array.isArray(parent) ? Number(token) : token];
+        }
+        let key = tokens[tokens.length - 1];
+        if (Array.isArray(parent)) key = key === '-' ? parent.length : Number(key);
+        return [parent, key];
+    };
+    for (const op of ops) {
+        let [parent, key] = op.op === 'move' ? resolve(op.from) : resolve(op.path);
+        if (op.op === 'test') {
+            if (JSON.stringify(parent[key]) !== JSON.stringify(op.value)) {
+                throw new Error(`JSON Patch test 失敗: ${op.path}`);
+            }
+            continue;
+        }
+        let value = op.value;
+        if (op.op === 'remove' || op.op === 'move') {
+            value = Array.isArray(parent) ? parent.splice(key, 1)[0] : parent[key];
+            if (!Array.isArray(parent)) delete parent[key];
+            if (op.op === 'remove') continue;
+            [parent, key] = resolve(op.path);
+        } else if (op.op !== 'add' && op.op !== 'replace') {
+            throw new Error(`不支援的 JSON Patch op: ${op.op}`);
+        }
+        if (Array.isArray(parent) && op.op !== 'replace') {
+            parent.splice(key, 0, value);
+        } else {
+            parent[key] = value;
+        }
+    }
+    return result;
+}
+
 class PetHealthCalculator {
     constructor() {
         this.guidelines = null;
+        this.manifest = null;
         this._loadPromise = null;
+        this._speciesPromises = {};
+        this._guidelinesVersion = null;
         this.loadGuidelines();
     }
 
     /**
-     * 載入健康指引資料庫（重複呼叫會回傳同一 Promise，避免 race condition）
+     * 根據當前網頁路徑自動判斷資料夾位置，回傳資料檔的完整網址
+     */
+    _dataUrl(path) {
+        const isGitHubPages = window.location.hostname.includes('github.io');
+        const basePath = isGitHubPages ? window.location.pathname.substring(0, window.location.pathname.lastIndexOf('/') + 1) : '';
+        return `${window.location.origin}${basePath}${path}`;
+    }
+
+    /**
+     * 載入健康指引（重複呼叫會回傳同一 Promise，避免 race condition）
+     * 優先只載入 data/health/manifest.json（物種清單與 common 選項），
+     * 物種資料由 loadSpecies() 依需要下載；manifest 不存在時改載完整 health-guidelines.json
      */
     async loadGuidelines() {
         if (this._loadPromise) return this._loadPromise;
         this._loadPromise = (async () => {
+            try {
+                const response = await fetch(this._dataUrl('data/health/manifest.json'), { cache: 'no-cache' });
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                this.manifest = await response.json();
+                this.guidelines = {
+                    common: this.manifest.common || {},
+                    metadata: this.manifest.metadata || {},
+                    sexHealthFocus: {},
+                    neuteredFocus: {}
+                };
+                console.log('✅ 健康指引 manifest 載入成功');
+            } catch (error) {
+                console.warn('manifest 載入失敗，改為載入完整指引資料:', error);
+                this.manifest = null;
+                await this._loadFullGuidelines();
+            }
+        })();
+        return this._loadPromise;
+    }
+
+    /**
+     * 確保某物種的資料已載入（只下載該物種的 bundle；bundle 檔名含內容雜湊，可長期快取）
+     * localStorage 有同版本的 bundle 時不下載；版本較舊時先嘗試以 delta 更新
+     * @param {string} petType - 物種 key（cat / dog / rabbit / hamster）
+     */
+    async loadSpecies(petType) {
+        await this.loadGuidelines();
+        if (!this.guidelines || this.guidelines[petType] || !this.manifest) return this.guidelines;
+        if (!this._speciesPromises[petType]) {
+            this._speciesPromises[petType] = (async () => {
+                const entry = (this.manifest.species || []).find(s => s.key === petType);
+                try {
+                    if (!entry) {
+                        throw new Error(`manifest 中沒有物種: ${petType}`);
+                    }
+                    const bundle = await this._loadSpeciesBundle(petType, entry);
+                    this.guidelines[petType] = bundle.guidelines;
+                    if (bundle.sexHealthFocus) this.guidelines.sexHealthFocus[petType] = bundle.sexHealthFocus;
+                    if (bundle.neuteredFocus) this.guidelines.neuteredFocus[petType] = bundle.neuteredFocus;
+                } catch (error) {
+                    console.warn(`載入 ${petType} 資料包失敗，改為載入完整指引資料:`, error);
+                    this.manifest = null;
+                    await this._loadFullGuidelines();
+                }
+            })();
+        }
+        await this._speciesPromises[petType];
+        return this.guidelines;
+    }
+
+    /**
+     * 取得物種 bundle：快取同版本時直接使用，否則以 delta 更新快取，都不行時下載完整 bundle
+     */
+    async _loadSpeciesBundle(petType, entry) {
+        const cacheKey = `${SPECIES_CACHE_PREFIX}${petType}`;
+        const cached = entry.version ? this._readCache(cacheKey) : null;
+        if (cached && cached.data && cached.version === entry.version) return cached.data;
+        if (cached && cached.data) {
+            try {
+                const patched = await this._applyDeltaChain(cached, entry.deltas, entry.bytes);
+                if (patched) {
+                    this._writeCache(cacheKey, entry.version, patched);
+                    console.log(`✅ ${petType} 資料包以 delta 更新至 ${entry.version}`);
+                    return patched;
+                }
+            } catch (error) {
+                console.warn(`${petType} 資料包 delta 更新失敗，改為下載完整資料包:`, error);
+            }
+        }
+        const response = await fetch(this._dataUrl(`data/${entry.file}`));
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const bundle = await response.json();
+        if (entry.version) this._writeCache(cacheKey, entry.version, bundle);
+        return bundle;
+    }
+
+    _readCache(key) {
+        try {
+            const raw = localStorage.getItem(key);
+            return raw ? JSON.parse(raw) : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    _writeCache(key, version, data) {
+        try {
+            localStorage.setItem(key, JSON.stringify({ version, data }));
+        } catch (e) {
+            console.warn('無法寫入指引快取', e);
+        }
+    }
+
+    /**
+     * 從快取的版本沿著 delta 串接更新到最新版
+     * @param {Object} cached - { version, data }
+     * @param {Array} deltas - [{ from, to, file, bytes }]，最後一筆的 to 為最新版
+     * @param {number} fullBytes - 完整檔大小；delta 合計不小於它時改下載完整檔
+     * @returns {Object|null} 更新後的資料；找不到串接起點時回傳 null
+     */
+    async _applyDeltaChain(cached, deltas, fullBytes) {
+        const links = deltas || [];
+        const start = links.findIndex(d => d.from === cached.version);
+        if (start < 0) return null;
+        const chain = links.slice(start);
+        const total = chain.reduce((sum, d) => sum + (d.bytes || 0), 0);
+        if (fullBytes && total >= fullBytes) return null;
+
+        let doc = cached.data;
+        for (const link of chain) {
+            const resp = await fetch(this._dataUrl(`data/${link.file}`));
+            if (!resp.ok) {
+                throw new Error(`HTTP error! status: ${resp.status}`);
+            }
+            doc = applyJsonPatch(doc, await resp.json());
+        }
+        return doc;
+    }
+
+    /**
+     * 由快取的上一版指引套用 delta 更新到目前版本（data/health-guidelines.version.json）
+     * @returns {Object|null} 目前版本的指引；沒有快取、找不到可用的 delta 或 delta 合計比完整檔大時回傳 null
+     */
+    async _loadGuidelinesFromDeltas() {
+        const response = await fetch(this._dataUrl('data/health-guidelines.version.json'), { cache: 'no-cache' });
+        if (!response.ok) return null;
+        const pointer = await response.json();
+        this._guidelinesVersion = pointer.version;
+        const cached = this._readCache(GUIDELINES_CACHE_KEY);
+        if (!cached || !cached.data) return null;
+        if (cached.version === pointer.version) return cached.data;
+
+        const doc = await this._applyDeltaChain(cached, pointer.deltas, pointer.bytes);
+        if (!doc) return null;
+        this._writeCache(GUIDELINES_CACHE_KEY, pointer.version, doc);
+        console.log(`✅ 健康指引以 delta 更新至 ${pointer.version}`);
+        return doc;
+    }
+
+    /**
+     * 載入完整的 health-guidelines.json（manifest / bundle 無法使用時的備援）
+     * 先嘗試以快取 + delta 更新，不行時才下載完整檔
+     */
+    async _loadFullGuidelines() {
+        try {
+            const patched = await this._loadGuidelinesFromDeltas();
+            if (patched) {
+                this.guidelines = patched;
+                return;
+            }
+        } catch (error) {
+            console.warn('delta 更新失敗，改為下載完整指引資料:', error);
+        }
         try {
-            // 根據當前網頁路徑自動判斷資料夾位置
-            const isGitHubPages = window.location.hostname.includes('github.io');
-            const basePath = isGitHubPages ? window.location.pathname.substring(0, window.location.pathname.lastIndexOf('/') + 1) : '';
-            const jsonUrl = `${window.location.origin}${basePath}data/health-guidelines.json`;
+            const jsonUrl = this._dataUrl('data/health-guidelines.json');
             
             console.log('正在從以下網址載入指引資料：', jsonUrl);
             const response = await fetch(jsonUrl);
@@ -32,6 +249,9 @@ class PetHealthCalculator {
             }
             
             this.guidelines = await response.json();
+            if (this._guidelinesVersion) {
+                this._writeCache(GUIDELINES_CACHE_KEY, this._guidelinesVersion, this.guidelines);
+            }
             console.log('✅ 健康指引資料載入成功');
         } catch (error) {
             console.error('❌ 載入健康指引失敗，嘗試使用備用路徑:', error);
@@ -62,10 +282,10 @@ class PetHealthCalculator {
 
                     // 若有載入任何物種，設定為 guidelines
                     if (Object.keys(assembled).length > 0) {
-                        // 試著載入 breeds_* JSON（若存在）並合併到對應 species
+                        // 試著載入 temp_breeds_* JSON（若存在）並合併到對應 species
                         for (const key of Object.keys(assembled)) {
                             try {
-                                const bresp = await fetch(`data/breeds_${key}.json`);
+                                const bresp = await fetch(`data/temp_breeds_${key}.json`);
                                 if (bresp.ok) {
                                     const breeds = await bresp.json();
                                     // 若後端是 list，嘗試保留為屬性；若已是 dict，直接替換
@@ -114,8 +334,6 @@ class PetHealthCalculator {
                 }
             }
         }
-        })();
-        return this._loadPromise;
     }
 
     /**
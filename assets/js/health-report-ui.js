@@ -6,6 +6,8 @@
 let selectedPetType = null;
 let currentStep = 1;
 let generatedReport = null;
+// 目前物種的運動量 / 體型（與倉鼠品種）選項渲染完成的 Promise，自動還原前等待
+let speciesOptionsReady = Promise.resolve();
 
 // 表單記憶：存在 localStorage，保留一天
 const STORAGE_KEY = 'yichai_health_report_form';
@@ -156,7 +158,7 @@ async function renderHamsterBreeds() {
     if (!container) return;
     const calc = window.healthCalculator;
     if (!calc) return;
-    await calc.loadGuidelines();
+    await calc.loadSpecies('hamster');
     const breeds = calc.guidelines && calc.guidelines.hamster && calc.guidelines.hamster.breeds;
     if (!breeds || typeof breeds !== 'object') {
         container.innerHTML = '<p class="text-sm text-gray-500 col-span-2">無法載入品種資料</p>';
@@ -196,9 +198,9 @@ async function renderActivityBodyOptions(petType) {
     if (!actContainer || !bodyContainer) return;
     const calc = window.healthCalculator;
     if (!calc) return;
-    await calc.loadGuidelines();
-    const guidelines = calc.guidelines || {};
     if (!type) return;
+    await calc.loadSpecies(type);
+    const guidelines = calc.guidelines || {};
     const sp = guidelines[type] || {};
     const common = guidelines.common || {};
 
@@ -260,7 +262,6 @@ function selectPetType(petType) {
     const hamsterSection = document.getElementById('hamsterBreedSection');
     if (hamsterSection) {
         hamsterSection.style.display = petType === 'hamster' ? 'block' : 'none';
-        if (petType === 'hamster') renderHamsterBreeds();
     }
 
     // 顯示/隱藏結紮選項（倉鼠一般不結紮，不顯示）
@@ -281,8 +282,11 @@ function selectPetType(petType) {
         }
     }
     
-    // 依物種動態更新運動量/體型選項
-    renderActivityBodyOptions(petType);
+    // 依物種動態更新運動量/體型選項（倉鼠另有品種選項，由 health-guidelines.json 動態產生）
+    speciesOptionsReady = Promise.all([
+        renderActivityBodyOptions(petType),
+        petType === 'hamster' ? renderHamsterBreeds() : null
+    ]);
 
     // 自動跳轉到步驟 2
     setTimeout(() => goToStep2(), 500);
@@ -291,30 +295,35 @@ function selectPetType(petType) {
 /**
  * 前往步驟 2
  */
-function goToStep2() {
+async function goToStep2() {
     document.getElementById('step1').style.display = 'none';
     document.getElementById('step2').style.display = 'block';
     updateStepIndicator(2);
     currentStep = 2;
-    updateHealthConditionsList();
-    setTimeout(updateHealthConditionsList, 800);
     window.scrollTo({ top: 0, behavior: 'smooth' });
-    // 一天內有儲存記錄時自動還原（同寵物種類才套用，延遲以等健康狀況選項載入）
-    setTimeout(function autoRestore() {
-        const stored = getStoredFormData();
-        if (stored && stored.petType === selectedPetType) applyRestoredFormData(stored);
-    }, 1000);
+    const petType = selectedPetType;
+    await Promise.all([updateHealthConditionsList(), speciesOptionsReady]);
+    // 一天內有儲存記錄時自動還原（同寵物種類才套用；等物種資料與各選項都渲染完成後再還原）
+    if (petType !== selectedPetType) return;
+    const stored = getStoredFormData();
+    if (stored && stored.petType === petType) applyRestoredFormData(stored);
 }
 
 /**
- * 依物種載入健康狀況選項（常見疾病，可多選）
+ * 依物種載入健康狀況選項（常見疾病，可多選）；等該物種的資料包下載完成後才渲染
  */
-function updateHealthConditionsList() {
+async function updateHealthConditionsList() {
     const container = document.getElementById('healthConditionsList');
     if (!container) return;
     const calc = window.healthCalculator;
-    const guidelines = calc && calc.guidelines;
     const petType = selectedPetType;
+    if (calc && petType) {
+        container.innerHTML = '<p class="text-sm text-gray-500 col-span-2">載入中…</p>';
+        await calc.loadSpecies(petType);
+        // 下載期間又換了物種時，交給新物種的呼叫渲染
+        if (petType !== selectedPetType) return;
+    }
+    const guidelines = calc && calc.guidelines;
     if (!petType || !guidelines || !guidelines[petType]) {
         container.innerHTML = '<p class="text-sm text-gray-500 col-span-2">此物種暫無勾選項目</p>';
         return;
@@ -589,12 +598,12 @@ document.addEventListener('DOMContentLoaded', () => {
                     throw new Error('健康計算器模組尚未載入完成。');
                 }
 
-                // 等待計算器載入資料 (如果還沒載完)
-                if (!calculator.guidelines) {
-                    await calculator.loadGuidelines();
+                // 等待計算器載入資料 (如果還沒載完)：manifest + 所選物種的資料包
+                if (!calculator.guidelines || !calculator.guidelines[formData.petType]) {
+                    await calculator.loadSpecies(formData.petType);
                 }
 
-                if (!calculator.guidelines) {
+                if (!calculator.guidelines || !calculator.guidelines[formData.petType]) {
                     throw new Error('無法從伺服器取得健康指引資料。');
                 }
                 
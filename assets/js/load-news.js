@@ -4,6 +4,9 @@
 (function() {
   const getBasePath = () => 'news/news.json';
   const NEWS_JSON_PATH = getBasePath();
+  // scripts/build_news.py 產生的 manifest；分頁索引與內文 HTML 檔名含內容雜湊，可長期快取
+  const NEWS_MANIFEST_PATH = 'news/dist/manifest.json';
+  const MARKED_SRC = 'https://cdn.jsdelivr.net/npm/marked/marked.min.js';
   const TYPE_LABELS = {
     'operation': '營運公告',
     'event': '活動公告',
@@ -20,12 +23,7 @@
     if (!container) return;
 
     try {
-      const fetchUrl = `${NEWS_JSON_PATH}?v=${new Date().getTime()}`;
-      const response = await fetch(fetchUrl);
-      if (!response.ok) throw new Error(`HTTP 錯誤! 狀態碼: ${response.status}`);
-      
-      allNewsItems = await response.json();
-      sortNews(allNewsItems);
+      allNewsItems = await loadNewsItems();
       renderNews(allNewsItems);
 
       if (filterBar) {
@@ -59,6 +57,66 @@
     }
   }
 
+  /**
+   * 優先讀取建置產出的 manifest 與分頁索引（已排序、含預先轉換的 HTML）；
+   * manifest 或分頁載入失敗時才退回 news.json，由前端排序。
+   * news/dist 是否與 news.json 一致在建置 / 部署時檢查（scripts/build_news.py --check）
+   */
+  async function loadNewsItems() {
+    try {
+      const res = await fetch(NEWS_MANIFEST_PATH, { cache: 'no-cache' });
+      if (!res.ok) throw new Error(`HTTP 錯誤! 狀態碼: ${res.status}`);
+      const manifest = await res.json();
+      const pages = await Promise.all(manifest.pages.map(async page => {
+        const pageRes = await fetch(`news/${page.file}`);
+        if (!pageRes.ok) throw new Error(`HTTP 錯誤! 狀態碼: ${pageRes.status}`);
+        return (await pageRes.json()).items;
+      }));
+      return pages.flat();
+    } catch (error) {
+      console.warn('最新消息索引載入失敗，改用 news.json:', error);
+    }
+
+    const response = await fetch(`${NEWS_JSON_PATH}?v=${new Date().getTime()}`);
+    if (!response.ok) throw new Error(`HTTP 錯誤! 狀態碼: ${response.status}`);
+    const items = await response.json();
+    sortNews(items);
+    return items;
+  }
+
+  // 只有在沒有預先轉換的 HTML 時才載入 marked
+  let markedPromise = null;
+  function loadMarked() {
+    if (window.marked) return Promise.resolve(window.marked);
+    if (!markedPromise) {
+      markedPromise = new Promise(resolve => {
+        const script = document.createElement('script');
+        script.src = MARKED_SRC;
+        script.onload = () => resolve(window.marked || null);
+        script.onerror = () => resolve(null);
+        document.head.appendChild(script);
+      });
+    }
+    return markedPromise;
+  }
+
+  async function loadPostHtml(contentPath, htmlPath) {
+    if (htmlPath) {
+      const res = await fetch(`news/${htmlPath}`);
+      if (res.ok) {
+        const html = await res.text();
+        return contentPath.endsWith('.md') ? `<div class="post-content markdown-body">${html}</div>` : html;
+      }
+    }
+    const res = await fetch(`news/${contentPath}`);
+    if (!res.ok) throw new Error('無法載入公告內容');
+    const text = await res.text();
+    if (!contentPath.endsWith('.md')) return text;
+    const marked = await loadMarked();
+    if (marked) return `<div class="post-content markdown-body">${marked.parse(text)}</div>`;
+    return `<div class="post-content"><pre class="whitespace-pre-wrap">${text}</pre></div>`;
+  }
+
   /**
    * 核心邏輯：處理三種展開模式
    * 優先權：1. 超連結 Hash > 2. 預設第一則 > 3. JSON 參數
@@ -150,7 +208,7 @@
             </div>
           </div>
           <div class="mt-6 flex justify-center">
-            <button class="toggle-btn flex items-center gap-2 text-[#DF7621] font-bold hover:text-[#C65D1A] transition-colors" data-id="${item.id}" data-content="${item.content}">
+            <button class="toggle-btn flex items-center gap-2 text-[#DF7621] font-bold hover:text-[#C65D1A] transition-colors" data-id="${item.id}" data-content="${item.content}" data-html="${item.html || ''}">
               <span>展開閱讀全文</span>
               <i class="fas fa-chevron-down transition-transform duration-300"></i>
             </button>
@@ -166,6 +224,7 @@
       btn.addEventListener('click', async function() {
         const id = this.dataset.id;
         const contentPath = this.dataset.content;
+        const htmlPath = this.dataset.html;
         const contentDiv = document.getElementById(`content-${id}`);
         const icon = this.querySelector('i');
         const textSpan = this.querySelector('span');
@@ -194,18 +253,7 @@
 
           if (!contentDiv.dataset.loaded) {
             try {
-              const res = await fetch(`news/${contentPath}`);
-              if (!res.ok) throw new Error('無法載入公告內容');
-              const text = await res.text();
-              if (contentPath.endsWith('.md')) {
-                if (window.marked) {
-                  contentDiv.innerHTML = `<div class="post-content markdown-body">${marked.parse(text)}</div>`;
-                } else {
-                  contentDiv.innerHTML = `<div class="post-content"><pre class="whitespace-pre-wrap">${text}</pre></div>`;
-                }
-              } else {
-                contentDiv.innerHTML = text;
-              }
+              contentDiv.innerHTML = await loadPostHtml(contentPath, htmlPath);
               contentDiv.dataset.loaded = "true";
             } catch (error) {
               contentDiv.innerHTML = `<div class="text-red-500 py-4">內容載入失敗</div>`;
@@ -85,7 +85,10 @@
 
   async function loadStoreData() {
     try {
-      const response = await fetch('mapping/PetStores_BranchInfo.json', { cache: 'no-store' });
+      // 優先使用統一門市目錄（store_catalog.py 產生），不存在時退回分店 JSON
+      // no-cache：每次向伺服器確認，沒變時以 304 沿用瀏覽器快取，不重新下載整份目錄
+      let response = await fetch('mapping/store_catalog.json', { cache: 'no-cache' });
+      if (!response.ok) response = await fetch('mapping/PetStores_BranchInfo.json', { cache: 'no-cache' });
       const data = await response.json();
       const now = new Date();
       return (data.stores || []).map(store => {
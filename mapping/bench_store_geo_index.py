@@ -0,0 +1,86 @@
+"""
+StoreGeoIndex 與逐一計算距離（store-locator.js 的作法）的查詢速度比較。
+
+用法：
+  python mapping/bench_store_geo_index.py
+  python mapping/bench_store_geo_index.py --sizes 100 1000 5000 --queries 2000 --k 3 --radius 5
+
+行為：
+  - 以固定亂數種子在台灣本島範圍內產生門市座標（約七成集中在北中南三個都會區）
+  - 每個規模都先確認索引查詢結果與逐一計算完全相同，再量測平均每次查詢時間
+  - 另以實際的 PetStores_BranchInfo.json（若存在）量測一次
+"""
+import argparse
+import os
+import random
+import time
+
+from store_geo_index import StoreGeoIndex, linear_nearest, linear_within
+
+# 台灣本島大致範圍與都會區中心（緯度, 經度）
+BBOX = (21.9, 25.3, 120.0, 122.0)
+METRO_CENTERS = [(25.05, 121.53), (24.15, 120.67), (22.63, 120.30)]
+
+
+def make_points(n, rng):
+    points = []
+    for _ in range(n):
+        if rng.random() < 0.7:
+            lat, lng = rng.choice(METRO_CENTERS)
+            points.append((lat + rng.gauss(0, 0.08), lng + rng.gauss(0, 0.08)))
+        else:
+            points.append((rng.uniform(BBOX[0], BBOX[1]), rng.uniform(BBOX[2], BBOX[3])))
+    return points
+
+
+def make_queries(n, rng):
+    return make_points(n, rng)
+
+
+def time_per_query(fn, queries):
+    start = time.perf_counter()
+    for lat, lng in queries:
+        fn(lat, lng)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def bench(label, points, queries, k, radius):
+    index = StoreGeoIndex(points)
+    for lat, lng in queries:
+        if index.nearest(lat, lng, k) != linear_nearest(points, lat, lng, k):
+            raise SystemExit(f"[ERROR] {label}: nearest({lat}, {lng}) 與逐一計算結果不同")
+        if index.within(lat, lng, radius) != linear_within(points, lat, lng, radius):
+            raise SystemExit(f"[ERROR] {label}: within({lat}, {lng}) 與逐一計算結果不同")
+    rows = [
+        (f'nearest k={k}', time_per_query(lambda a, b: index.nearest(a, b, k), queries),
+         time_per_query(lambda a, b: linear_nearest(points, a, b, k), queries)),
+        (f'within {radius:g} km', time_per_query(lambda a, b: index.within(a, b, radius), queries),
+         time_per_query(lambda a, b: linear_within(points, a, b, radius), queries)),
+    ]
+    for name, t_index, t_linear in rows:
+        print(f"{label:>10}  {name:<14} index {t_index * 1e6:9.1f} us   linear {t_linear * 1e6:9.1f} us"
+              f"   x{t_linear / t_index:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='門市空間索引查詢基準')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 100, 500, 2000], help='門市數量')
+    parser.add_argument('--queries', type=int, default=1000, help='每個規模的查詢次數')
+    parser.add_argument('--k', type=int, default=3, help='k 近鄰的 k')
+    parser.add_argument('--radius', type=float, default=5.0, help='半徑查詢的半徑（km）')
+    parser.add_argument('--seed', type=int, default=20260101, help='亂數種子')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = make_queries(args.queries, rng)
+
+    json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PetStores_BranchInfo.json')
+    if os.path.exists(json_path):
+        real = StoreGeoIndex.from_json(json_path)
+        bench('actual', real.points, queries, args.k, args.radius)
+    for n in args.sizes:
+        bench(f'n={n}', make_points(n, rng), queries, args.k, args.radius)
+
+
+if __name__ == '__main__':
+    main()
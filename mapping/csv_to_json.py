@@ -1,32 +1,21 @@
 import csv
 import json
 import os
+import sys
 from datetime import datetime
 
-def csv_to_json(csv_file_path, json_file_path):
+from store_facet_index import StoreFacetIndex
+from store_geo_index import StoreGeoIndex
+from store_hours_index import StoreHoursIndex, default_holiday_csv, read_holiday_csv
+
+# 分階段量測與 scripts/ 下的腳本共用同一個模組
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from instrumentation import NULL_METRICS, add_arguments, instrumented  # noqa: E402
+
+def read_stores(csv_file_path):
+    """讀取門市 CSV，回傳 (stores, store_index)。"""
     stores = []
     store_index = {}
-    
-    # 預設 metadata
-    metadata = {
-        "title": "宜加寵物生活館分店資訊",
-        "description": "包含各分店的地址、聯絡方式及GPS座標資訊",
-        "version": "1.1",
-        "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "total_stores": 0
-    }
-    
-    # 讀取原本的 JSON 以獲取 metadata (如果存在且格式正確)
-    if os.path.exists(json_file_path):
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                old_data = json.load(f)
-                if 'metadata' in old_data:
-                    metadata = old_data['metadata']
-                    metadata['created_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    metadata['version'] = "1.1" # 更新版本號
-        except:
-            pass
 
     # 讀取 CSV
     with open(csv_file_path, mode='r', encoding='utf-8-sig') as csvfile:
@@ -92,30 +81,99 @@ def csv_to_json(csv_file_path, json_file_path):
                 "city": row['City (CH)'],
                 "district": row['District (CH)']
             }
+    return stores, store_index
+
+
+def load_holiday(holiday_csv_path, holiday_year=None):
+    """讀取春節等特定日期營運時間 CSV；檔案不存在時回傳 {}。
+
+    年份取自日期標頭（"2026年2月16日"），標頭沒有年份時用 holiday_year；都沒有的日期不套用。
+    """
+    if not holiday_csv_path or not os.path.exists(holiday_csv_path):
+        return {}
+    return read_holiday_csv(holiday_csv_path, holiday_year)
+
+
+def build_indexes(stores, holiday):
+    """門市清單的查詢索引（寫入 JSON 的頂層欄位）。"""
+    return {
+        # geo_index：座標網格索引，供最近門市 / 半徑查詢，見 store_geo_index.py
+        "geo_index": StoreGeoIndex.from_stores(stores).to_dict(),
+        # hours_index：週內分鐘 + 例外日期的營業 bitmask，見 store_hours_index.py
+        "hours_index": StoreHoursIndex.from_stores(stores, holiday).to_dict(),
+        # facet_index：縣市 / 行政區 / 美容 / 公休日 / 特定日期狀態的 bitset，見 store_facet_index.py
+        "facet_index": StoreFacetIndex.from_stores(stores, holiday).to_dict(),
+    }
+
+
+def csv_to_json(csv_file_path, json_file_path, holiday_csv_path=None, holiday_year=None, metrics=NULL_METRICS):
+    """holiday_csv_path：春節等特定日期營運時間 CSV（年份取自日期標頭，沒有時用 holiday_year，見 load_holiday）。
+    metrics：instrumentation.Metrics，記錄 read_stores / load_holiday / build_indexes / write_json 各階段。"""
+    # 預設 metadata
+    metadata = {
+        "title": "宜加寵物生活館分店資訊",
+        "description": "包含各分店的地址、聯絡方式及GPS座標資訊",
+        "version": "1.1",
+        "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total_stores": 0
+    }
+    
+    # 讀取原本的 JSON 以獲取 metadata (如果存在且格式正確)
+    if os.path.exists(json_file_path):
+        try:
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                old_data = json.load(f)
+                if 'metadata' in old_data:
+                    metadata = old_data['metadata']
+                    metadata['created_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    metadata['version'] = "1.1" # 更新版本號
+        except:
+            pass
+
+    with metrics.stage('read_stores') as timing:
+        stores, store_index = read_stores(csv_file_path)
+        timing.add_rows(len(stores))
+    with metrics.stage('load_holiday') as timing:
+        # 特定日期的例外時段只編進 hours_index / facet_index，不寫入各門市：
+        # CSV 沒有年份，逐店列出的日期會在每張門市卡片上整年顯示，隔年也會被誤用
+        holiday = load_holiday(holiday_csv_path, holiday_year)
+        timing.add_rows(len(holiday))
 
     # 更新總店數
     metadata["total_stores"] = len(stores)
 
     # 封裝成最終 JSON 格式
-    final_data = {
-        "metadata": metadata,
-        "store_index": store_index,
-        "stores": stores
-    }
+    with metrics.stage('build_indexes'):
+        final_data = {
+            "metadata": metadata,
+            "store_index": store_index,
+            **build_indexes(stores, holiday),
+            "stores": stores
+        }
 
     # 寫入 JSON 檔案
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+    with metrics.stage('write_json') as timing:
+        with open(json_file_path, 'w', encoding='utf-8') as f:
+            json.dump(final_data, f, ensure_ascii=False, indent=2)
+        timing.add_file(json_file_path)
     
     print(f"轉換完成！已更新 {json_file_path}")
     print(f"總計處理 {len(stores)} 間門市。")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='門市 CSV 轉 PetStores_BranchInfo.json')
+    parser.add_argument('--holiday-year', type=int, help='春節營運時間 CSV 日期標頭未標年份時使用的年份')
+    add_arguments(parser)
+    args = parser.parse_args()
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     csv_path = os.path.join(script_dir, "PetStores_BranchInfo.csv")
     json_path = os.path.join(script_dir, "PetStores_BranchInfo.json")
+    holiday_path = default_holiday_csv(os.path.dirname(script_dir))
     
     if os.path.exists(csv_path):
-        csv_to_json(csv_path, json_path)
+        with instrumented(args, 'csv_to_json') as metrics:
+            csv_to_json(csv_path, json_path, holiday_path, args.holiday_year, metrics)
     else:
         print(f"找不到 CSV 檔案：{csv_path}")
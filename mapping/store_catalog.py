@@ -0,0 +1,228 @@
+"""
+門市資料的統一目錄編譯器：一次讀入三個來源，依分店名稱 hash join 後輸出單一 store_catalog.json。
+
+來源：
+  - PetStores_BranchInfo.csv：座標、電話、Google 連結、營業時間（以 CSV 為準）
+  - branches.yaml：品牌全名、郵遞區號、營業時間、每週公休日（summary.weekly_closed_on）
+  - brand_logos.json：合作品牌清單（與分店無關，放在目錄層級的 brands）
+  - docs/各門市春節營運時間.csv（若存在）：特定日期營運時間
+
+對齊方式：
+  - 以分店簡稱為 key（去掉結尾「店」與括號註記，如「明志(泰山)店」→「明志」）
+  - 名稱對不上時再以正規化地址（去郵遞區號、「台灣」，臺→台，段號數字轉中文）對齊，
+    並在報告中列出（matched_by_address）
+  - 兩個來源各建一次 dict，整體為線性時間
+  - 只存在於 YAML 的分店沒有城市、電話與座標，不列入目錄，只在報告中列出（yaml_only）
+
+報告會列出只存在於單一來源的分店、營業時間 / 公休日 / 地址 / 美容服務不一致等項目。
+
+用法：
+  python mapping/store_catalog.py
+  python mapping/store_catalog.py --strict   # 有不一致時回傳非 0
+"""
+import json
+import os
+import re
+
+import yaml
+
+from csv_to_json import build_indexes, load_holiday, read_stores
+from instrumentation import add_arguments, instrumented  # csv_to_json 已把 scripts/ 加入 sys.path
+from store_hours_index import WEEKDAYS, default_holiday_csv, normalize_store_name, parse_hours
+
+CATALOG_VERSION = 1
+_PAREN_PATTERN = re.compile(r'[（(][^）)]*[）)]')
+_SECTION_DIGITS = {'1': '一', '2': '二', '3': '三', '4': '四', '5': '五', '6': '六', '7': '七', '8': '八', '9': '九'}
+_ADDRESS_REPLACEMENTS = (('臺', '台'), ('台灣', ''), ('New Taipei City', '新北市'), ('Taipei City', '台北市'))
+
+
+def branch_key(name):
+    """分店對齊用的 key：去掉括號註記與結尾「店」。"""
+    return normalize_store_name(_PAREN_PATTERN.sub('', name or ''))
+
+
+def normalize_address(address):
+    text = re.sub(r'\s+', '', address or '')
+    for old, new in _ADDRESS_REPLACEMENTS:
+        text = text.replace(old.replace(' ', ''), new)
+    text = re.sub(r'^\d{3,6}', '', text)
+    return re.sub(r'(\d)段', lambda m: _SECTION_DIGITS.get(m.group(1), m.group(1)) + '段', text)
+
+
+def normalize_hours(text):
+    """比較用的營業時間：解析後的時段（無法解析時保留去空白的原文）。"""
+    parsed = parse_hours(text)
+    return parsed if parsed is not None else (text or '').strip()
+
+
+def load_branches(yaml_file_path):
+    with open(yaml_file_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    return data.get('yichai_pet_branches') or []
+
+
+def load_brands(logos_file_path):
+    with open(logos_file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _issue(kind, branch, **detail):
+    return {'type': kind, 'branch': branch, **detail}
+
+
+def _compare(key, store, branch, issues):
+    """比對同一分店在 CSV 與 YAML 的欄位，不一致時加入 issues。"""
+    yaml_hours = branch.get('business_hours') or {}
+    for day in WEEKDAYS:
+        csv_text = store['business_hours'].get(day, '')
+        yaml_text = yaml_hours.get(day, '')
+        if day in yaml_hours and normalize_hours(csv_text) != normalize_hours(yaml_text):
+            issues.append(_issue('hours_mismatch', key, day=day, csv=csv_text, yaml=yaml_text))
+
+    summary = branch.get('summary') or {}
+    if 'weekly_closed_on' in summary:
+        closed = summary.get('weekly_closed_on')
+        yaml_closed = sorted(d.strip().lower() for d in re.split(r'[,/、]', closed) if d.strip()) if closed else []
+        csv_closed = [d for d in WEEKDAYS if parse_hours(store['business_hours'].get(d, '')) == []]
+        if sorted(csv_closed) != yaml_closed:
+            issues.append(_issue('closed_day_mismatch', key, csv=csv_closed, yaml=yaml_closed))
+
+    yaml_grooming = (summary.get('services') or {}).get('grooming')
+    if yaml_grooming is not None and bool(yaml_grooming) != store['services']['grooming']:
+        issues.append(_issue('grooming_mismatch', key, csv=store['services']['grooming'], yaml=bool(yaml_grooming)))
+
+    yaml_address = (branch.get('location') or {}).get('address', '')
+    if yaml_address and normalize_address(yaml_address) != normalize_address(store['location']['full_address']):
+        issues.append(_issue('address_mismatch', key, csv=store['location']['full_address'], yaml=yaml_address))
+
+
+def _merge(store, branch):
+    """將 YAML 的補充欄位併入 CSV 產生的門市資料（CSV 已有的欄位不覆寫）。"""
+    location = branch.get('location') or {}
+    summary = branch.get('summary') or {}
+    store['brand_full_name'] = branch.get('brand_full_name', '')
+    store['location']['postal_code'] = location.get('postal_code', '')
+    store['weekly_closed_on'] = summary.get('weekly_closed_on')
+    store['sources'] = ['csv', 'yaml']
+
+
+def join_sources(stores, branches):
+    """依分店 key（其次為正規化地址）hash join CSV 門市與 YAML 分店。回傳 (合併後的 stores, issues)。"""
+    issues = []
+    by_key, by_address = {}, {}
+    for branch in branches:
+        key = branch_key(branch.get('branch_name'))
+        if key in by_key:
+            issues.append(_issue('duplicate_branch', key, source='yaml'))
+            continue
+        by_key[key] = branch
+        address = normalize_address((branch.get('location') or {}).get('address', ''))
+        if address:
+            by_address.setdefault(address, key)
+
+    matched = set()
+    seen = set()
+    for store in stores:
+        key = branch_key(store['store_name'])
+        if key in seen:
+            issues.append(_issue('duplicate_branch', key, source='csv'))
+        seen.add(key)
+        store['sources'] = ['csv']
+        yaml_key = key if key in by_key and key not in matched else None
+        if yaml_key is None:
+            candidate = by_address.get(normalize_address(store['location']['full_address']))
+            if candidate is not None and candidate not in matched:
+                yaml_key = candidate
+                issues.append(_issue('matched_by_address', key, yaml=by_key[candidate].get('branch_name')))
+        if yaml_key is None:
+            issues.append(_issue('csv_only', key))
+            continue
+        matched.add(yaml_key)
+        branch = by_key[yaml_key]
+        _compare(key, store, branch, issues)
+        _merge(store, branch)
+
+    for key in by_key:
+        if key not in matched:
+            # 沒有城市、電話與座標，放進目錄會出現在地圖的 (0, 0)；請補進 CSV
+            issues.append(_issue('yaml_only', key))
+    return stores, issues
+
+
+def compile_catalog(csv_file_path, yaml_file_path, logos_file_path, holiday_csv_path=None, holiday_year=None):
+    """編譯統一門市目錄，回傳 (catalog, issues)。輸出不含時間戳，來源相同時內容也相同。"""
+    stores, _ = read_stores(csv_file_path)
+    branches = load_branches(yaml_file_path) if yaml_file_path and os.path.exists(yaml_file_path) else []
+    brands = load_brands(logos_file_path) if logos_file_path and os.path.exists(logos_file_path) else []
+    stores, issues = join_sources(stores, branches)
+
+    holiday = load_holiday(holiday_csv_path, holiday_year)
+
+    store_index = {}
+    for i, store in enumerate(stores):
+        store_index[store['store_name']] = {
+            'index': i,
+            'city': store['location'].get('city', {}).get('chinese', ''),
+            'district': store['location'].get('district', {}).get('chinese', ''),
+        }
+
+    catalog = {
+        'metadata': {
+            'title': '宜加寵物生活館門市目錄',
+            'description': '整合分店 CSV、branches.yaml 與合作品牌清單的門市資料',
+            'version': CATALOG_VERSION,
+            'total_stores': len(stores),
+            'total_brands': len(brands),
+            'sources': [os.path.basename(p) for p in (csv_file_path, yaml_file_path, logos_file_path, holiday_csv_path)
+                        if p and os.path.exists(p)],
+        },
+        'brands': brands,
+        'store_index': store_index,
+        **build_indexes(stores, holiday),
+        'stores': stores,
+    }
+    return catalog, issues
+
+
+def format_issue(issue):
+    detail = ', '.join(f'{k}={v}' for k, v in issue.items() if k not in ('type', 'branch'))
+    return f"[{issue['type']}] {issue['branch']}" + (f" ({detail})" if detail else '')
+
+
+# 只是資訊性的項目（不影響 --strict 結果）
+INFO_ISSUES = {'csv_only', 'matched_by_address'}
+
+
+def main():
+    import argparse
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='編譯統一門市目錄 store_catalog.json')
+    parser.add_argument('--csv', default=os.path.join(script_dir, 'PetStores_BranchInfo.csv'))
+    parser.add_argument('--yaml', default=os.path.join(script_dir, 'branches.yaml'))
+    parser.add_argument('--logos', default=os.path.join(script_dir, 'brand_logos.json'))
+    parser.add_argument('--holiday-csv', default=default_holiday_csv(os.path.dirname(script_dir)))
+    parser.add_argument('--holiday-year', type=int, help='春節營運時間 CSV 日期標頭未標年份時使用的年份')
+    parser.add_argument('--out', default=os.path.join(script_dir, 'store_catalog.json'))
+    parser.add_argument('--strict', action='store_true', help='來源間有不一致時回傳 1')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrumented(args, 'store_catalog') as metrics:
+        with metrics.stage('compile_catalog') as timing:
+            catalog, issues = compile_catalog(args.csv, args.yaml, args.logos, args.holiday_csv, args.holiday_year)
+            timing.add_rows(catalog['metadata']['total_stores'])
+        with metrics.stage('write_json') as timing:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(catalog, f, ensure_ascii=False, indent=2)
+            timing.add_file(args.out)
+
+    print(f"已輸出 {args.out}：{catalog['metadata']['total_stores']} 間門市、{catalog['metadata']['total_brands']} 個品牌")
+    for issue in issues:
+        print(format_issue(issue))
+    problems = [i for i in issues if i['type'] not in INFO_ISSUES]
+    print(f"不一致 {len(problems)} 項，資訊 {len(issues) - len(problems)} 項")
+    return 1 if args.strict and problems else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+"""
+門市清單的分面（facet）bitset 索引。
+
+csv_to_json.py 會把索引寫入 PetStores_BranchInfo.json 的 facet_index：
+  - facets：分面名稱 → 值 → bitset（bit i = stores 陣列第 i 間門市，十六進位字串）
+      city            縣市（中文），如 "台北市"
+      district        縣市 + 行政區，如 "台北市內湖區"（避免不同縣市的同名行政區混在一起）
+      grooming        是否提供美容服務："true" / "false"
+      closed_weekday  整天公休的星期：monday … sunday
+      holiday         特定日期的營運狀態："YYYY-MM-DD:closed" / ":special"（特別時段）/ ":regular"
+  - store_count：門市數
+
+Python 查詢引擎（同一分面內為 OR、不同分面之間為 AND）：
+  index = StoreFacetIndex.from_json('mapping/PetStores_BranchInfo.json')
+  index.query({'city': ['台北市', '新北市'], 'grooming': ['true']})
+  index.query({'city': ['新北市']}, exclude={'closed_weekday': ['monday']})
+  # 與 StoreHoursIndex.open_mask() 組合即可得到「現在營業中」的篩選
+  index.query({'grooming': ['true']}, base_mask=hours.open_mask(now))
+"""
+import json
+
+from store_hours_index import WEEKDAYS, mask_members, normalize_store_name, parse_hours
+
+FACETS = ('city', 'district', 'grooming', 'closed_weekday', 'holiday')
+
+
+def holiday_status(hours_text):
+    intervals = parse_hours(hours_text)
+    if intervals is None:
+        return 'regular'
+    return 'closed' if not intervals else 'special'
+
+
+class StoreFacetIndex:
+    """各分面值對應的門市 bitset；查詢只需數次位元 OR / AND。"""
+
+    def __init__(self, store_count, facets=None):
+        self.store_count = store_count
+        self.all_mask = (1 << store_count) - 1
+        self.facets = {name: dict(values) for name, values in (facets or {}).items()}
+
+    def add(self, facet, value, store):
+        values = self.facets.setdefault(facet, {})
+        values[value] = values.get(value, 0) | (1 << store)
+
+    @classmethod
+    def from_stores(cls, stores, holiday_overrides=None):
+        """由 stores（PetStores_BranchInfo.json 的結構）與 read_holiday_csv 的結果建立。"""
+        index = cls(len(stores))
+        for i, store in enumerate(stores):
+            location = store.get('location', {})
+            city = location.get('city', {}).get('chinese', '')
+            district = location.get('district', {}).get('chinese', '')
+            if city:
+                index.add('city', city, i)
+            if district:
+                index.add('district', city + district, i)
+            index.add('grooming', 'true' if store.get('services', {}).get('grooming') else 'false', i)
+            hours = store.get('business_hours') or {}
+            for day in WEEKDAYS:
+                if parse_hours(hours.get(day, '')) == []:
+                    index.add('closed_weekday', day, i)
+            entries = (holiday_overrides or {}).get(normalize_store_name(store.get('store_name')), [])
+            for entry in entries:
+                index.add('holiday', f"{entry['date'].isoformat()}:{holiday_status(entry['hours'])}", i)
+        return index
+
+    @classmethod
+    def from_dict(cls, data):
+        facets = {
+            name: {value: int(bits, 16) for value, bits in values.items()}
+            for name, values in data.get('facets', {}).items()
+        }
+        return cls(data.get('store_count', 0), facets)
+
+    @classmethod
+    def from_json(cls, json_file_path):
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls.from_dict(data.get('facet_index', {}))
+
+    def to_dict(self):
+        """輸出為 JSON 結構（分面依 FACETS 順序、值依字典序，內容相同時輸出也相同）。"""
+        ordered = [name for name in FACETS if name in self.facets]
+        ordered += sorted(name for name in self.facets if name not in FACETS)
+        return {
+            'store_count': self.store_count,
+            'facets': {
+                name: {value: format(bits, 'x') for value, bits in sorted(self.facets[name].items())}
+                for name in ordered
+            },
+        }
+
+    def values(self, facet):
+        """某分面的所有值與門市數，如 {'台北市': 1, '新北市': 15}。"""
+        return {value: bin(bits).count('1') for value, bits in self.facets.get(facet, {}).items()}
+
+    def facet_mask(self, facet, values):
+        """分面內任一值符合的門市（OR）；未知的分面或值視為沒有門市。"""
+        table = self.facets.get(facet, {})
+        mask = 0
+        for value in values:
+            mask |= table.get(value, 0)
+        return mask
+
+    def mask(self, filters=None, exclude=None, base_mask=None):
+        """filters / exclude 為 {分面: [值, ...]}；回傳符合條件的 bitset。"""
+        mask = self.all_mask if base_mask is None else base_mask & self.all_mask
+        for facet, values in (filters or {}).items():
+            if not mask:
+                break
+            mask &= self.facet_mask(facet, values)
+        for facet, values in (exclude or {}).items():
+            mask &= ~self.facet_mask(facet, values)
+        return mask
+
+    def query(self, filters=None, exclude=None, base_mask=None):
+        """符合條件的門市索引（遞增排序）。"""
+        return mask_members(self.mask(filters, exclude, base_mask))
+
+    def count(self, filters=None, exclude=None, base_mask=None):
+        return bin(self.mask(filters, exclude, base_mask)).count('1')
@@ -0,0 +1,171 @@
+"""
+門市座標的網格（grid bucket）空間索引。
+
+csv_to_json.py 會把索引寫入 PetStores_BranchInfo.json 的 geo_index：
+  - cell_deg：網格邊長（經緯度，度）
+  - cells："列:欄" → 該格內門市在 stores 陣列中的索引
+    （列 = floor(緯度 / cell_deg)，欄 = floor(經度 / cell_deg)）
+沒有座標（0, 0）的門市不列入索引。
+
+Python 查詢 API：
+  index = StoreGeoIndex.from_json('mapping/PetStores_BranchInfo.json')
+  index.nearest(25.04, 121.56, k=3)      # [(距離 km, 門市索引), ...] 由近到遠
+  index.within(25.04, 121.56, 5.0)       # 半徑 5 km 內的門市，由近到遠
+
+距離為 haversine 大圓距離（地球半徑 6371 km，與 store-locator.js 的 calculateDistance 相同）。
+"""
+import json
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = EARTH_RADIUS_KM * math.pi / 180
+# 預設網格邊長約 5.5 km：都會區一格數間門市，查詢通常只需看中心格與一圈鄰格
+DEFAULT_CELL_DEG = 0.05
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """兩點間的大圓距離（公里）。"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = (math.sin(d_lat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def has_coordinates(lat, lng):
+    return bool(lat) and bool(lng)
+
+
+def store_coordinates(store):
+    coords = store.get('location', {}).get('coordinates', {})
+    return coords.get('latitude') or 0.0, coords.get('longitude') or 0.0
+
+
+class StoreGeoIndex:
+    """以固定大小網格分桶的門市座標索引，支援 k 近鄰與半徑查詢。"""
+
+    def __init__(self, points, cell_deg=DEFAULT_CELL_DEG):
+        """points 為 [(緯度, 經度), ...]，索引位置即門市在 stores 陣列中的位置。"""
+        self.cell_deg = cell_deg
+        self.points = [(float(lat), float(lng)) for lat, lng in points]
+        self.cells = {}
+        for i, (lat, lng) in enumerate(self.points):
+            if has_coordinates(lat, lng):
+                self.cells.setdefault(self.cell_of(lat, lng), []).append(i)
+        if self.cells:
+            rows = [r for r, _ in self.cells]
+            cols = [c for _, c in self.cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+            self._max_abs_lat = max(abs(lat) for lat, lng in self.points if has_coordinates(lat, lng))
+        else:
+            self._bounds = None
+            self._max_abs_lat = 0.0
+
+    @classmethod
+    def from_stores(cls, stores, cell_deg=DEFAULT_CELL_DEG):
+        return cls([store_coordinates(s) for s in stores], cell_deg)
+
+    @classmethod
+    def from_json(cls, json_file_path):
+        """由 PetStores_BranchInfo.json 建立；檔案中有 geo_index 時沿用其網格大小。"""
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        cell_deg = data.get('geo_index', {}).get('cell_deg', DEFAULT_CELL_DEG)
+        return cls.from_stores(data.get('stores', []), cell_deg)
+
+    def cell_of(self, lat, lng):
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def to_dict(self):
+        """輸出為 JSON 結構（格子依列、欄排序，內容相同時輸出也相同）。"""
+        return {
+            'type': 'grid',
+            'cell_deg': self.cell_deg,
+            'cells': {f'{r}:{c}': self.cells[(r, c)] for r, c in sorted(self.cells)},
+        }
+
+    def _distances(self, lat, lng, indices):
+        points = self.points
+        return [(haversine_km(lat, lng, points[i][0], points[i][1]), i) for i in indices]
+
+    def _ring(self, row, col, r):
+        """與 (row, col) 的切比雪夫距離恰為 r、且落在索引範圍內的格子中，有門市的那些。"""
+        cells = self.cells
+        min_row, max_row, min_col, max_col = self._bounds
+        c0, c1 = max(col - r, min_col), min(col + r, max_col)
+        out = []
+        for rr in sorted({row - r, row + r}):
+            if min_row <= rr <= max_row:
+                for cc in range(c0, c1 + 1):
+                    bucket = cells.get((rr, cc))
+                    if bucket:
+                        out.append(bucket)
+        if r > 0:
+            r0, r1 = max(row - r + 1, min_row), min(row + r - 1, max_row)
+            for cc in (col - r, col + r):
+                if min_col <= cc <= max_col:
+                    for rr in range(r0, r1 + 1):
+                        bucket = cells.get((rr, cc))
+                        if bucket:
+                            out.append(bucket)
+        return out
+
+    def _covers_all(self, row, col, r):
+        min_row, max_row, min_col, max_col = self._bounds
+        return row - r <= min_row and row + r >= max_row and col - r <= min_col and col + r >= max_col
+
+    def nearest(self, lat, lng, k=1):
+        """距離 (lat, lng) 最近的 k 間門市，回傳 [(距離 km, 門市索引), ...]（同距離依索引排序）。"""
+        if k <= 0 or self._bounds is None:
+            return []
+        row, col = self.cell_of(lat, lng)
+        # 第 r 圈以外的點，與查詢點至少相隔 r 個格寬（經度方向以最高緯度的 cos 縮放，取保守下界）
+        max_lat = min(max(self._max_abs_lat, abs(lat)), 89.0)
+        km_per_cell = self.cell_deg * KM_PER_DEG * math.cos(math.radians(max_lat))
+        found = []
+        # 查詢點在索引範圍外時，較內圈的格子都是空的，直接從第一個與範圍相交的圈開始
+        min_row, max_row, min_col, max_col = self._bounds
+        r = max(0, min_row - row, row - max_row, min_col - col, col - max_col)
+        while True:
+            for bucket in self._ring(row, col, r):
+                found.extend(self._distances(lat, lng, bucket))
+            if self._covers_all(row, col, r):
+                break
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= r * km_per_cell:
+                    break
+            r += 1
+        found.sort()
+        return found[:k]
+
+    def within(self, lat, lng, radius_km):
+        """半徑 radius_km 內的門市，回傳 [(距離 km, 門市索引), ...] 由近到遠。"""
+        if radius_km < 0 or self._bounds is None:
+            return []
+        d_lat = radius_km / KM_PER_DEG
+        cos_lat = math.cos(math.radians(min(abs(lat) + d_lat, 89.0)))
+        d_lng = radius_km / (KM_PER_DEG * cos_lat)
+        row0, col0 = self.cell_of(lat - d_lat, lng - d_lng)
+        row1, col1 = self.cell_of(lat + d_lat, lng + d_lng)
+        min_row, max_row, min_col, max_col = self._bounds
+        found = []
+        for r in range(max(row0, min_row), min(row1, max_row) + 1):
+            for c in range(max(col0, min_col), min(col1, max_col) + 1):
+                bucket = self.cells.get((r, c))
+                if bucket:
+                    found.extend(d for d in self._distances(lat, lng, bucket) if d[0] <= radius_km)
+        found.sort()
+        return found
+
+
+def linear_nearest(points, lat, lng, k=1):
+    """逐一計算距離的 k 近鄰（對照組，與 store-locator.js 的全表排序相同）。"""
+    found = [(haversine_km(lat, lng, p[0], p[1]), i) for i, p in enumerate(points) if has_coordinates(*p)]
+    found.sort()
+    return found[:k]
+
+
+def linear_within(points, lat, lng, radius_km):
+    found = [(haversine_km(lat, lng, p[0], p[1]), i) for i, p in enumerate(points) if has_coordinates(*p)]
+    return sorted(d for d in found if d[0] <= radius_km)
@@ -0,0 +1,301 @@
+"""
+門市營業時間的編譯索引：每週固定時段 + 特定日期（春節等）的例外時段。
+
+輸入：
+  - 每間門市的 business_hours（monday … sunday，如 "12:00-22:00"、"OFF"）
+  - docs/各門市春節營運時間.csv：第一列為日期（"2026年2月16日"），第二列為備註（"除夕"），
+    之後每列為門市簡稱與當日時段（"09:00~18:00"、"公休"、"恢復正常營業"）；
+    日期未標年份（"2月16日"）時以呼叫端指定的年份為準，兩者都沒有的日期不套用
+    （不以今年代替，否則隔年重建會把去年的春節公休套到今年的日期）
+
+索引（寫入 PetStores_BranchInfo.json 的 hours_index）：
+  - week：以週一 00:00 為 0 的「週內分鐘」邊界 boundaries 與各區段的營業門市 bitmask
+    （bit i = stores 陣列第 i 間門市，十六進位字串，門市數超過 53 也不會失去精度）
+  - dates："YYYY-MM-DD" → 當日 0–1440 分鐘的邊界與 bitmask；只列出受例外時段影響的日期
+    （例外日本身與其隔天——跨午夜營業會延續到隔天）
+
+Python 查詢 API（一次回答所有門市）：
+  index = StoreHoursIndex.from_json('mapping/PetStores_BranchInfo.json')
+  index.open_at(datetime(2026, 2, 17, 12, 0))   # 營業中的門市索引
+  index.next_open(datetime(2026, 2, 17, 12, 0))  # {門市索引: 下次營業的時間（營業中則為查詢時間）}
+"""
+import bisect
+import csv
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MINUTES_PER_DAY = 24 * 60
+# 營業時段文字
+CLOSED_WORDS = {'OFF', '公休', '休息', '店休'}
+_INTERVAL_PATTERN = re.compile(r'(\d{1,2}):(\d{2})\s*[-~～]\s*(\d{1,2}):(\d{2})')
+_DATE_HEADER_PATTERN = re.compile(r'(?:(\d{4})\s*年\s*)?(\d{1,2})\s*月\s*(\d{1,2})\s*日'
+                                  r'|(?:(\d{4})/)?(\d{1,2})/(\d{1,2})')
+
+
+def parse_hours(text):
+    """解析營業時段文字。
+
+    回傳 [(開始分鐘, 結束分鐘), ...]；公休回傳 []；空白或「恢復正常營業」等無法解析的文字回傳 None
+    （表示沿用一般營業時間）。結束時間早於開始時間視為跨午夜，結束分鐘加 1440。
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    if text.upper() in CLOSED_WORDS:
+        return []
+    intervals = []
+    for h1, m1, h2, m2 in _INTERVAL_PATTERN.findall(text):
+        start = int(h1) * 60 + int(m1)
+        end = int(h2) * 60 + int(m2)
+        if end <= start:
+            end += MINUTES_PER_DAY
+        intervals.append((start, end))
+    return intervals or None
+
+
+def normalize_store_name(name):
+    """門市簡稱（去掉結尾的「店」），與 store-locator.js 的 normalizeStoreName 相同。"""
+    return re.sub(r'店$', '', (name or '').strip())
+
+
+def read_holiday_csv(csv_file_path, year=None):
+    """讀取春節營運時間 CSV。
+
+    日期標頭含年份時以標頭為準，否則用 year；兩者都沒有的日期欄略過。
+    回傳 {門市簡稱: [{'date': date, 'label': 'M/D', 'note': 備註, 'hours': 原始文字}, ...]}。
+    """
+    with open(csv_file_path, mode='r', encoding='utf-8-sig', newline='') as f:
+        rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+    if not rows:
+        return {}
+    header = rows[0]
+    columns = []
+    for col, cell in enumerate(header[1:], start=1):
+        m = _DATE_HEADER_PATTERN.search(cell)
+        if m:
+            groups = m.group(1, 2, 3) if m.group(2) else m.group(4, 5, 6)
+            column_year = int(groups[0]) if groups[0] else year
+            if column_year is None:
+                continue
+            columns.append((col, date(column_year, int(groups[1]), int(groups[2]))))
+    notes = {}
+    body = rows[1:]
+    # 第二列第一欄為空白時是備註列（除夕、初一…）
+    if body and not body[0][0].strip():
+        notes = {col: body[0][col].strip() for col, _ in columns if col < len(body[0])}
+        body = body[1:]
+    overrides = {}
+    for row in body:
+        name = normalize_store_name(row[0])
+        if not name:
+            continue
+        for col, day in columns:
+            text = row[col].strip() if col < len(row) else ''
+            if not text:
+                continue
+            overrides.setdefault(name, []).append({
+                'date': day,
+                'label': f'{day.month}/{day.day}',
+                'note': notes.get(col, ''),
+                'hours': text,
+            })
+    return overrides
+
+
+def _compile_segments(intervals_by_store, span):
+    """將各門市在 [0, span) 內的時段編譯為 (邊界, bitmask)；相鄰且 bitmask 相同的區段會合併。"""
+    events = {0: []}
+    for store, intervals in intervals_by_store.items():
+        for start, end in intervals:
+            start, end = max(start, 0), min(end, span)
+            if start < end:
+                events.setdefault(start, []).append((store, 1))
+                events.setdefault(end, []).append((store, -1))
+    counts = {}
+    mask = 0
+    boundaries, masks = [], []
+    for minute in sorted(events):
+        if minute >= span:
+            break
+        for store, delta in events[minute]:
+            counts[store] = counts.get(store, 0) + delta
+            if counts[store] > 0:
+                mask |= 1 << store
+            else:
+                mask &= ~(1 << store)
+        if masks and masks[-1] == mask:
+            continue
+        boundaries.append(minute)
+        masks.append(mask)
+    return boundaries, masks
+
+
+def mask_members(mask):
+    """bitset 中為 1 的位置（遞增排序）。"""
+    members = []
+    while mask:
+        low = mask & -mask
+        members.append(low.bit_length() - 1)
+        mask ^= low
+    return members
+
+
+class StoreHoursIndex:
+    """所有門市的營業時段索引，查詢時一次取得全部門市的狀態。"""
+
+    def __init__(self, weekly, overrides=None):
+        """weekly：每間門市一個 7 元素 list（週一起），元素為 parse_hours 的結果（None 視為公休）。
+        overrides：{date: {門市索引: 時段 list}}，只列出有例外的門市。"""
+        self.weekly = [[intervals or [] for intervals in week] for week in weekly]
+        self.overrides = {d: dict(v) for d, v in (overrides or {}).items()}
+        self.store_count = len(self.weekly)
+        self._weekday_tables = [self._compile_day(None, wd) for wd in range(7)]
+        self._date_tables = {}
+        for d in self.overrides:
+            for affected in (d, d + timedelta(days=1)):
+                if affected not in self._date_tables:
+                    self._date_tables[affected] = self._compile_day(affected, affected.weekday())
+
+    @classmethod
+    def from_stores(cls, stores, holiday_overrides=None):
+        """由 stores（PetStores_BranchInfo.json 的結構）與 read_holiday_csv 的結果建立。"""
+        weekly = []
+        positions = {}
+        for i, store in enumerate(stores):
+            hours = store.get('business_hours') or {}
+            weekly.append([parse_hours(hours.get(day, '')) for day in WEEKDAYS])
+            positions[normalize_store_name(store.get('store_name'))] = i
+        overrides = {}
+        for name, entries in (holiday_overrides or {}).items():
+            i = positions.get(name)
+            if i is None:
+                continue
+            for entry in entries:
+                intervals = parse_hours(entry['hours'])
+                if intervals is not None:
+                    overrides.setdefault(entry['date'], {})[i] = intervals
+        return cls(weekly, overrides)
+
+    @classmethod
+    def from_dict(cls, data, store_count):
+        """由 to_dict() 的結果還原（只供查詢：不含各門市的原始時段，day_intervals 不可用）。"""
+        index = cls.__new__(cls)
+        index.weekly = None
+        index.overrides = {}
+        index.store_count = store_count
+        week = data.get('week') or {}
+        week_boundaries = week.get('boundaries') or [0]
+        week_masks = [int(m, 16) for m in week.get('masks') or ['0']]
+        index._weekday_tables = []
+        for wd in range(7):
+            start, end = wd * MINUTES_PER_DAY, (wd + 1) * MINUTES_PER_DAY
+            boundaries = [0]
+            masks = [week_masks[bisect.bisect_right(week_boundaries, start) - 1]]
+            for minute, mask in zip(week_boundaries, week_masks):
+                if start < minute < end:
+                    boundaries.append(minute - start)
+                    masks.append(mask)
+            index._weekday_tables.append((boundaries, masks))
+        index._date_tables = {
+            date.fromisoformat(d): (table['boundaries'], [int(m, 16) for m in table['masks']])
+            for d, table in (data.get('dates') or {}).items()
+        }
+        return index
+
+    @classmethod
+    def from_json(cls, json_file_path):
+        """由 PetStores_BranchInfo.json 建立：有 hours_index 時直接還原（含例外日期），否則只依每週時段編譯。"""
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        stores = data.get('stores', [])
+        if data.get('hours_index'):
+            return cls.from_dict(data['hours_index'], len(stores))
+        return cls.from_stores(stores)
+
+    def day_intervals(self, store, day, weekday=None):
+        """某門市某日的時段（相對於當日 00:00，可能超過 1440）；day 為 None 時只看每週時段。"""
+        if day is not None:
+            override = self.overrides.get(day)
+            if override is not None and store in override:
+                return override[store]
+            weekday = day.weekday()
+        return self.weekly[store][weekday]
+
+    def _compile_day(self, day, weekday):
+        """當日 0–1440 分鐘的邊界與 bitmask，含前一天跨午夜延續的時段。"""
+        prev_day = day - timedelta(days=1) if day is not None else None
+        prev_weekday = (weekday - 1) % 7
+        intervals_by_store = {}
+        for store in range(self.store_count):
+            today = list(self.day_intervals(store, day, weekday))
+            spill = [(s - MINUTES_PER_DAY, e - MINUTES_PER_DAY)
+                     for s, e in self.day_intervals(store, prev_day, prev_weekday) if e > MINUTES_PER_DAY]
+            if today or spill:
+                intervals_by_store[store] = today + spill
+        return _compile_segments(intervals_by_store, MINUTES_PER_DAY)
+
+    def _day_table(self, day):
+        table = self._date_tables.get(day)
+        return table if table is not None else self._weekday_tables[day.weekday()]
+
+    def open_mask(self, when):
+        boundaries, masks = self._day_table(when.date())
+        minute = when.hour * 60 + when.minute
+        return masks[bisect.bisect_right(boundaries, minute) - 1]
+
+    def open_at(self, when):
+        """when 時營業中的門市索引（遞增排序）。"""
+        return mask_members(self.open_mask(when))
+
+    def is_open(self, store, when):
+        return bool(self.open_mask(when) >> store & 1)
+
+    def next_open(self, when, horizon_days=14):
+        """各門市在 when 之後（含）最早的營業時間；horizon_days 天內都不營業者為 None。"""
+        remaining = (1 << self.store_count) - 1
+        result = {}
+        day = when.date()
+        minute = when.hour * 60 + when.minute
+        for offset in range(horizon_days + 1):
+            current = day + timedelta(days=offset)
+            midnight = datetime.combine(current, datetime.min.time(), tzinfo=when.tzinfo)
+            boundaries, masks = self._day_table(current)
+            start = bisect.bisect_right(boundaries, minute) - 1 if offset == 0 else 0
+            for seg in range(start, len(boundaries)):
+                newly = masks[seg] & remaining
+                if not newly:
+                    continue
+                at = when if offset == 0 and seg == start else midnight + timedelta(minutes=boundaries[seg])
+                for store in mask_members(newly):
+                    result[store] = at
+                remaining &= ~newly
+                if not remaining:
+                    return result
+        for store in mask_members(remaining):
+            result[store] = None
+        return result
+
+    def to_dict(self):
+        """輸出為 JSON 結構：週內分鐘表與受例外影響日期的單日表（bitmask 為十六進位字串）。"""
+        week_boundaries, week_masks = [], []
+        for wd, (boundaries, masks) in enumerate(self._weekday_tables):
+            for minute, mask in zip(boundaries, masks):
+                if week_masks and week_masks[-1] == mask:
+                    continue
+                week_boundaries.append(wd * MINUTES_PER_DAY + minute)
+                week_masks.append(mask)
+        return {
+            'week_start': 'monday',
+            'week': {'boundaries': week_boundaries, 'masks': [format(m, 'x') for m in week_masks]},
+            'dates': {
+                d.isoformat(): {'boundaries': b, 'masks': [format(m, 'x') for m in m_list]}
+                for d, (b, m_list) in sorted(self._date_tables.items())
+            },
+        }
+
+
+def default_holiday_csv(repo_root):
+    return os.path.join(repo_root, 'docs', '各門市春節營運時間.csv')
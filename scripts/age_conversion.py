@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+data/health-guidelines.json 的 ageConversion 公式編譯與批次換算引擎。
+
+用法：
+  python scripts/age_conversion.py --json data/health-guidelines.json
+  python scripts/age_conversion.py --species dog --size large --age 3.5
+
+行為：
+  - 將每條公式字串（如 "15 + (year - 1) * 9"）以 ast 解析一次，只允許數字、
+    year / month 變數與 + - * / ** 運算，編譯成不含 builtins 的安全運算式
+  - 檢查各物種階段區間是否從 0 開始且連續、公式在階段交界是否跳動
+  - 狗依體型（small/medium/large/giant）各有一組公式；倉鼠沒有公式，
+    依 breeds 的 sexualMaturity / medianLifespan 做分段線性換算（與前端一致）
+  - 可將 NumPy 陣列形式的 (物種, 體型, 年齡) 一次批次換算，每組公式只執行一次
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import add_arguments, instrumented
+
+# 公式中可使用的變數：year = 年齡（年，可含小數），month = 年齡總月數
+FORMULA_VARIABLES = ('year', 'month')
+
+# 狗的公式以體型分欄；其他物種使用單一 formula 欄位
+SIZE_KEYS = ('small', 'medium', 'large', 'giant')
+DEFAULT_VARIANT = 'default'
+
+# 未指定或未知體型/品種時的預設值（與 health-calculator.js 的 fallback 一致）
+FALLBACK_VARIANT = {
+    'dog': 'medium',
+    'hamster': 'syrian',
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd,
+)
+
+# 次方的指數只允許絕對值不超過此值的數字常數（避免 9**9**9**9 之類的運算卡住）
+MAX_EXPONENT = 10
+
+# 階段交界處前後公式差距超過此值（人類歲數）即提出注意
+CONTINUITY_TOLERANCE = 0.5
+
+
+class FormulaError(ValueError):
+    """公式字串無法解析或含有不允許的語法。"""
+
+
+class CompiledFormula:
+    """已驗證並編譯的年齡公式，可傳入純量或 NumPy 陣列。"""
+
+    __slots__ = ('source', 'variables', '_code')
+
+    def __init__(self, source: str, code, variables: Tuple[str, ...]):
+        self.source = source
+        self.variables = variables
+        self._code = code
+
+    def __call__(self, year):
+        year = np.asarray(year, dtype=float)
+        result = eval(self._code, {'__builtins__': {}}, {'year': year, 'month': year * 12})
+        return np.broadcast_to(np.asarray(result, dtype=float), year.shape)
+
+    def __repr__(self) -> str:
+        return f"CompiledFormula({self.source!r})"
+
+
+def _check_power(node: ast.BinOp, source: str) -> None:
+    """次方的指數必須是小的數字常數，底數也不能再含次方（(x**9)**9... 同樣會暴增）。"""
+    exponent = node.right
+    if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, (ast.USub, ast.UAdd)):
+        exponent = exponent.operand
+    if not (isinstance(exponent, ast.Constant) and isinstance(exponent.value, (int, float))
+            and not isinstance(exponent.value, bool) and abs(exponent.value) <= MAX_EXPONENT):
+        raise FormulaError(f"次方的指數必須是絕對值不超過 {MAX_EXPONENT} 的數字常數: {source!r}")
+    if any(isinstance(inner, ast.BinOp) and isinstance(inner.op, ast.Pow) for inner in ast.walk(node.left)):
+        raise FormulaError(f"公式不允許巢狀次方: {source!r}")
+
+
+def compile_formula(source: str) -> CompiledFormula:
+    """解析並檢查公式字串，回傳 CompiledFormula。不合法時拋出 FormulaError。"""
+    if not isinstance(source, str) or not source.strip():
+        raise FormulaError(f"公式必須是非空字串: {source!r}")
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError as e:
+        raise FormulaError(f"公式語法錯誤: {source!r} ({e.msg})") from None
+
+    names = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"公式含不允許的語法 {type(node).__name__}: {source!r}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise FormulaError(f"公式只允許數字常數: {source!r}")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            _check_power(node, source)
+        if isinstance(node, ast.Name):
+            if node.id not in FORMULA_VARIABLES:
+                raise FormulaError(f"公式使用未知變數 '{node.id}': {source!r}")
+            names.append(node.id)
+
+    code = compile(tree, '<ageConversion>', 'eval')
+    return CompiledFormula(source, code, tuple(sorted(set(names))))
+
+
+def hamster_human_age(years, sexual_maturity: float, median_lifespan: float):
+    """倉鼠分段線性換算（單位：月）：0→性成熟 對應 0→15 歲，性成熟→壽命中位 對應 15→80 歲，之後每月 +2.5 歲。"""
+    months = np.asarray(years, dtype=float) * 12
+    sm = float(sexual_maturity)
+    ml = float(median_lifespan)
+    return np.where(
+        months <= sm,
+        months / sm * 15,
+        np.where(months <= ml, 15 + (months - sm) / (ml - sm) * 65, 80 + (months - ml) * 2.5),
+    )
+
+
+class SpeciesAgeModel:
+    """單一物種的階段區間與各體型（或品種）的換算函式。"""
+
+    def __init__(self, key: str, stages: List[str], ranges: List[Tuple[float, float]],
+                 variants: Dict[str, Callable]):
+        self.key = key
+        self.stages = stages
+        self.ranges = ranges
+        self.variants = variants
+        self._starts = np.array([r[0] for r in ranges], dtype=float)
+
+    def resolve_variant(self, variant: Optional[str]) -> Optional[str]:
+        if variant in self.variants:
+            return variant
+        if DEFAULT_VARIANT in self.variants:
+            return DEFAULT_VARIANT
+        fallback = FALLBACK_VARIANT.get(self.key)
+        if fallback in self.variants:
+            return fallback
+        return None
+
+    def stage_index(self, years) -> np.ndarray:
+        """回傳每個年齡所屬階段的索引；超過最後區間視為最後階段，負值為 -1。"""
+        years = np.asarray(years, dtype=float)
+        idx = np.searchsorted(self._starts, years, side='right') - 1
+        return np.where(years < 0, -1, idx)
+
+    def human_age(self, variant: Optional[str], years) -> np.ndarray:
+        vkey = self.resolve_variant(variant)
+        years = np.asarray(years, dtype=float)
+        if vkey is None:
+            return np.full(years.shape, np.nan)
+        return self.variants[vkey](self, years)
+
+
+def _piecewise(formulas: Sequence[Optional[CompiledFormula]]) -> Callable:
+    """將各階段公式組成分段函式；每個階段的公式只對落在該階段的元素執行一次。"""
+    def evaluate(model: SpeciesAgeModel, years: np.ndarray) -> np.ndarray:
+        out = np.full(years.shape, np.nan)
+        idx = model.stage_index(years)
+        for i, formula in enumerate(formulas):
+            if formula is None:
+                continue
+            mask = idx == i
+            if mask.any():
+                out[mask] = formula(years[mask])
+        return out
+    return evaluate
+
+
+def _hamster_variant(sexual_maturity: float, median_lifespan: float) -> Callable:
+    def evaluate(model: SpeciesAgeModel, years: np.ndarray) -> np.ndarray:
+        out = hamster_human_age(years, sexual_maturity, median_lifespan)
+        return np.where(years < 0, np.nan, out)
+    return evaluate
+
+
+class AgeConversionEngine:
+    """由 health-guidelines.json 建立，所有公式只解析一次。"""
+
+    def __init__(self, models: Dict[str, SpeciesAgeModel]):
+        self.models = models
+
+    @classmethod
+    def from_guidelines(cls, data: Dict[str, Any]) -> 'AgeConversionEngine':
+        """編譯所有物種的 ageConversion；任一公式不合法即拋出 FormulaError。"""
+        models: Dict[str, SpeciesAgeModel] = {}
+        for skey, sinfo in data.items():
+            if not isinstance(sinfo, dict) or not isinstance(sinfo.get('ageConversion'), dict):
+                continue
+            stages, ranges, per_stage = _collect_stages(skey, sinfo['ageConversion'])
+            variants: Dict[str, Callable] = {}
+            variant_keys = list(dict.fromkeys(v for forms in per_stage for v in forms))
+            for vkey in variant_keys:
+                formulas = []
+                for stage, forms in zip(stages, per_stage):
+                    src = forms.get(vkey)
+                    if src is None:
+                        formulas.append(None)
+                        continue
+                    try:
+                        formulas.append(compile_formula(src))
+                    except FormulaError as e:
+                        raise FormulaError(f"{skey}.{stage}.{vkey}: {e}") from None
+                variants[vkey] = _piecewise(formulas)
+            if not variants and isinstance(sinfo.get('breeds'), dict):
+                for bkey, binfo in sinfo['breeds'].items():
+                    sm = binfo.get('sexualMaturity') if isinstance(binfo, dict) else None
+                    ml = binfo.get('medianLifespan') if isinstance(binfo, dict) else None
+                    if isinstance(sm, (int, float)) and isinstance(ml, (int, float)) and 0 < sm < ml:
+                        variants[bkey] = _hamster_variant(sm, ml)
+            models[skey] = SpeciesAgeModel(skey, stages, ranges, variants)
+        return cls(models)
+
+    @classmethod
+    def from_json(cls, path: Path) -> 'AgeConversionEngine':
+        with path.open('r', encoding='utf-8') as f:
+            return cls.from_guidelines(json.load(f))
+
+    def variants(self, species: str) -> List[str]:
+        model = self.models.get(species)
+        return list(model.variants) if model else []
+
+    def human_age(self, species: str, size: Optional[str], years: float) -> Optional[float]:
+        """單筆換算，回傳未四捨五入的人類年齡；無法換算時回傳 None。"""
+        model = self.models.get(species)
+        if model is None:
+            return None
+        value = float(model.human_age(size, years))
+        return None if np.isnan(value) else value
+
+    def stage(self, species: str, years: float) -> Optional[str]:
+        model = self.models.get(species)
+        if model is None:
+            return None
+        idx = int(model.stage_index(years))
+        return model.stages[idx] if idx >= 0 else None
+
+    def human_age_batch(self, species, sizes, years) -> np.ndarray:
+        """批次換算：三個等長陣列（或可廣播的純量），回傳 float 陣列，無法換算者為 NaN。
+
+        以 (物種, 體型) 分組後，每個階段公式對該組只執行一次向量化運算。
+        """
+        species_arr, sizes_arr, years_arr = np.broadcast_arrays(
+            np.asarray(species, dtype=object),
+            np.asarray(sizes, dtype=object),
+            np.asarray(years, dtype=float),
+        )
+        out = np.full(years_arr.shape, np.nan)
+        if out.size == 0:
+            return out
+        sp_keys, sp_inv = np.unique(species_arr.astype(str), return_inverse=True)
+        sp_inv = sp_inv.reshape(years_arr.shape)
+        size_str = np.where(sizes_arr == None, '', sizes_arr).astype(str)  # noqa: E711
+        for si, skey in enumerate(sp_keys):
+            model = self.models.get(skey)
+            if model is None:
+                continue
+            sp_mask = sp_inv == si
+            size_keys, size_inv = np.unique(size_str[sp_mask], return_inverse=True)
+            sp_years = years_arr[sp_mask]
+            sp_out = np.full(sp_years.shape, np.nan)
+            for zi, zkey in enumerate(size_keys):
+                z_mask = size_inv.reshape(sp_years.shape) == zi
+                sp_out[z_mask] = model.human_age(zkey or None, sp_years[z_mask])
+            out[sp_mask] = sp_out
+        return out
+
+    def stage_batch(self, species, years) -> np.ndarray:
+        """批次判斷生命階段，回傳階段名稱陣列（無法判斷者為 None）。"""
+        species_arr, years_arr = np.broadcast_arrays(
+            np.asarray(species, dtype=object), np.asarray(years, dtype=float)
+        )
+        out = np.full(years_arr.shape, None, dtype=object)
+        for skey in np.unique(species_arr.astype(str)):
+            model = self.models.get(skey)
+            if model is None or not model.stages:
+                continue
+            mask = species_arr.astype(str) == skey
+            idx = model.stage_index(years_arr[mask])
+            names = np.array(model.stages + [None], dtype=object)
+            out[mask] = names[np.where(idx < 0, len(model.stages), idx)]
+        return out
+
+
+def _collect_stages(skey: str, age_conv: Dict[str, Any]):
+    stages: List[str] = []
+    ranges: List[Tuple[float, float]] = []
+    per_stage: List[Dict[str, str]] = []
+    for stage, conv in age_conv.items():
+        if not isinstance(conv, dict):
+            continue
+        rng = conv.get('range')
+        if not (isinstance(rng, list) and len(rng) >= 2):
+            raise FormulaError(f"{skey}.{stage}: 缺少 range")
+        forms: Dict[str, str] = {}
+        if 'formula' in conv:
+            forms[DEFAULT_VARIANT] = conv['formula']
+        for size in SIZE_KEYS:
+            if size in conv:
+                forms[size] = conv[size]
+        stages.append(stage)
+        ranges.append((float(rng[0]), float(rng[1])))
+        per_stage.append(forms)
+    order = sorted(range(len(stages)), key=lambda i: ranges[i][0])
+    return [stages[i] for i in order], [ranges[i] for i in order], [per_stage[i] for i in order]
+
+
+def check_age_conversion(data: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """檢查所有 ageConversion 設定。回傳 (錯誤, 注意)：錯誤為公式/區間不合法，注意為交界處不連續或遞減。"""
+    errors: List[str] = []
+    notes: List[str] = []
+    for skey, sinfo in data.items():
+        if not isinstance(sinfo, dict) or not isinstance(sinfo.get('ageConversion'), dict):
+            continue
+        try:
+            stages, ranges, per_stage = _collect_stages(skey, sinfo['ageConversion'])
+        except FormulaError as e:
+            errors.append(str(e))
+            continue
+        if ranges and ranges[0][0] != 0:
+            errors.append(f"{skey}: 第一個階段 {stages[0]} 未從 0 歲開始")
+        for i, (start, end) in enumerate(ranges):
+            if start >= end:
+                errors.append(f"{skey}.{stages[i]}: range 起點需小於終點 {[start, end]}")
+            if i and ranges[i - 1][1] != start:
+                errors.append(f"{skey}: {stages[i - 1]} 與 {stages[i]} 區間不連續 ({ranges[i - 1][1]} ≠ {start})")
+
+        compiled: List[Dict[str, CompiledFormula]] = []
+        for stage, forms in zip(stages, per_stage):
+            ok = {}
+            for vkey, src in forms.items():
+                try:
+                    ok[vkey] = compile_formula(src)
+                except FormulaError as e:
+                    errors.append(f"{skey}.{stage}.{vkey}: {e}")
+            compiled.append(ok)
+
+        for i, forms in enumerate(compiled):
+            start, end = ranges[i]
+            for vkey, formula in forms.items():
+                if float(formula(end)) < float(formula(start)):
+                    notes.append(f"{skey}.{stages[i]}.{vkey}: 公式在區間內遞減 ({formula.source})")
+                if i + 1 < len(compiled) and vkey in compiled[i + 1]:
+                    left = float(formula(end))
+                    right = float(compiled[i + 1][vkey](end))
+                    if abs(left - right) > CONTINUITY_TOLERANCE:
+                        notes.append(
+                            f"{skey}.{stages[i]}→{stages[i + 1]}.{vkey}: "
+                            f"{end:g} 歲交界不連續 ({left:g} → {right:g})"
+                        )
+    return errors, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='檢查並試算 health-guidelines.json 的年齡換算公式')
+    parser.add_argument('--json', default='data/health-guidelines.json', help='健康指引 JSON 路徑')
+    parser.add_argument('--species', help='試算的物種 key（cat/dog/rabbit/hamster）')
+    parser.add_argument('--size', help='狗的體型或倉鼠品種 key')
+    parser.add_argument('--age', type=float, help='試算年齡（年，可含小數）')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    js = Path(args.json)
+    if not js.exists():
+        print(f"[ERROR] JSON not found: {js}")
+        return 2
+    with instrumented(args, 'age_conversion') as metrics:
+        with metrics.stage('load_json'):
+            with js.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        with metrics.stage('check_formulas'):
+            errors, notes = check_age_conversion(data)
+        for e in errors:
+            print("錯誤:", e)
+        if errors:
+            return 2
+        with metrics.stage('compile_engine'):
+            engine = AgeConversionEngine.from_guidelines(data)
+    if args.species and args.age is not None:
+        value = engine.human_age(args.species, args.size, args.age)
+        stage = engine.stage(args.species, args.age)
+        if value is None:
+            print(f"[ERROR] 無法換算: species={args.species} size={args.size}")
+            return 2
+        print(f"{args.species} {args.age:g} 歲 → 人類約 {round(value)} 歲（{stage}）")
+        return 0
+
+    for skey, model in engine.models.items():
+        print(f"{skey}: {len(model.stages)} 個階段，換算變體 {', '.join(model.variants) or '-'}")
+    for n in notes:
+        print("注意:", n)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+資料產出檔（guidelines_*、temp_conditions_*、temp_breeds_* 等）的平行、原子寫入工具。
+
+  - 每個產出檔在 thread pool（或 process pool）中各自序列化、比對、寫入
+  - 寫入一律先寫同目錄的暫存檔再 os.replace，網站不會讀到寫到一半的檔案
+  - 內容與磁碟上的檔案完全相同時不寫入，保留 mtime 與 CDN 快取
+  - compact 模式：以緊湊分隔符號輸出 JSON，並預先產生 .gz / .br 同名壓縮檔
+    （.br 需安裝 brotli 套件，未安裝時略過），壓縮後大小寫入建置報告
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # 選用套件：沒有時只產生 .gz
+    brotli = None
+
+# 新檔案的權限（暫存檔預設為 0600，需改回一般檔案權限）。
+# 不由 umask 推算：讀取 umask 只能先以 os.umask 改掉再改回，期間會影響同行程其他執行緒建立的檔案
+DEFAULT_MODE = 0o644
+
+
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+# 以內容雜湊命名的檔案中雜湊的長度（sha256 十六進位的前幾碼），及其正規表示式
+HASH_LENGTH = 10
+HASH_PATTERN = rf'[0-9a-f]{{{HASH_LENGTH}}}'
+
+
+class ArtifactResult(NamedTuple):
+    path: Path
+    written: bool
+    size: int
+    sha256: str
+    gzip_size: Optional[int] = None
+    brotli_size: Optional[int] = None
+
+
+def dumps_json(payload: Any) -> bytes:
+    """與 json.dump(payload, f, ensure_ascii=False, indent=2) 相同的位元組。"""
+    return json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def dumps_json_compact(payload: Any) -> bytes:
+    """不縮排、不含多餘空白的 JSON（compact 模式）。"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 讓相同內容產生相同的 .gz 位元組
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_bytes(data: bytes) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _sibling(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def write_compressed_siblings(path: Path, data: bytes, refresh: bool) -> Tuple[Optional[int], Optional[int]]:
+    """產生 path.gz / path.br；refresh=False 且壓縮檔已存在時沿用既有檔案。回傳 (gzip 大小, brotli 大小)。"""
+    sizes: List[Optional[int]] = []
+    for suffix, compress in (('.gz', gzip_bytes), ('.br', brotli_bytes)):
+        sibling = _sibling(path, suffix)
+        if not refresh and sibling.exists():
+            sizes.append(sibling.stat().st_size)
+            continue
+        packed = compress(data)
+        if packed is None:
+            sizes.append(None)
+            continue
+        write_if_changed(sibling, packed)
+        sizes.append(len(packed))
+    return sizes[0], sizes[1]
+
+
+def remove_compressed_siblings(path: Path) -> None:
+    """非 compact 模式時移除舊的壓縮檔，避免網站讀到過期內容。"""
+    for suffix in COMPRESSED_SUFFIXES:
+        try:
+            _sibling(path, suffix).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def remove_unreferenced(directory: Path, keep: Iterable[str], pattern: str) -> List[Path]:
+    """刪除 directory 中檔名符合 pattern、但不在 keep 中的檔案與其壓縮檔，回傳已刪除的路徑。
+
+    pattern 為正規表示式，須完整符合（壓縮檔去掉 .gz / .br 後比對）；應只涵蓋呼叫端自己產生的檔名
+    （例如含內容雜湊），目錄中其他檔案與子目錄一律保留。
+    """
+    directory = Path(directory)
+    keep_set = set(keep)
+    owned = re.compile(pattern)
+    removed: List[Path] = []
+    if not directory.is_dir():
+        return removed
+    for path in sorted(directory.iterdir()):
+        name = path.name
+        for suffix in COMPRESSED_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        if not path.is_file() or not owned.fullmatch(name) or name in keep_set:
+            continue
+        path.unlink()
+        removed.append(path)
+    return removed
+
+
+def file_mode(path: Path) -> int:
+    """以暫存檔取代 path 時使用的權限：沿用既有檔案的權限，不存在時為 DEFAULT_MODE。"""
+    try:
+        return Path(path).stat().st_mode & 0o777
+    except FileNotFoundError:
+        return DEFAULT_MODE
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = 'wb', encoding: Optional[str] = None) -> Iterator[IO]:
+    """開啟同目錄的暫存檔供逐步寫入，區塊正常結束後以 os.replace 取代目標檔；失敗時不留下暫存檔。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode_bits = file_mode(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode_bits)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """寫入暫存檔後以 os.replace 取代目標檔；失敗時不留下暫存檔。"""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """僅在內容不同（或檔案不存在）時以原子方式寫入。回傳是否實際寫入。"""
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    atomic_write_bytes(path, data)
+    return True
+
+
+def write_artifact(path: Path, payload: Any, serializer: Callable[[Any], bytes] = dumps_json,
+                   precompress: bool = False) -> ArtifactResult:
+    """序列化（payload 已是 bytes 時直接使用）並寫出單一產出檔；precompress 時一併產生 .gz / .br。"""
+    path = Path(path)
+    data = payload if isinstance(payload, bytes) else serializer(payload)
+    written = write_if_changed(path, data)
+    gz_size = br_size = None
+    if precompress:
+        gz_size, br_size = write_compressed_siblings(path, data, refresh=written)
+    else:
+        remove_compressed_siblings(path)
+    return ArtifactResult(path, written, len(data), hashlib.sha256(data).hexdigest(), gz_size, br_size)
+
+
+def _write_one(job: Tuple[Path, Any, Callable[[Any], bytes], bool]) -> ArtifactResult:
+    path, payload, serializer, precompress = job
+    return write_artifact(path, payload, serializer, precompress)
+
+
+def write_artifacts(artifacts: Iterable[Tuple[Path, Any]], workers: Optional[int] = None,
+                    processes: bool = False,
+                    serializer: Callable[[Any], bytes] = dumps_json,
+                    precompress: bool = False) -> List[ArtifactResult]:
+    """平行寫出多個產出檔，回傳與輸入順序相同的結果。
+
+    artifacts 為 (路徑, payload) 序列；workers=1 或只有一個檔案時直接在目前執行緒處理。
+    processes=True 時改用 process pool（payload 與 serializer 必須可 pickle）。
+    """
+    jobs = [(Path(path), payload, serializer, precompress) for path, payload in artifacts]
+    if not jobs:
+        return []
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1, 32)
+    if workers <= 1 or len(jobs) == 1:
+        return [_write_one(job) for job in jobs]
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_cls(max_workers=workers) as executor:
+        return list(executor.map(_write_one, jobs))
+
+
+# collect_build_report() 期間由 update_build_report 收集的結果（None 表示直接寫入報告檔）
+_report_sink: Optional[List[ArtifactResult]] = None
+
+
+@contextmanager
+def collect_build_report() -> Iterator[List[ArtifactResult]]:
+    """期間內 update_build_report 只把結果收進回傳的 list，不讀寫報告檔。
+
+    平行的多個行程各自讀取、修改、寫回同一份報告會互相覆蓋；改由父行程收集後呼叫一次 update_build_report。
+    """
+    global _report_sink
+    previous, _report_sink = _report_sink, []
+    try:
+        yield _report_sink
+    finally:
+        _report_sink = previous
+
+
+def update_build_report(report_path: Path, results: Iterable[ArtifactResult]) -> Dict[str, int]:
+    """將產出檔的原始 / gzip / brotli 大小併入建置報告（以路徑為 key），回傳本次的大小合計。"""
+    if _report_sink is not None:
+        results = list(results)
+        _report_sink.extend(results)
+        return {k: sum(getattr(r, attr) or 0 for r in results)
+                for k, attr in (('bytes', 'size'), ('gzip', 'gzip_size'), ('brotli', 'brotli_size'))}
+    report_path = Path(report_path)
+    report: Dict[str, Any] = {}
+    if report_path.exists():
+        try:
+            with report_path.open('r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {}
+    artifacts = report.get('artifacts') if isinstance(report.get('artifacts'), dict) else {}
+    totals = {'bytes': 0, 'gzip': 0, 'brotli': 0}
+    for r in results:
+        entry = {'bytes': r.size, 'gzip': r.gzip_size, 'brotli': r.brotli_size}
+        artifacts[Path(r.path).as_posix()] = entry
+        for k in totals:
+            totals[k] += entry[k] or 0
+    # 已不存在的產出檔（例如被新雜湊取代的 bundle）不再列入報告
+    artifacts = {p: e for p, e in artifacts.items() if Path(p).exists()}
+    all_totals = {'bytes': 0, 'gzip': 0, 'brotli': 0}
+    for entry in artifacts.values():
+        for k in all_totals:
+            all_totals[k] += entry.get(k) or 0
+    payload = {'totals': all_totals, 'artifacts': dict(sorted(artifacts.items()))}
+    write_if_changed(report_path, dumps_json(payload))
+    return totals
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+convert_health_data.py 的啟動時間與執行時間基準。
+
+用法：
+  python scripts/bench_convert_startup.py
+  python scripts/bench_convert_startup.py --repeat 10
+
+行為：
+  - 在暫存目錄複製 data/ 與 docs/，避免改動工作目錄
+  - 量測「只 import 模組」與「完整執行一次轉換」的牆鐘時間（取中位數）
+  - 完整執行分別以預設（標準函式庫 csv）與 --pandas（舊行為）兩種模式量測；
+    未安裝 pandas 時略過 --pandas 模式
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+
+
+def run_timed(cmd: List[str], cwd: Path, repeat: int) -> float:
+    env = dict(os.environ, PYTHONPATH=str(SCRIPTS_DIR))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='convert_health_data.py 啟動/執行時間基準')
+    parser.add_argument('--repeat', type=int, default=5, help='每種模式重複次數（取中位數）')
+    args = parser.parse_args(argv)
+
+    script = str(SCRIPTS_DIR / 'convert_health_data.py')
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        shutil.copytree(REPO_ROOT / 'data', work / 'data')
+        shutil.copytree(REPO_ROOT / 'docs', work / 'docs')
+
+        results = [
+            ('python startup', run_timed([sys.executable, '-c', 'pass'], work, args.repeat)),
+            ('import convert_health_data', run_timed([sys.executable, '-c', 'import convert_health_data'], work, args.repeat)),
+            ('full run (csv)', run_timed([sys.executable, script], work, args.repeat)),
+        ]
+        if importlib.util.find_spec('pandas') is not None:
+            results.append(('import pandas', run_timed([sys.executable, '-c', 'import pandas'], work, args.repeat)))
+            results.append(('full run (--pandas)', run_timed([sys.executable, script, '--pandas'], work, args.repeat)))
+        else:
+            print("[INFO] 未安裝 pandas，略過 --pandas 模式")
+
+    width = max(len(name) for name, _ in results)
+    for name, seconds in results:
+        print(f"{name:<{width}}  {seconds * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
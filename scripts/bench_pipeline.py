@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+資料管線的規模基準：以合成資料量測各腳本在不同資料量下的時間與記憶體，並可與基準線比較。
+
+用法：
+  python scripts/bench_pipeline.py
+  python scripts/bench_pipeline.py --scales current 1000 10000 100000 1000000 --repeat 1
+  python scripts/bench_pipeline.py --save                 # 更新基準線 scripts/bench_pipeline_baseline.json
+  python scripts/bench_pipeline.py --check                # 與基準線比較，變慢超過容許倍數時回傳 1
+
+行為：
+  - 每個規模在暫存目錄複製 data/、docs/ 與 mapping/ 的門市 CSV；規模為數字時，以固定亂數種子把
+    health_conditions.csv、health_life_stages.csv、pet_breeds.csv、activity_body_options.csv 與
+    PetStores_BranchInfo.csv 擴充到該列數（以現有資料為樣板，改寫唯一鍵並微調座標），
+    並產生同樣檔案數的目錄樹；current 表示不擴充、使用今天的資料
+  - 依序執行下列目標（後面的目標讀取前面目標的輸出，例如 convert 讀取 update 產生的 JSON），
+    每個目標每次都在新的子行程中執行，匯入模組的時間不計入：
+      validate   validate_and_convert_health_csv.main(['--check', 'docs'])
+      update     update_health_json.main(['--force'])
+      convert    convert_health_data.convert_health_guidelines()
+      stores     csv_to_json.csv_to_json(門市 CSV, 門市 JSON, 春節營運時間 CSV, 2026)
+      tree       project_tree_generator.main()（-p tree --stats）
+  - 時間取 --repeat 次的中位數；記憶體為子行程（含其子行程）的峰值 RSS，
+    加上 --tracemalloc 時另以一次額外執行量測 Python 物件配置的峰值（該次不計時）
+  - 列出相鄰兩個數字規模間的成長指數（時間 ∝ 列數^k），用來觀察複雜度曲線
+  - --check 時，時間超過基準線 × --tolerance 且差距大於 --min-delta 秒、或峰值 RSS 超過
+    基準線 × --memory-tolerance 且差距大於 --min-memory MiB 即視為退步；基準線與本次量測
+    須在同一台機器上產生才有意義
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource：只量測時間
+    resource = None
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+MAPPING_DIR = REPO_ROOT / 'mapping'
+BASELINE_PATH = SCRIPTS_DIR / 'bench_pipeline_baseline.json'
+BASELINE_VERSION = 1
+DEFAULT_SCALES = ['current', '1000', '10000', '100000']
+TARGETS = ('validate', 'update', 'convert', 'stores', 'tree')
+STORES_CSV = 'mapping/PetStores_BranchInfo.csv'
+STORES_JSON = 'mapping/PetStores_BranchInfo.json'
+HOLIDAY_CSV = 'docs/各門市春節營運時間.csv'
+HOLIDAY_YEAR = 2026
+TREE_DIR = 'tree'
+# 合成目錄樹每個目錄的檔案數
+TREE_FANOUT = 100
+
+
+# ---------------------------------------------------------------------------
+# 合成資料
+# ---------------------------------------------------------------------------
+
+def _suffix_fields(*fields: str, sep: str = '_') -> Callable[[Dict[str, str], int, random.Random], None]:
+    """改寫唯一鍵：在指定欄位後面加上列號。"""
+    def mutate(row: Dict[str, str], i: int, rng: random.Random) -> None:
+        for field in fields:
+            row[field] = f'{row[field]}{sep}{i}'
+    return mutate
+
+
+def _mutate_store(row: Dict[str, str], i: int, rng: random.Random) -> None:
+    row['Store Name'] = f"{row['Store Name']}{i}"
+    for field in ('Latitude', 'Longitude'):
+        if row.get(field):
+            row[field] = f'{float(row[field]) + rng.uniform(-0.05, 0.05):.10f}'
+
+
+# 檔案 → (是否有 BOM, 擴充列時的改寫方式)
+GENERATED_CSVS = {
+    'docs/health_conditions.csv': (True, lambda row, i, rng: (_suffix_fields('id')(row, i, rng),
+                                                               _suffix_fields('疾病項目', sep=' #')(row, i, rng))),
+    'docs/health_life_stages.csv': (True, _suffix_fields('階段', sep='')),
+    'docs/pet_breeds.csv': (True, lambda row, i, rng: (_suffix_fields('品種key')(row, i, rng),
+                                                        _suffix_fields('品種標籤', sep='')(row, i, rng))),
+    'docs/activity_body_options.csv': (True, lambda row, i, rng: (_suffix_fields('key')(row, i, rng),
+                                                                   _suffix_fields('label', sep='')(row, i, rng))),
+    STORES_CSV: (False, _mutate_store),
+}
+
+
+def scale_csv(path: Path, rows: int, seed: int, bom: bool,
+              mutate: Callable[[Dict[str, str], int, random.Random], None]) -> None:
+    """把 CSV 擴充（或截短）到 rows 列：依序循環使用現有列為樣板，超出原有列數的部分改寫唯一鍵。"""
+    encoding = 'utf-8-sig' if bom else 'utf-8'
+    with path.open('r', encoding=encoding, newline='') as f:
+        reader = csv.DictReader(f)
+        header = list(reader.fieldnames or [])
+        templates = list(reader)
+    rng = random.Random(f'{seed}:{path.name}:{rows}')
+    with path.open('w', encoding=encoding, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        for i in range(rows):
+            row = dict(templates[i % len(templates)])
+            if i >= len(templates):
+                mutate(row, i, rng)
+            writer.writerow(row)
+
+
+def make_tree(root: Path, files: int) -> None:
+    """產生 files 個空檔案的目錄樹：每個目錄 TREE_FANOUT 個檔案，兩層子目錄。"""
+    for start in range(0, files, TREE_FANOUT):
+        directory = root / f'd{start // (TREE_FANOUT * TREE_FANOUT)}' / f's{start // TREE_FANOUT}'
+        directory.mkdir(parents=True, exist_ok=True)
+        for i in range(start, min(files, start + TREE_FANOUT)):
+            os.close(os.open(directory / f'f{i}.txt', os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def prepare_workdir(work: Path, rows: Optional[int], seed: int) -> Dict[str, int]:
+    """在 work 建立一份可任意改寫的資料副本；rows 為 None 時使用今天的資料。回傳各 CSV 的列數。"""
+    shutil.copytree(REPO_ROOT / 'data', work / 'data')
+    shutil.copytree(REPO_ROOT / 'docs', work / 'docs')
+    (work / 'mapping').mkdir()
+    shutil.copy2(REPO_ROOT / STORES_CSV, work / STORES_CSV)
+
+    counts = {}
+    for rel, (bom, mutate) in GENERATED_CSVS.items():
+        if rows is not None:
+            scale_csv(work / rel, rows, seed, bom, mutate)
+        with (work / rel).open('r', encoding='utf-8-sig', newline='') as f:
+            counts[Path(rel).name] = sum(1 for _ in csv.reader(f)) - 1
+    tree_files = rows if rows is not None else sum(counts.values())
+    make_tree(work / TREE_DIR, tree_files)
+    counts[TREE_DIR] = tree_files
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# 子行程：執行單一目標並回報量測值
+# ---------------------------------------------------------------------------
+
+def _load_target(name: str) -> Callable[[], Any]:
+    """匯入目標模組並回傳要量測的呼叫（匯入時間不計入）。"""
+    if name == 'validate':
+        import validate_and_convert_health_csv
+        return lambda: validate_and_convert_health_csv.main(['--check', 'docs', '--stores', STORES_CSV])
+    if name == 'update':
+        import update_health_json
+        return lambda: update_health_json.main(['--force'])
+    if name == 'convert':
+        import convert_health_data
+        convert_health_data.OUTPUT_DIR = 'docs'
+        convert_health_data.CSV_HAMSTER_BREEDS = 'docs/hamster_breeds.csv'
+        return convert_health_data.convert_health_guidelines
+    if name == 'stores':
+        import csv_to_json
+        return lambda: csv_to_json.csv_to_json(STORES_CSV, STORES_JSON, HOLIDAY_CSV, HOLIDAY_YEAR)
+    if name == 'tree':
+        import project_tree_generator
+
+        def run_tree():
+            sys.argv = ['project_tree_generator.py', '-p', TREE_DIR, '-o', 'tree.txt', '--stats']
+            return project_tree_generator.main()
+        return run_tree
+    raise ValueError(f'未知的目標：{name}')
+
+
+def peak_rss_mib() -> Optional[float]:
+    """本行程與已結束子行程中最大的峰值 RSS（MiB）；沒有 resource 模組時為 None。"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux 以 KiB 回報，macOS 以 byte 回報
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_child(name: str, trace: bool) -> int:
+    call = _load_target(name)
+    if trace:
+        import tracemalloc
+        tracemalloc.start()
+    # 目標本身的訊息（含 process pool 子行程）一律丟棄，stdout 只留量測結果
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        start = time.perf_counter()
+        status = call()
+        seconds = time.perf_counter() - start
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+    result: Dict[str, Any] = {'seconds': seconds, 'status': status if isinstance(status, int) else 0}
+    if trace:
+        result['heap_mib'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    else:
+        result['rss_mib'] = peak_rss_mib()
+    print(json.dumps(result))
+    return 0
+
+
+def run_target(name: str, work: Path, timeout: float, trace: bool = False) -> Dict[str, Any]:
+    paths = os.pathsep.join([str(SCRIPTS_DIR), str(MAPPING_DIR)])
+    env = dict(os.environ, PYTHONPATH=paths, PYTHONIOENCODING='utf-8')
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--child', name] + (['--tracemalloc'] if trace else [])
+    try:
+        proc = subprocess.run(cmd, cwd=work, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'status': 'timeout'}
+    if proc.returncode != 0:
+        return {'status': 'error', 'message': proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, work: Path, repeat: int, timeout: float, trace: bool) -> Dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        sample = run_target(name, work, timeout)
+        if sample.get('status') != 0:
+            return {'status': sample.get('status'), **{k: v for k, v in sample.items() if k == 'message'}}
+        samples.append(sample)
+    result: Dict[str, Any] = {'seconds': statistics.median(s['seconds'] for s in samples)}
+    rss = [s['rss_mib'] for s in samples if s.get('rss_mib') is not None]
+    if rss:
+        result['rss_mib'] = max(rss)
+    if trace:
+        traced = run_target(name, work, timeout, trace=True)
+        if 'heap_mib' in traced:
+            result['heap_mib'] = traced['heap_mib']
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 報表與基準線
+# ---------------------------------------------------------------------------
+
+def growth_exponents(results: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """相鄰數字規模間的成長指數 k（時間 ∝ 列數^k），以較大的規模為鍵。"""
+    numeric = sorted((int(scale), r['seconds']) for scale, r in results.items()
+                     if scale.isdigit() and 'seconds' in r)
+    exponents = {}
+    for (n0, t0), (n1, t1) in zip(numeric, numeric[1:]):
+        if t0 > 0 and t1 > 0 and n1 > n0:
+            exponents[str(n1)] = round(math.log(t1 / t0) / math.log(n1 / n0), 2)
+    return exponents
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Any],
+            args: argparse.Namespace) -> List[str]:
+    """回傳退步項目的說明；基準線沒有的目標或規模略過。"""
+    regressions = []
+    for target, scales in results.items():
+        for scale, current in scales.items():
+            base = baseline.get('results', {}).get(target, {}).get(scale)
+            if not base or 'seconds' not in base:
+                continue
+            if 'seconds' not in current:
+                regressions.append(f'{target} @ {scale}：{current.get("status")}（基準線 {base["seconds"]:.3f}s）')
+                continue
+            t, bt = current['seconds'], base['seconds']
+            if t > bt * args.tolerance and t - bt > args.min_delta:
+                regressions.append(f'{target} @ {scale}：{t:.3f}s，基準線 {bt:.3f}s（×{t / bt:.2f}）')
+            m, bm = current.get('rss_mib'), base.get('rss_mib')
+            if m is not None and bm and m > bm * args.memory_tolerance and m - bm > args.min_memory:
+                regressions.append(f'{target} @ {scale}：峰值 RSS {m:.1f} MiB，基準線 {bm:.1f} MiB（×{m / bm:.2f}）')
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{'target':<9} {'scale':>8} {'time (s)':>10} {'RSS MiB':>8} {'heap MiB':>9} {'k':>6} {'vs base':>8}")
+    for target, scales in results.items():
+        exponents = growth_exponents(scales)
+        for scale, r in scales.items():
+            if 'seconds' not in r:
+                print(f"{target:<9} {scale:>8} {r.get('status')!s:>10}  {' '.join(r.get('message', []))}")
+                continue
+            base = (baseline or {}).get('results', {}).get(target, {}).get(scale, {})
+            ratio = f"×{r['seconds'] / base['seconds']:.2f}" if base.get('seconds') else ''
+            rss = f"{r['rss_mib']:.1f}" if r.get('rss_mib') is not None else ''
+            heap = f"{r['heap_mib']:.1f}" if r.get('heap_mib') is not None else ''
+            k = f"{exponents[scale]:.2f}" if scale in exponents else ''
+            print(f"{target:<9} {scale:>8} {r['seconds']:>10.3f} {rss:>8} {heap:>9} {k:>6} {ratio:>8}")
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with path.open('r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, Dict[str, Any]]], args: argparse.Namespace,
+                  previous: Optional[Dict[str, Any]]) -> None:
+    """寫入基準線；只覆蓋本次有量測的目標與規模，其餘沿用舊值。"""
+    from artifact_writer import atomic_write_bytes, dumps_json
+    merged = (previous or {}).get('results', {}) if previous and previous.get('seed') == args.seed else {}
+    for target, scales in results.items():
+        merged.setdefault(target, {}).update({s: r for s, r in scales.items() if 'seconds' in r})
+        for scale, k in growth_exponents(merged[target]).items():
+            merged[target][scale]['k'] = k
+    payload = {
+        'version': BASELINE_VERSION,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'platform': platform.platform(terse=True),
+        'cpus': os.cpu_count(),
+        'results': merged,
+    }
+    atomic_write_bytes(path, dumps_json(payload))
+
+
+def parse_scale(text: str) -> str:
+    if text == 'current':
+        return text
+    try:
+        rows = int(float(text))  # 允許 1e6 這類寫法
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'規模應為 current 或列數：{text}')
+    if rows < 1:
+        raise argparse.ArgumentTypeError(f'列數必須大於 0：{text}')
+    return str(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='資料管線的規模基準與退步檢查')
+    parser.add_argument('--scales', type=parse_scale, nargs='+', default=DEFAULT_SCALES,
+                        help=f"規模：current（今天的資料）或每個 CSV 的列數（預設: {' '.join(DEFAULT_SCALES)}）")
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS), help='要量測的目標')
+    parser.add_argument('--repeat', type=int, default=3, help='每個目標的重複次數（取中位數）')
+    parser.add_argument('--timeout', type=float, default=600, help='單次執行的逾時秒數')
+    parser.add_argument('--seed', type=int, default=20260131, help='亂數種子')
+    parser.add_argument('--tracemalloc', action='store_true', help='另外量測 Python 物件配置的峰值')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help=f'基準線路徑（預設: {BASELINE_PATH.name}）')
+    parser.add_argument('--save', action='store_true', help='把本次結果寫入基準線')
+    parser.add_argument('--check', action='store_true', help='與基準線比較，有退步時回傳 1')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='時間的容許倍數（預設: 1.5）')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='小於此秒數的差距不算退步（預設: 0.05）')
+    parser.add_argument('--memory-tolerance', type=float, default=1.5, help='峰值 RSS 的容許倍數（預設: 1.5）')
+    parser.add_argument('--min-memory', type=float, default=16, help='小於此 MiB 的差距不算退步（預設: 16）')
+    parser.add_argument('--child', choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(args.child, args.tracemalloc)
+    if args.repeat < 1:
+        parser.error('--repeat 必須大於 0')
+
+    baseline = load_baseline(args.baseline)
+    if args.check and baseline is None:
+        print(f'[ERROR] 找不到基準線：{args.baseline}（先以 --save 產生）')
+        return 1
+    if baseline and baseline.get('seed') != args.seed:
+        print(f"[WARN] 基準線的亂數種子為 {baseline.get('seed')}，與本次不同，比較結果不具意義")
+
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {t: {} for t in args.targets}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp)
+            start = time.perf_counter()
+            counts = prepare_workdir(work, None if scale == 'current' else int(scale), args.seed)
+            print(f"[INFO] 規模 {scale}：產生資料 {time.perf_counter() - start:.1f}s，"
+                  + '、'.join(f'{name} {n}' for name, n in counts.items()), flush=True)
+            # 依 TARGETS 的順序執行：convert 需要 update 寫出的 JSON
+            for target in (t for t in TARGETS if t in args.targets):
+                results[target][scale] = measure(target, work, args.repeat, args.timeout, args.tracemalloc)
+
+    print_table(results, baseline)
+
+    if args.save:
+        save_baseline(args.baseline, results, args, baseline)
+        print(f'[INFO] 已寫入基準線：{args.baseline}')
+    if args.check:
+        regressions = compare(results, baseline, args)
+        for line in regressions:
+            print(f'[REGRESSION] {line}')
+        if regressions:
+            return 1
+        print('[INFO] 沒有超出容許範圍的退步')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
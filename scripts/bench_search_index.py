@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+search_index 的查詢延遲基準與召回率檢查。
+
+用法：
+  python scripts/bench_search_index.py
+  python scripts/bench_search_index.py --sizes 100 1000 10000 --queries 500
+
+行為：
+  - 以固定亂數種子，從 health-guidelines.json 的實際文字取片段，合成各物種指定數量的 condition 文件
+  - 量測建索引耗時、postings 大小（JSON / gzip）與 shard 數
+  - 從語料隨機取 1–4 字的片段當查詢，量測 SearchIndex.search（前 10 筆）的 p50 / p95 延遲
+    （cold：第一次查詢需解碼 postings；warm：同一查詢再執行一次），並與逐筆子字串比對的線性掃描比較
+  - 確認線性掃描找到的文件都出現在索引結果中（bigram 切詞不漏掉任何包含查詢字串的文件；
+    英數字以字首比對，查詢開頭的英數字必須位於詞首）
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+from artifact_writer import dumps_json_compact
+from search_index import (BODY_WEIGHT, TITLE_WEIGHT, Document, Partition, SearchIndex, normalize,
+                          query_terms)
+
+JSON_PATH = 'data/health-guidelines.json'
+
+
+def corpus_text(data: Dict[str, Any]) -> str:
+    """健康指引中所有 condition 與生命階段的文字，作為合成文件的取樣來源。"""
+    parts = []
+    for info in data.values():
+        if not isinstance(info, dict):
+            continue
+        for cond in info.get('commonConditions') or []:
+            parts += [cond.get('label', ''), cond.get('dietaryNote', ''), cond.get('tip', '')]
+        for detail in (info.get('lifeStages') or {}).values():
+            parts += (detail.get('healthTips') or []) + (detail.get('commonIssues') or [])
+    return '\n'.join(p for p in parts if p)
+
+
+def sample(rng: random.Random, text: str, low: int, high: int) -> str:
+    length = rng.randint(low, high)
+    start = rng.randrange(max(1, len(text) - length))
+    return text[start:start + length]
+
+
+def make_documents(rng: random.Random, text: str, n: int, scope: str) -> List[Document]:
+    docs = []
+    for i in range(n):
+        label = sample(rng, text, 4, 12)
+        docs.append(Document(f'condition:{scope}:c{i}', 'condition', label, f'c{i}', (
+            (TITLE_WEIGHT, label),
+            (BODY_WEIGHT, sample(rng, text, 10, 40)),
+            (BODY_WEIGHT, sample(rng, text, 10, 60)),
+        )))
+    return docs
+
+
+def make_queries(rng: random.Random, text: str, n: int) -> List[str]:
+    queries = []
+    while len(queries) < n:
+        q = sample(rng, text, 1, 4).strip()
+        if query_terms(q):
+            queries.append(q)
+    return queries
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def linear_scan(texts: List[Tuple[str, str]], query: str) -> List[str]:
+    """現況的做法：逐筆對（已正規化的）文件文字做子字串比對（查詢以英數字開頭時須從詞首比對起）。"""
+    needle = normalize(query)
+    pattern = re.compile(('(?<![a-z0-9])' if re.match('[a-z0-9]', needle) else '') + re.escape(needle))
+    return [doc_id for doc_id, text in texts if pattern.search(text)]
+
+
+def timed(fn, *args) -> Tuple[float, Any]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='search_index 查詢延遲基準')
+    parser.add_argument('--json', default=JSON_PATH, help='健康指引 JSON 路徑')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='每個物種的文件數')
+    parser.add_argument('--species', type=int, default=4, help='物種（範圍）數')
+    parser.add_argument('--queries', type=int, default=300, help='查詢數')
+    parser.add_argument('--seed', type=int, default=20260131, help='亂數種子')
+    args = parser.parse_args(argv)
+
+    with open(args.json, 'r', encoding='utf-8') as f:
+        text = corpus_text(json.load(f))
+
+    print(f"{'docs':>8} {'build (s)':>9} {'shards':>6} {'KiB':>8} {'gz KiB':>8} "
+          f"{'cold p50':>9} {'cold p95':>9} {'warm p50':>9} {'scan p50':>9} {'recall':>7}")
+    misses = 0
+    for n in args.sizes:
+        rng = random.Random(args.seed + n)
+        scopes = [f's{i}' for i in range(args.species)]
+        documents = {scope: make_documents(rng, text, n, scope) for scope in scopes}
+        queries = make_queries(rng, text, args.queries)
+        # 各欄位以換行分隔，避免查詢字串跨欄位命中
+        texts = [(d.id, '\n'.join(normalize(t) for _, t in d.fields)) for docs in documents.values() for d in docs]
+
+        t_build, partitions = timed(lambda: {s: Partition.build(s, docs) for s, docs in documents.items()})
+        payload = b''.join(dumps_json_compact(p.shard(i)) for p in partitions.values() for i in range(p.shard_count))
+        shards = sum(p.shard_count for p in partitions.values())
+
+        # 每個查詢使用全新的索引物件，cold 包含解碼 postings 的成本
+        cold, warm, scan = [], [], []
+        missing = 0
+        for q in queries:
+            index = SearchIndex({s: Partition(s, p.docs, p.lengths, p.shard_count, list(p.shards))
+                                 for s, p in partitions.items()})
+            t, hits = timed(index.search, q)
+            cold.append(t)
+            warm.append(timed(index.search, q)[0])
+            t, expected = timed(linear_scan, texts, q)
+            scan.append(t)
+            found = {h.doc['id'] for h in index.search(q, limit=None)}
+            missing += sum(1 for doc_id in expected if doc_id not in found)
+        misses += missing
+
+        ms = 1e3
+        print(f"{n * args.species:>8} {t_build:>9.3f} {shards:>6} {len(payload) / 1024:>8.1f} "
+              f"{len(gzip.compress(payload)) / 1024:>8.1f} {percentile(cold, 0.5) * ms:>7.3f}ms "
+              f"{percentile(cold, 0.95) * ms:>7.3f}ms {percentile(warm, 0.5) * ms:>7.3f}ms "
+              f"{percentile(scan, 0.5) * ms:>7.3f}ms {'ok' if not missing else missing:>7}")
+
+    if misses:
+        print(f"[ERROR] 有 {misses} 筆包含查詢字串的文件未出現在索引結果中")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
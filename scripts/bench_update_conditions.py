@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+update_conditions 的效能基準與正確性比對。
+
+用法：
+  python scripts/bench_update_conditions.py
+  python scripts/bench_update_conditions.py --sizes 1000 10000 100000 --reference-max 4000
+
+行為：
+  - 以固定亂數種子產生合成的 health_conditions 列（含 id 重複、無 id、label 更名、跨物種）
+  - 量測 update_conditions 在各資料量的耗時與每列成本，確認近似線性
+  - 在 --reference-max 以內的資料量，同時執行舊版（每列重建索引）的實作，
+    並確認兩者輸出的 JSON 位元組完全一致
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from update_health_json import slugify, map_name_to_key, update_conditions
+
+SPECIES = [('cat', '貓咪'), ('dog', '狗狗'), ('rabbit', '兔子'), ('hamster', '倉鼠')]
+
+
+def make_data(rng: random.Random, base: int) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for key, name in SPECIES:
+        conds = []
+        for i in range(base):
+            cond = {'label': f'疾病{i}', 'dietaryNote': f'飲食{i}', 'tip': f'叮嚀{i}'}
+            if rng.random() < 0.9:
+                cond = {'id': f'cond_{rng.randrange(base)}', **cond}
+            conds.append(cond)
+        data[key] = {'name': name, 'commonConditions': conds}
+    return data
+
+
+def make_rows(rng: random.Random, n: int) -> List[Dict[str, str]]:
+    rows = []
+    id_space = max(10, n // 2)
+    for i in range(n):
+        _, name = rng.choice(SPECIES)
+        roll = rng.random()
+        if roll < 0.6:
+            cid, label = f'cond_{rng.randrange(id_space)}', f'疾病{rng.randrange(id_space)}'
+        elif roll < 0.8:
+            cid, label = '', f'疾病{rng.randrange(id_space)}'
+        elif roll < 0.9:
+            cid, label = '', f'Condition {rng.randrange(id_space)}'
+        else:
+            cid, label = f'cond_{i}', f'Label {i}'
+        rows.append({
+            '物種': name,
+            'id': cid,
+            '疾病項目': label,
+            '飲食注意': rng.choice(['', f'飲食注意{i}']),
+            '專家叮嚀': rng.choice(['', f'專家叮嚀{i}']),
+        })
+    return rows
+
+
+# ---- 舊版實作（每列重建 idx_by_id / idx_by_label），僅供比對 ----
+
+def reference_update_conditions(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
+    """Update commonConditions for each species. Dedupe by label. Returns number of upserts."""
+    name2key = map_name_to_key(data)
+    changes = 0
+    for r in rows:
+        # 支援兩種來源欄位
+        species = r.get('物種') or r.get('\u7269\u7a2e')
+        label = r.get('疾病項目') or r.get('\u75be\u75c5\u9805\u76ee')
+        if not species or not label:
+            continue
+        key = name2key.get(species)
+        if not key:
+            continue
+        cid = (r.get('id') or r.get('ID') or '').strip()
+        dietary = r.get('飲食注意') or r.get('\u98f2\u98df\u6ce8\u610f') or ''
+        tip = r.get('專家叮嚀') or r.get('\u5c08\u5bb6\u53ee\u5680') or ''
+
+        if 'commonConditions' not in data[key]:
+            data[key]['commonConditions'] = []
+        # build index by id + label
+        idx_by_id = {c.get('id'): c for c in data[key]['commonConditions'] if c.get('id')}
+        idx_by_label = {c.get('label'): c for c in data[key]['commonConditions'] if c.get('label')}
+        if not cid:
+            cid = slugify(label)
+
+        if cid in idx_by_id:
+            obj = idx_by_id[cid]
+        elif label in idx_by_label:
+            obj = idx_by_label[label]
+        else:
+            obj = None
+
+        if obj:
+            obj['label'] = label or obj.get('label', '')
+            obj['dietaryNote'] = dietary or obj.get('dietaryNote', '')
+            obj['tip'] = tip or obj.get('tip', '')
+            obj['id'] = cid
+        else:
+            data[key]['commonConditions'].append({
+                'id': cid,
+                'label': label,
+                'dietaryNote': dietary,
+                'tip': tip,
+            })
+        changes += 1
+    # 確保所有 commonConditions 都有 id
+    for key in data:
+        if isinstance(data[key], dict) and 'commonConditions' in data[key]:
+            for cond in data[key]['commonConditions']:
+                if 'id' not in cond or not cond['id']:
+                    cond['id'] = slugify(cond.get('label', ''))
+    # 去重：同一 id 只保留最後一筆（避免重複與舊值殘留）
+    for key in data:
+        if isinstance(data[key], dict) and 'commonConditions' in data[key]:
+            conds = data[key]['commonConditions']
+            seen = set()
+            dedup_rev = []
+            for cond in reversed(conds):
+                cid = cond.get('id')
+                if cid and cid in seen:
+                    continue
+                if cid:
+                    seen.add(cid)
+                dedup_rev.append(cond)
+            data[key]['commonConditions'] = list(reversed(dedup_rev))
+    return changes
+
+
+def dumps(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='update_conditions 效能基準')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='CSV 列數')
+    parser.add_argument('--base', type=int, default=50, help='每個物種既有的 commonConditions 數量')
+    parser.add_argument('--reference-max', type=int, default=4000, help='執行舊版比對的最大列數')
+    parser.add_argument('--seed', type=int, default=20260131, help='亂數種子')
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>8} {'new (s)':>10} {'us/row':>8} {'old (s)':>10} {'identical':>9}")
+    mismatches = 0
+    for n in args.sizes:
+        rng = random.Random(args.seed + n)
+        data = make_data(rng, args.base)
+        rows = make_rows(rng, n)
+
+        new_data = copy.deepcopy(data)
+        t_new = timed(update_conditions, new_data, rows)
+
+        old_cell, same_cell = '-', '-'
+        if n <= args.reference_max:
+            old_data = copy.deepcopy(data)
+            t_old = timed(reference_update_conditions, old_data, rows)
+            same = dumps(new_data) == dumps(old_data)
+            mismatches += not same
+            old_cell, same_cell = f'{t_old:.3f}', 'yes' if same else 'NO'
+        print(f"{n:>8} {t_new:>10.3f} {t_new / n * 1e6:>8.2f} {old_cell:>10} {same_cell:>9}")
+
+    if mismatches:
+        print(f"[ERROR] {mismatches} 組資料的輸出與舊版不一致")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
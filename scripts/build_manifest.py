@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+資料建置的內容雜湊清單（manifest）與「內容有變才寫入」工具。
+
+manifest 以 JSON 記錄：
+  - inputs：每個輸入檔的 sha256
+  - outputs：每個輸出檔的 sha256 與產生它的 stage
+
+用途：
+  - 輸入雜湊未變、且該 stage 的輸出仍與上次一致時，略過該 stage
+  - 輸出內容與磁碟上的檔案完全相同時不重寫，避免改動 mtime 與 CDN 快取
+    （寫入與平行化由 artifact_writer 負責）
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from artifact_writer import ArtifactResult, dumps_json, write_artifacts, write_if_changed
+
+# 調整 manifest 結構或 stage 語意時遞增，舊 manifest 會被視為失效而全部重建
+MANIFEST_VERSION = 1
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: Path) -> Optional[str]:
+    """回傳檔案的 sha256；檔案不存在時回傳 None。"""
+    h = hashlib.sha256()
+    try:
+        with path.open('rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+class BuildManifest:
+    """讀寫建置 manifest；路徑一律以字串（posix 格式）作為 key。"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.inputs: Dict[str, str] = {}
+        self.outputs: Dict[str, Dict[str, str]] = {}
+        self.valid = False
+        if path.exists():
+            try:
+                with path.open('r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                if raw.get('version') == MANIFEST_VERSION:
+                    self.inputs = dict(raw.get('inputs') or {})
+                    self.outputs = dict(raw.get('outputs') or {})
+                    self.valid = True
+            except (OSError, ValueError, AttributeError):
+                self.valid = False
+
+    @staticmethod
+    def key(path: Path) -> str:
+        return Path(path).as_posix()
+
+    def input_changed(self, name: str, digest: Optional[str]) -> bool:
+        return not self.valid or self.inputs.get(name) != digest
+
+    def record_input(self, name: str, digest: Optional[str]) -> None:
+        if digest is None:
+            self.inputs.pop(name, None)
+        else:
+            self.inputs[name] = digest
+
+    def output_hash(self, path: Path) -> Optional[str]:
+        entry = self.outputs.get(self.key(path))
+        return entry.get('sha256') if entry else None
+
+    def record_output(self, path: Path, digest: str, stage: str) -> None:
+        self.outputs[self.key(path)] = {'sha256': digest, 'stage': stage}
+
+    def stage_outputs(self, stage: str) -> Iterable[Path]:
+        return [Path(p) for p, entry in self.outputs.items() if entry.get('stage') == stage]
+
+    def forget_stage(self, stage: str) -> None:
+        """清除某 stage 的輸出紀錄（重跑該 stage 前呼叫，避免殘留不再產生的檔案）。"""
+        self.outputs = {p: e for p, e in self.outputs.items() if e.get('stage') != stage}
+
+    def stale_stages(self) -> Set[str]:
+        """回傳有輸出檔遺失或被外部修改的 stage。"""
+        stale: Set[str] = set()
+        for p, entry in self.outputs.items():
+            if sha256_file(Path(p)) != entry.get('sha256'):
+                stale.add(entry.get('stage', ''))
+        return stale
+
+    def write_output(self, path: Path, data: bytes, stage: str) -> bool:
+        """寫出輸出檔（內容有變才寫）並記錄雜湊。回傳是否實際寫入。"""
+        written = write_if_changed(path, data)
+        self.record_output(path, sha256_bytes(data), stage)
+        return written
+
+    def write_outputs(self, outputs: Iterable[Tuple[str, Path, Any]],
+                      workers: Optional[int] = None,
+                      serializer: Callable[[Any], bytes] = dumps_json,
+                      precompress: bool = False) -> List[ArtifactResult]:
+        """平行寫出 (stage, 路徑, payload) 並記錄雜湊；回傳各檔的寫入結果。"""
+        outputs = list(outputs)
+        results = write_artifacts(((path, payload) for _, path, payload in outputs), workers=workers,
+                                  serializer=serializer, precompress=precompress)
+        for (stage, _, _), result in zip(outputs, results):
+            self.record_output(result.path, result.sha256, stage)
+        return results
+
+    def save(self) -> None:
+        payload = {
+            'version': MANIFEST_VERSION,
+            'inputs': dict(sorted(self.inputs.items())),
+            'outputs': dict(sorted(self.outputs.items())),
+        }
+        write_if_changed(
+            self.path,
+            json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8'),
+        )
+        self.valid = True
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+最新消息的建置：於建置時把 news/posts/*.md 轉為 HTML，並產生以內容雜湊命名的分頁索引。
+
+輸入：
+  - news/news.json：公告清單（id、title、type、date、pinned、excerpt、content、autoExpand）
+  - news/posts/*.md：公告內文（content 欄位指向的檔案；.html 內文原樣使用）
+
+輸出（預設 news/dist/）：
+  - posts/{id}.{hash}.html：預先轉換好的內文 HTML 片段
+  - index-{page}.{hash}.json：分頁索引（置頂在前，其餘依日期新到舊），
+    每則公告多一個 html 欄位指向上面的片段
+  - manifest.json：分頁清單、公告總數與各類型數量；內容不含時間戳，資料沒變時位元組也不變。
+    source_sha256 為建置時 news.json 的 sha256（換行統一為 LF）；--check 比對它與目前的 news.json，
+    不同（新增公告後還沒重新建置）時回傳 1，供部署前或 CI 擋下過期的 news/dist/
+
+除 manifest 外的檔名都含內容雜湊，前端可永久快取，也不必再於瀏覽器執行 marked.parse。
+Markdown 的轉換結果以「原文 sha256」快取於 .build/news-render-cache.json，
+內文沒變的公告不會重新轉換；轉換器版本或擴充套件改變時整個快取失效。
+未安裝 Markdown 套件時只輸出索引（不含 html 欄位），前端會退回以 marked 轉換。
+
+用法：
+  python scripts/build_news.py
+  python scripts/build_news.py --compact --page-size 20
+  python scripts/build_news.py --check   # 只檢查 news/dist/ 是否由目前的 news.json 建置
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from artifact_writer import (HASH_LENGTH, HASH_PATTERN, ArtifactResult, atomic_write_bytes, dumps_json,
+                             dumps_json_compact, remove_unreferenced, update_build_report, write_artifact,
+                             write_artifacts)
+from instrumentation import NULL_METRICS, Metrics, add_arguments, instrumented
+
+try:
+    import markdown
+except ImportError:  # 選用套件：沒有時不預先轉換內文
+    markdown = None
+
+NEWS_DIR = 'news'
+INDEX_NAME = 'news.json'
+POSTS_DIR_NAME = 'posts'
+DIST_DIR_NAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+CACHE_PATH = '.build/news-render-cache.json'
+REPORT_PATH = '.build/build-report.json'
+PAGE_SIZE = 10
+# 與 marked 預設行為相近的擴充：表格、圍欄程式碼區塊、較寬鬆的清單
+MARKDOWN_EXTENSIONS = ('extra', 'sane_lists')
+MANIFEST_VERSION = 1
+
+
+class NewsError(ValueError):
+    """news.json 的內容有誤（缺少欄位、id 重複、內文檔案不存在等）。"""
+
+
+def renderer_id() -> Optional[str]:
+    """快取用的轉換器識別字串；未安裝 Markdown 套件時為 None。"""
+    if markdown is None:
+        return None
+    return f"markdown-{markdown.__version__}:{','.join(MARKDOWN_EXTENSIONS)}"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def source_hash(news_dir: Path) -> str:
+    """news.json 的 sha256；換行統一為 LF，Windows 上 checkout 成 CRLF 時也與網站上的檔案相同。"""
+    return hashlib.sha256((news_dir / INDEX_NAME).read_bytes().replace(b'\r\n', b'\n')).hexdigest()
+
+
+def load_news(news_dir: Path) -> List[Dict[str, Any]]:
+    """讀取並檢查 news.json；回傳公告 list（保留原本的欄位順序）。"""
+    with (news_dir / INDEX_NAME).open('r', encoding='utf-8') as f:
+        items = json.load(f)
+    if not isinstance(items, list):
+        raise NewsError(f'{INDEX_NAME} 應為陣列')
+    seen = set()
+    for i, item in enumerate(items):
+        for field in ('id', 'title', 'date', 'content'):
+            if not item.get(field):
+                raise NewsError(f'第 {i + 1} 則公告缺少 {field}')
+        if item['id'] in seen:
+            raise NewsError(f"公告 id 重複：{item['id']}")
+        seen.add(item['id'])
+        if not (news_dir / item['content']).is_file():
+            raise NewsError(f"公告 {item['id']} 的內文不存在：{item['content']}")
+    return items
+
+
+def sort_news(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """置頂在前，其餘依日期新到舊（同日期保留原順序），與 load-news.js 的 sortNews 相同。"""
+    by_date = sorted(items, key=lambda item: item['date'], reverse=True)
+    return sorted(by_date, key=lambda item: not item.get('pinned'))
+
+
+def orphan_posts(news_dir: Path, items: List[Dict[str, Any]]) -> List[str]:
+    """posts/ 中沒有被 news.json 參照的內文檔案。"""
+    referenced = {Path(item['content']).as_posix() for item in items}
+    posts_dir = news_dir / POSTS_DIR_NAME
+    if not posts_dir.is_dir():
+        return []
+    return sorted(f'{POSTS_DIR_NAME}/{p.name}' for p in posts_dir.iterdir()
+                  if p.suffix in ('.md', '.html') and f'{POSTS_DIR_NAME}/{p.name}' not in referenced)
+
+
+class RenderCache:
+    """Markdown 原文 sha256 → HTML 的快取；save() 只保留本次用到的項目。"""
+
+    def __init__(self, path: Optional[Path], renderer: Optional[str]):
+        self.path = Path(path) if path else None
+        self.renderer = renderer
+        self.entries: Dict[str, str] = {}
+        self.used: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('renderer') == renderer and isinstance(data.get('entries'), dict):
+            self.entries = data['entries']
+
+    def render(self, text: str) -> str:
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        html = self.entries.get(key)
+        if html is None:
+            html = markdown.markdown(text, extensions=list(MARKDOWN_EXTENSIONS))
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.used[key] = html
+        return html
+
+    def save(self) -> None:
+        if self.path is None or self.used == self.entries:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.path, dumps_json_compact({'renderer': self.renderer, 'entries': self.used}))
+
+
+def render_post(news_dir: Path, content: str, cache: RenderCache) -> Optional[str]:
+    """公告內文的 HTML；.md 需要 Markdown 套件（未安裝時回傳 None），其他檔案原樣使用。"""
+    text = (news_dir / content).read_text(encoding='utf-8')
+    if not content.endswith('.md'):
+        return text
+    if markdown is None:
+        return None
+    return cache.render(text)
+
+
+def build_news(news_dir: Path, cache_path: Optional[Path] = Path(CACHE_PATH), page_size: int = PAGE_SIZE,
+               serializer: Callable[[Any], bytes] = dumps_json, precompress: bool = False,
+               workers: Optional[int] = None,
+               metrics: Metrics = NULL_METRICS) -> Tuple[List[ArtifactResult], Dict[str, Any], Dict[str, Any]]:
+    """產生內文 HTML、分頁索引與 manifest（manifest 最後寫，確保它參照的檔案都已存在）。
+
+    回傳 (所有寫出檔案的結果, manifest, 統計)；統計含轉換快取命中數與未被參照的內文檔案。
+    """
+    news_dir = Path(news_dir)
+    dist_dir = news_dir / DIST_DIR_NAME
+    html_dir = dist_dir / POSTS_DIR_NAME
+    html_dir.mkdir(parents=True, exist_ok=True)
+    with metrics.stage('load_news') as timing:
+        loaded = load_news(news_dir)
+        items = sort_news(loaded)
+        timing.add_rows(len(items))
+    cache = RenderCache(cache_path, renderer_id())
+
+    html_artifacts = []
+    entries = []
+    with metrics.stage('render_posts') as timing:
+        for item in timing.iter(items):
+            entry = dict(item)
+            html = render_post(news_dir, item['content'], cache)
+            if html is not None:
+                payload = html.encode('utf-8')
+                fname = f"{item['id']}.{content_hash(payload)}.html"
+                html_artifacts.append((html_dir / fname, payload))
+                entry['html'] = f'{DIST_DIR_NAME}/{POSTS_DIR_NAME}/{fname}'
+            entries.append(entry)
+        cache.save()
+
+    page_count = max(1, -(-len(entries) // page_size))
+    page_artifacts = []
+    pages = []
+    for page in range(page_count):
+        chunk = entries[page * page_size:(page + 1) * page_size]
+        payload = serializer({'page': page + 1, 'pages': page_count, 'items': chunk})
+        fname = f'index-{page + 1}.{content_hash(payload)}.json'
+        page_artifacts.append((dist_dir / fname, payload))
+        pages.append({
+            'page': page + 1,
+            'file': f'{DIST_DIR_NAME}/{fname}',
+            'count': len(chunk),
+            'sha256': hashlib.sha256(payload).hexdigest(),
+            'bytes': len(payload),
+        })
+    with metrics.stage('write_json') as timing:
+        timing.add_rows(len(html_artifacts) + len(page_artifacts))
+        results = write_artifacts(html_artifacts + page_artifacts, workers=workers,
+                                  serializer=serializer, precompress=precompress)
+        timing.add_results(results)
+
+    types: Dict[str, int] = {}
+    for item in entries:
+        t = item.get('type') or 'general'
+        types[t] = types.get(t, 0) + 1
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'renderer': cache.renderer,
+        'total': len(entries),
+        'page_size': page_size,
+        'types': types,
+        'pinned': [item['id'] for item in entries if item.get('pinned')],
+        'source_sha256': source_hash(news_dir),
+        'pages': pages,
+    }
+    results.append(write_artifact(dist_dir / MANIFEST_NAME, manifest, serializer, precompress))
+
+    remove_unreferenced(html_dir, [Path(p).name for p, _ in html_artifacts], rf'.+\.{HASH_PATTERN}\.html')
+    remove_unreferenced(dist_dir, [Path(p).name for p, _ in page_artifacts], rf'index-\d+\.{HASH_PATTERN}\.json')
+    stats = {'hits': cache.hits, 'misses': cache.misses, 'orphans': orphan_posts(news_dir, loaded)}
+    return results, manifest, stats
+
+
+def check_dist(news_dir: Path) -> Optional[str]:
+    """news/dist/manifest.json 不是由目前的 news.json 建置時回傳原因，一致時回傳 None。"""
+    try:
+        with (news_dir / DIST_DIR_NAME / MANIFEST_NAME).open('r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return f'無法讀取 manifest：{e}'
+    if manifest.get('source_sha256') != source_hash(news_dir):
+        return f'{DIST_DIR_NAME}/{MANIFEST_NAME} 不是由目前的 {INDEX_NAME} 建置，請執行 scripts/build_news.py 並提交'
+    return None
+
+
+def main() -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description='產生最新消息的分頁索引與預先轉換的內文 HTML')
+    parser.add_argument('--news-dir', default=NEWS_DIR, help=f'news.json 所在目錄（預設: {NEWS_DIR}）')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f'每個分頁的公告數（預設: {PAGE_SIZE}）')
+    parser.add_argument('--cache', default=CACHE_PATH, help=f'Markdown 轉換快取路徑（預設: {CACHE_PATH}）')
+    parser.add_argument('--no-cache', action='store_true', help='不讀寫轉換快取，全部重新轉換')
+    parser.add_argument('--compact', action='store_true', help='索引以緊湊格式輸出，並產生 .gz / .br 預壓縮檔')
+    parser.add_argument('--report', default=REPORT_PATH, help=f'建置報告路徑（預設: {REPORT_PATH}）')
+    parser.add_argument('--check', action='store_true',
+                        help='不建置，只檢查 news/dist/ 是否由目前的 news.json 建置（過期時回傳 1）')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.page_size < 1:
+        parser.error('--page-size 必須大於 0')
+
+    news_dir = Path(args.news_dir)
+    if args.check:
+        problem = check_dist(news_dir)
+        print(f'❌ {problem}' if problem else f'✅ {DIST_DIR_NAME} 與 {INDEX_NAME} 一致')
+        return 1 if problem else 0
+    if markdown is None:
+        print('⚠️ 未安裝 Markdown 套件（pip install Markdown），只輸出索引，內文由前端轉換')
+    try:
+        with instrumented(args, 'build_news') as metrics:
+            results, manifest, stats = build_news(news_dir, None if args.no_cache else Path(args.cache),
+                                                  args.page_size, dumps_json_compact if args.compact else dumps_json,
+                                                  args.compact, metrics=metrics)
+    except (OSError, ValueError) as e:
+        print(f'❌ 最新消息建置失敗：{e}')
+        return 1
+    for path in stats['orphans']:
+        print(f'⚠️ 未列於 {INDEX_NAME} 的內文：{path}')
+    update_build_report(Path(args.report), results)
+
+    written = sum(1 for r in results if r.written)
+    print(f"✅ 已輸出 {news_dir / DIST_DIR_NAME}：{manifest['total']} 則公告、{len(manifest['pages'])} 頁，"
+          f"更新 {written}/{len(results)} 個檔案（轉換快取命中 {stats['hits']}，重新轉換 {stats['misses']}）")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
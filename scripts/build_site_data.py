@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+網站資料的單一建置入口：把各轉換腳本視為有宣告輸入 / 輸出的階段（DAG），一次建置全部資料。
+
+用法：
+  python scripts/build_site_data.py                    # 只重跑輸入有變的階段
+  python scripts/build_site_data.py --dry-run          # 列出各階段會執行或略過
+  python scripts/build_site_data.py --force            # 全部重跑
+  python scripts/build_site_data.py --only search_index stores_json   # 只建置指定階段（含其上游）
+
+階段（依 group 分組；同一組在同一個行程中依序執行，不同組同時執行）：
+  health  validate_csv        docs/*.csv 依 csv_schemas 檢查（有錯誤時下游不執行）
+          update_health_json  docs/*.csv → data/health-guidelines.json、health-deltas/
+          search_index        health-guidelines.json + news/ → data/search/
+          convert_health_data health-guidelines.json → data/guidelines_*.json、data/health/（含 deltas/）、docs/*.csv、temp_*.json
+  stores  stores_json         門市 CSV + 春節營運時間 CSV → mapping/PetStores_BranchInfo.json
+          store_catalog       門市 CSV + branches.yaml + brand_logos.json → mapping/store_catalog.json
+  news    build_news          news/news.json + posts/ → news/dist/
+
+行為：
+  - 略過：階段的輸入檔（glob 展開）、參數與上次相同，且上次的輸出檔都還在、內容沒被改動時不執行；
+    上游重跑後輸出有變，下游的輸入雜湊隨之改變而重跑。紀錄存於 .build/site-data-manifest.json；
+    下游改寫上游的輸入時（convert_health_data 重新輸出 docs/*.csv），上游紀錄改用寫出後的雜湊，下次不會因此重跑
+  - 共用輸入只解析一次：health 組內 health-guidelines.json 只讀一次，update_health_json 就地更新同一個
+    物件，search_index 與 convert_health_data 直接沿用；輸入雜湊以 (路徑, 大小, mtime) 快取，
+    validate_csv 與 update_health_json 不重複雜湊同一份 CSV
+  - 各組以 process pool 同時執行（--workers，預設為組數與 CPU 數的較小值），整體耗時取決於最慢的一組；
+    --workers 1 時在本行程依序執行
+  - 建置報告（.build/build-report.json）：各行程只收集產出檔大小，由本行程在全部完成後一次併入
+  - 各階段的輸出訊息先收集起來，完成後依階段順序印出（-q 只印結果列）；
+    失敗的階段記錄錯誤，同組下游階段標為 blocked，其他組照常完成，最後回傳 1
+  - --profile / --metrics-out：各階段與其內部子階段的量測（見 instrumentation.py）
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from artifact_writer import (ArtifactResult, collect_build_report, dumps_json, dumps_json_compact,
+                             update_build_report, write_if_changed)
+from build_manifest import sha256_file
+from instrumentation import Metrics, add_arguments, instrumented
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# mapping/ 的門市腳本（csv_to_json、store_catalog）與 scripts/ 的腳本在同一個行程中執行
+sys.path.append(str(REPO_ROOT / 'mapping'))
+
+MANIFEST_PATH = '.build/site-data-manifest.json'
+REPORT_PATH = '.build/build-report.json'
+# 調整階段定義或紀錄格式時遞增，舊紀錄會被視為失效而全部重跑
+MANIFEST_VERSION = 1
+
+GUIDELINES = 'data/health-guidelines.json'
+STORES_CSV = 'mapping/PetStores_BranchInfo.csv'
+HOLIDAY_CSV = 'docs/各門市春節營運時間.csv'
+HEALTH_CSVS = ('docs/health_life_stages.csv', 'docs/health_conditions.csv', 'docs/pet_breeds.csv',
+               'docs/activity_body_options.csv')
+NEWS_INPUTS = ('news/news.json', 'news/posts/*')
+
+
+class Stage(NamedTuple):
+    name: str
+    group: str
+    run: Callable[['StageContext'], Optional[int]]
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    deps: Tuple[str, ...] = ()
+    # 影響輸出的選項（Options 的欄位名稱）；值改變時視同輸入改變
+    params: Tuple[str, ...] = ()
+
+
+class Options(NamedTuple):
+    force: bool
+    compact: bool
+    holiday_year: Optional[int]
+    profile: bool
+    workers: Optional[int]
+
+
+class SharedInputs:
+    """同一個行程內各階段共用的解析結果與檔案雜湊。"""
+
+    def __init__(self):
+        self._json: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self._hashes: Dict[str, Tuple[Tuple[int, int], Optional[str]]] = {}
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def sha256(self, path: str) -> Optional[str]:
+        stamp = self._stamp(path)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        digest = sha256_file(Path(path)) if stamp is not None else None
+        self._hashes[path] = (stamp, digest)
+        return digest
+
+    def json(self, path: str) -> Any:
+        """解析後的 JSON；檔案沒變時回傳同一個物件（呼叫端若就地修改，須再呼叫 refresh）。"""
+        stamp = self._stamp(path)
+        cached = self._json.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self._json[path] = (stamp, data)
+        return data
+
+    def refresh(self, path: str, data: Any) -> None:
+        """data 已與磁碟上的 path 內容一致（例如剛由它寫出），之後的 json(path) 直接沿用。"""
+        self._json[path] = (self._stamp(path), data)
+
+    def forget(self, path: str) -> None:
+        self._json.pop(path, None)
+
+
+class StageContext(NamedTuple):
+    options: Options
+    shared: SharedInputs
+    metrics: Metrics
+
+
+# ---------------------------------------------------------------------------
+# 各階段（模組層級函式，process pool 中以名稱查表執行）
+# ---------------------------------------------------------------------------
+
+def _validate_csv(ctx: StageContext) -> int:
+    import validate_and_convert_health_csv
+    return validate_and_convert_health_csv.main(['--check', 'docs', '--workers', '1',
+                                                 '--guidelines', GUIDELINES, '--stores', STORES_CSV])
+
+
+def _update_health_json(ctx: StageContext) -> int:
+    import update_health_json
+    argv = ['--json', GUIDELINES] + (['--compact'] if ctx.options.compact else [])
+    if ctx.options.workers:
+        argv += ['--workers', str(ctx.options.workers)]
+    data = ctx.shared.json(GUIDELINES)
+    try:
+        status = update_health_json.run(update_health_json.build_parser().parse_args(argv), ctx.metrics, data)
+    except BaseException:
+        ctx.shared.forget(GUIDELINES)  # 可能只更新到一半
+        raise
+    ctx.shared.refresh(GUIDELINES, data)
+    return status
+
+
+def _search_index(ctx: StageContext) -> int:
+    from search_index import OUT_DIR, SearchIndex, write_search_index
+    with ctx.metrics.stage('build_index'):
+        index = SearchIndex.build(ctx.shared.json(GUIDELINES), Path('news'))
+    with ctx.metrics.stage('write_json') as timing:
+        results = write_search_index(index, Path(OUT_DIR), precompress=ctx.options.compact)
+        update_build_report(Path(REPORT_PATH), results)
+        timing.add_results(results)
+    return 0
+
+
+def _convert_health_data(ctx: StageContext) -> int:
+    import convert_health_data
+    convert_health_data.OUTPUT_DIR = 'docs'
+    convert_health_data.CSV_HAMSTER_BREEDS = 'docs/hamster_breeds.csv'
+    convert_health_data.COMPACT = ctx.options.compact
+    convert_health_data.WORKERS = ctx.options.workers
+    convert_health_data.METRICS = ctx.metrics
+    # 只補齊缺少的 condition id（update_health_json 已補齊），之後的階段看到的仍與 JSON 檔一致
+    convert_health_data.convert_health_guidelines(ctx.shared.json(GUIDELINES))
+    return 0
+
+
+def _stores_json(ctx: StageContext) -> int:
+    import csv_to_json
+    csv_to_json.csv_to_json(STORES_CSV, 'mapping/PetStores_BranchInfo.json', HOLIDAY_CSV,
+                            ctx.options.holiday_year, ctx.metrics)
+    return 0
+
+
+def _store_catalog(ctx: StageContext) -> int:
+    import store_catalog
+    catalog, issues = store_catalog.compile_catalog(STORES_CSV, 'mapping/branches.yaml', 'mapping/brand_logos.json',
+                                                    HOLIDAY_CSV, ctx.options.holiday_year)
+    write_if_changed(Path('mapping/store_catalog.json'),
+                     json.dumps(catalog, ensure_ascii=False, indent=2).encode('utf-8'))
+    for issue in issues:
+        print(store_catalog.format_issue(issue))
+    return 0
+
+
+def _build_news(ctx: StageContext) -> int:
+    from build_news import CACHE_PATH, build_news
+    serializer = dumps_json_compact if ctx.options.compact else dumps_json
+    results, _, _ = build_news(Path('news'), Path(CACHE_PATH), serializer=serializer,
+                               precompress=ctx.options.compact, workers=ctx.options.workers, metrics=ctx.metrics)
+    update_build_report(Path(REPORT_PATH), results)
+    return 0
+
+
+# 依執行順序排列：同一組內依此順序執行，deps 只能指向前面的階段
+STAGES = (
+    Stage('validate_csv', 'health', _validate_csv, ('docs/*.csv', GUIDELINES, STORES_CSV), ()),
+    Stage('update_health_json', 'health', _update_health_json, HEALTH_CSVS + (GUIDELINES,),
+          (GUIDELINES, 'data/health-guidelines.version.json', 'data/health-deltas/*'),
+          deps=('validate_csv',), params=('compact',)),
+    Stage('search_index', 'health', _search_index, (GUIDELINES,) + NEWS_INPUTS, ('data/search/*',),
+          deps=('update_health_json',), params=('compact',)),
+    Stage('convert_health_data', 'health', _convert_health_data, (GUIDELINES, 'docs/pet_breeds.csv'),
+          ('data/guidelines_*.json', 'data/health/*', 'data/health/deltas/*', 'data/temp_*.json') + HEALTH_CSVS,
+          deps=('update_health_json',), params=('compact',)),
+    Stage('stores_json', 'stores', _stores_json, (STORES_CSV, HOLIDAY_CSV), ('mapping/PetStores_BranchInfo.json',),
+          params=('holiday_year',)),
+    Stage('store_catalog', 'stores', _store_catalog,
+          (STORES_CSV, HOLIDAY_CSV, 'mapping/branches.yaml', 'mapping/brand_logos.json'),
+          ('mapping/store_catalog.json',), params=('holiday_year',)),
+    Stage('build_news', 'news', _build_news, NEWS_INPUTS, ('news/dist/*', 'news/dist/posts/*'), params=('compact',)),
+)
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+# ---------------------------------------------------------------------------
+# 指紋與略過判斷
+# ---------------------------------------------------------------------------
+
+def expand(patterns: Iterable[str]) -> List[str]:
+    """展開 glob（不存在的一般路徑也保留，讓「檔案消失」成為可比較的變化）。"""
+    paths: Set[str] = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.update(p.replace(os.sep, '/') for p in glob.glob(pattern) if os.path.isfile(p))
+        else:
+            paths.add(pattern)
+    return sorted(paths)
+
+
+def fingerprint(patterns: Iterable[str], shared: SharedInputs) -> Dict[str, Optional[str]]:
+    return {path: shared.sha256(path) for path in expand(patterns)}
+
+
+def stage_params(stage: Stage, options: Options) -> Dict[str, Any]:
+    return {name: getattr(options, name) for name in stage.params}
+
+
+def is_fresh(stage: Stage, record: Optional[Dict[str, Any]], options: Options, shared: SharedInputs) -> bool:
+    """輸入、參數與上次相同，且上次的輸出都還在且未被改動。"""
+    if options.force or not record:
+        return False
+    if record.get('params') != stage_params(stage, options):
+        return False
+    if record.get('inputs') != fingerprint(stage.inputs, shared):
+        return False
+    outputs = record.get('outputs') or {}
+    return bool(outputs) == bool(stage.outputs) and outputs == fingerprint(stage.outputs, shared)
+
+
+def make_record(stage: Stage, inputs: Dict[str, Optional[str]], options: Options,
+                shared: SharedInputs) -> Dict[str, Any]:
+    outputs = fingerprint(stage.outputs, shared)
+    # 同時是輸入與輸出的檔案（例如 update_health_json 的 JSON）以寫出後的內容為準，下次才不會誤判為已改變
+    inputs = {path: outputs.get(path, digest) for path, digest in inputs.items()}
+    return {'params': stage_params(stage, options), 'inputs': inputs, 'outputs': outputs}
+
+
+def upstream(name: str) -> Set[str]:
+    """name 的所有上游階段。"""
+    found: Set[str] = set()
+    pending = list(STAGES_BY_NAME[name].deps)
+    while pending:
+        dep = pending.pop()
+        if dep not in found:
+            found.add(dep)
+            pending.extend(STAGES_BY_NAME[dep].deps)
+    return found
+
+
+def settle_upstream(records: Dict[str, Any], name: str) -> None:
+    """name 剛執行完：它改寫了上游階段的輸入檔時（convert_health_data 由 JSON 重新輸出 docs/*.csv），
+    以寫出後的雜湊更新上游紀錄，這些檔案由上游的輸出推得，下次不必因此重跑上游。"""
+    outputs = records[name]['outputs']
+    for dep in upstream(name):
+        inputs = (records.get(dep) or {}).get('inputs') or {}
+        for path in inputs.keys() & outputs.keys():
+            inputs[path] = outputs[path]
+
+
+# ---------------------------------------------------------------------------
+# 執行
+# ---------------------------------------------------------------------------
+
+def run_group(names: List[str], records: Dict[str, Any], options: Options,
+              failed: Set[str] = frozenset(), shared: Optional[SharedInputs] = None) -> List[Dict[str, Any]]:
+    """依序執行同一組的階段，回傳各階段的結果（可 pickle 的 dict）。
+
+    failed 為已失敗的上游階段；shared 可沿用同一行程先前的解析結果（watch 模式）。
+    各階段寫出檔案的大小不直接寫入建置報告，而是放在結果的 'report'，由呼叫端以 merge_reports 一次併入。
+    """
+    shared = shared if shared is not None else SharedInputs()
+    broken = set(failed)
+    outcomes = []
+    for name in names:
+        stage = STAGES_BY_NAME[name]
+        outcome: Dict[str, Any] = {'stage': name, 'seconds': 0.0, 'output': '', 'metrics': [], 'report': []}
+        outcomes.append(outcome)
+        blocked = [dep for dep in stage.deps if dep in broken]
+        if blocked:
+            outcome['status'] = 'blocked'
+            outcome['error'] = f"上游階段失敗：{', '.join(blocked)}"
+            broken.add(name)
+            continue
+        if is_fresh(stage, records.get(name), options, shared):
+            outcome['status'] = 'skipped'
+            continue
+
+        inputs = fingerprint(stage.inputs, shared)
+        metrics = Metrics(name, enabled=options.profile, trace_memory=options.profile)
+        buffer = io.StringIO()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(buffer), metrics.stage(name), collect_build_report() as report:
+                status = stage.run(StageContext(options, shared, metrics))
+        except Exception:
+            status = None
+            outcome['error'] = traceback.format_exc(limit=-3).strip()
+        outcome['report'] = list(report)
+        outcome['seconds'] = time.perf_counter() - start
+        outcome['output'] = buffer.getvalue()
+        outcome['metrics'] = metrics.records()
+        metrics.close()
+        if status:
+            outcome['error'] = f'回傳 {status}'
+        if 'error' in outcome:
+            outcome['status'] = 'failed'
+            broken.add(name)
+            continue
+        outcome['status'] = 'ran'
+        outcome['record'] = make_record(stage, inputs, options, shared)
+    return outcomes
+
+
+def merge_reports(outcomes: Iterable[Dict[str, Any]]) -> None:
+    """把各階段收集的產出檔大小一次併入建置報告。"""
+    results: List[ArtifactResult] = [r for o in outcomes for r in o.get('report', ())]
+    if results:
+        update_build_report(Path(REPORT_PATH), results)
+
+
+def select_stages(only: Optional[List[str]]) -> List[Stage]:
+    """--only 指定的階段與其所有上游；未指定時為全部。"""
+    if not only:
+        return list(STAGES)
+    wanted: Set[str] = set()
+    pending = list(only)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(STAGES_BY_NAME[name].deps)
+    return [stage for stage in STAGES if stage.name in wanted]
+
+
+def group_plan(stages: List[Stage]) -> Dict[str, List[str]]:
+    groups: Dict[str, List[str]] = {}
+    for stage in stages:
+        groups.setdefault(stage.group, []).append(stage.name)
+    return groups
+
+
+def group_deps(groups: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """各組依賴的其他組（組內的 deps 由 run_group 依序處理）。"""
+    owner = {name: group for group, names in groups.items() for name in names}
+    return {group: {owner[dep] for name in names for dep in STAGES_BY_NAME[name].deps
+                    if dep in owner and owner[dep] != group}
+            for group, names in groups.items()}
+
+
+def schedule(groups: Dict[str, List[str]], records: Dict[str, Any], options: Options,
+             workers: int, on_done: Callable[[List[Dict[str, Any]]], None]) -> None:
+    """依組間依賴排程；沒有相互依賴的組同時在 process pool 中執行。"""
+    deps = group_deps(groups)
+    done: Set[str] = set()
+    failed: Set[str] = set()
+
+    def finish(outcomes: List[Dict[str, Any]]) -> None:
+        failed.update(o['stage'] for o in outcomes if o['status'] in ('failed', 'blocked'))
+        on_done(outcomes)
+
+    if workers <= 1:
+        pending = list(groups)
+        while pending:
+            group = next(g for g in pending if deps[g] <= done)
+            pending.remove(group)
+            finish(run_group(groups[group], records, options, failed))
+            done.add(group)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running: Dict[Any, str] = {}
+        pending = list(groups)
+        while pending or running:
+            for group in [g for g in pending if deps[g] <= done]:
+                pending.remove(group)
+                running[executor.submit(run_group, groups[group], records, options, set(failed))] = group
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
+                finish(future.result())
+
+
+def print_outcome(o: Dict[str, Any], quiet: bool = False) -> None:
+    stage = STAGES_BY_NAME[o['stage']]
+    if o['status'] == 'skipped':
+        print(f"  –  {stage.group:<7} {stage.name:<20} 略過（未變更）")
+        return
+    mark = {'ran': '✅', 'failed': '❌', 'blocked': '⏸'}[o['status']]
+    print(f"  {mark} {stage.group:<7} {stage.name:<20} {o['seconds']:7.2f}s")
+    if o['output'] and (not quiet or o['status'] == 'failed'):
+        for line in o['output'].rstrip().splitlines():
+            print(f'       │ {line}')
+    for line in o.get('error', '').splitlines():
+        print(f'       ✗ {line}')
+
+
+def load_records(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open('r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(raw, dict) or raw.get('version') != MANIFEST_VERSION:
+        return {}
+    return raw.get('stages') or {}
+
+
+def save_records(path: Path, records: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {'version': MANIFEST_VERSION, 'stages': dict(sorted(records.items()))}
+    write_if_changed(path, dumps_json(payload))
+
+
+def dry_run(stages: List[Stage], records: Dict[str, Any], options: Options) -> None:
+    shared = SharedInputs()
+    dirty: Set[str] = set()
+    for stage in stages:
+        if any(dep in dirty for dep in stage.deps):
+            reason = '上游會重跑'
+        elif not is_fresh(stage, records.get(stage.name), options, shared):
+            reason = '--force' if options.force else ('沒有紀錄' if stage.name not in records else '輸入、參數或輸出有變')
+        else:
+            print(f'  –  {stage.group:<7} {stage.name:<20} 略過（未變更）')
+            continue
+        dirty.add(stage.name)
+        print(f'  ▶  {stage.group:<7} {stage.name:<20} 執行（{reason}）')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='一次建置網站的所有資料（只重跑輸入有變的階段）')
+    parser.add_argument('--only', nargs='+', choices=list(STAGES_BY_NAME), help='只建置指定階段（含其上游）')
+    parser.add_argument('--force', action='store_true', help='忽略紀錄，全部重跑')
+    parser.add_argument('--dry-run', action='store_true', help='只列出各階段會執行或略過')
+    parser.add_argument('--workers', type=int, help='同時執行的組數（預設: 組數與 CPU 數的較小值；1 = 依序執行）')
+    parser.add_argument('--compact', action='store_true', help='JSON 以緊湊格式輸出，並產生 .gz / .br 預壓縮檔')
+    parser.add_argument('--holiday-year', type=int,
+                        help='春節營運時間 CSV 日期標頭未標年份時使用的年份')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help=f'階段紀錄路徑（預設: {MANIFEST_PATH}）')
+    parser.add_argument('--root', default=str(REPO_ROOT), help='專案根目錄（預設: 本腳本的上一層）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不印出各階段的輸出訊息')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    os.chdir(args.root)
+    stages = select_stages(args.only)
+    options = Options(args.force, args.compact, args.holiday_year,
+                      bool(args.profile or args.metrics_out), None)
+    manifest_path = Path(args.manifest)
+    records = load_records(manifest_path)
+    if args.dry_run:
+        dry_run(stages, records, options)
+        return 0
+
+    groups = group_plan(stages)
+    workers = args.workers or min(len(groups), os.cpu_count() or 1)
+    failures = []
+    finished: List[Dict[str, Any]] = []
+    ran = blocked = 0
+    total_stage_time = 0.0
+    start = time.perf_counter()
+    with instrumented(args, 'build_site_data') as metrics:
+        def on_done(outcomes: List[Dict[str, Any]]) -> None:
+            nonlocal ran, blocked, total_stage_time
+            finished.extend(outcomes)
+            for o in outcomes:
+                stage = STAGES_BY_NAME[o['stage']]
+                total_stage_time += o['seconds']
+                metrics.extend(o['metrics'])
+                print_outcome(o, args.quiet)
+                if o['status'] == 'ran':
+                    ran += 1
+                    records[stage.name] = o['record']
+                    settle_upstream(records, stage.name)
+                elif o['status'] == 'failed':
+                    # 失敗的階段不留紀錄，下次一定重跑；blocked 的階段沒有執行，保留上次的紀錄
+                    records.pop(stage.name, None)
+                    failures.append(o)
+                elif o['status'] == 'blocked':
+                    blocked += 1
+            save_records(manifest_path, records)
+
+        schedule(groups, records, options, workers, on_done)
+        merge_reports(finished)
+
+    elapsed = time.perf_counter() - start
+    skipped = len(stages) - ran - blocked - len(failures)
+    blocked_note = f'、因上游失敗未執行 {blocked} 個' if blocked else ''
+    print(f"{'❌' if failures else '✅'} 執行 {ran} 個階段、略過 {skipped} 個、失敗 {len(failures)} 個{blocked_note}；"
+          f"耗時 {elapsed:.2f}s（各階段合計 {total_stage_time:.2f}s，{workers} 個行程）")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
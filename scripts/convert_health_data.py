@@ -1,8 +1,13 @@
+import csv
 import json
-import pandas as pd
 import os
 from pathlib import Path
 
+from artifact_writer import brotli, dumps_json, dumps_json_compact, update_build_report, write_artifacts
+from instrumentation import NULL_METRICS, add_arguments, instrumented
+from species_bundles import write_species_bundles
+from stream_io import CsvStream
+
 # 設定路徑（JSON 固定在 data）
 JSON_PATH = 'data/health-guidelines.json'
 # 輸出目錄預設為 docs，可由 CLI --out-dir 覆寫
@@ -10,6 +15,18 @@ JSON_PATH = 'data/health-guidelines.json'
 CSV_HAMSTER_BREEDS = None
 OUTPUT_DIR = 'docs'
 
+# 為 True 時以 pandas 輸出 CSV（舊行為，由 CLI --pandas 開啟）；預設使用標準函式庫 csv，
+# 只在需要時才 import pandas，避免每次執行都付出 pandas 的載入成本
+USE_PANDAS = False
+# per-species JSON 產出檔的平行寫入執行緒數（None = CPU 數，由 CLI --workers 覆寫）
+WORKERS = None
+# 為 True 時 data/ 下的 JSON 以緊湊格式輸出並附 .gz / .br 預壓縮檔（由 CLI --compact 開啟）
+COMPACT = False
+# 記錄各產出檔原始 / 壓縮後大小的建置報告
+REPORT_PATH = '.build/build-report.json'
+# 分階段量測（由 CLI --profile / --metrics-out 開啟，見 instrumentation.py）
+METRICS = NULL_METRICS
+
 # 匯入時若 CSV 無「品種key」欄位，才用此對照表（向後相容）
 HAMSTER_LABEL_TO_KEY = {
     '黃金鼠': 'syrian',
@@ -19,42 +36,86 @@ HAMSTER_LABEL_TO_KEY = {
 }
 
 
-def convert_health_guidelines():
-    if not os.path.exists(JSON_PATH):
-        print(f"[ERROR] 找不到檔案: {JSON_PATH}")
-        return
-
-    with open(JSON_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+def write_csv(path, rows, columns=None):
+    """以 utf-8-sig 寫出 CSV；格式與 pandas.DataFrame.to_csv(index=False) 相同（LF 換行、必要時加引號）。"""
+    if columns is None:
+        columns = list(dict.fromkeys(k for r in rows for k in r))
+    with METRICS.stage(f'export_csv/{Path(path).stem}') as timing:
+        timing.add_rows(len(rows))
+        if USE_PANDAS:
+            import pandas as pd
+            pd.DataFrame(rows, columns=columns).to_csv(path, index=False, encoding='utf-8-sig')
+        else:
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(columns)
+                for r in rows:
+                    writer.writerow(['' if r.get(c) is None else r.get(c) for c in columns])
+        timing.add_file(path)
+
+
+def merge_pet_breeds(hamster_rows, existing_path):
+    """合併 JSON 匯出的倉鼠列與既有 CSV 的非倉鼠列；以 (物種, 品種標籤) 去重、保留先出現者。
+
+    回傳 (rows, columns)，欄位順序為倉鼠列欄位在前，再接既有 CSV 多出的欄位。
+    """
+    columns = list(dict.fromkeys(k for r in hamster_rows for k in r))
+    merged = list(hamster_rows)
+    if existing_path and os.path.exists(existing_path):
+        with CsvStream(Path(existing_path)) as stream:
+            fieldnames = stream.fieldnames or []
+            if '物種' in fieldnames:
+                # keep non-hamster rows from existing
+                for name in fieldnames + ['品種key']:
+                    if name not in columns:
+                        columns.append(name)
+                merged.extend(r.to_dict() for r in stream if r.get('物種') != '倉鼠')
+    seen = set()
+    rows = []
+    for r in merged:
+        dedup_key = (r.get('物種') or '', r.get('品種標籤') or '')
+        if dedup_key in seen:
+            continue
+        seen.add(dedup_key)
+        rows.append({c: ('' if r.get(c) is None else r.get(c)) for c in columns})
+    return rows, columns
+
+
+def convert_health_guidelines(data=None):
+    """由 JSON_PATH 拆分 per-species JSON 並匯出 CSV；data 為已解析的 JSON 內容時不再讀檔。"""
+    if data is None:
+        if not os.path.exists(JSON_PATH):
+            print(f"[ERROR] 找不到檔案: {JSON_PATH}")
+            return
+
+        with METRICS.stage('load_json') as timing:
+            with open(JSON_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            timing.add_rows(1)
     # 物種清單（用於拆分與 CSV 輸出）
     species_keys = ['cat', 'dog', 'rabbit', 'hamster']
 
-    # 立即拆分成每個物種的完整 guidelines JSON（便於小工具分別載入）
-    try:
-        data_dir = Path('data')
-        data_dir.mkdir(parents=True, exist_ok=True)
-        for skey in species_keys:
-            if skey in data:
-                outfile = data_dir / f'guidelines_{skey}.json'
-                with outfile.open('w', encoding='utf-8') as of:
-                    json.dump(data[skey], of, ensure_ascii=False, indent=2)
+    # 立即拆分成每個物種的完整 guidelines JSON（便於小工具分別載入）；
+    # 寫檔失敗時直接拋出，不再默默略過而留下過期的 per-species JSON
+    data_dir = Path('data')
+    data_dir.mkdir(parents=True, exist_ok=True)
+    with METRICS.stage('split_species') as timing:
+        artifacts = [(data_dir / f'guidelines_{skey}.json', data[skey]) for skey in species_keys if skey in data]
 
         # 產生 breeds_lifespans.json：優先使用 docs/pet_breeds.csv，若不存在則嘗試從 JSON 中取出 hamster 品種壽命
         lifespans = {}
         pet_breeds_csv = f"{OUTPUT_DIR}/pet_breeds.csv"
         if os.path.exists(pet_breeds_csv):
-            try:
-                pb_df = pd.read_csv(pet_breeds_csv, encoding='utf-8-sig')
-                if '物種' in pb_df.columns and '品種標籤' in pb_df.columns and '預期壽命' in pb_df.columns:
-                    for _, row in pb_df.iterrows():
-                        sp = row.get('物種')
-                        label = row.get('品種標籤')
-                        lifespan = row.get('預期壽命')
-                        if pd.isna(sp) or pd.isna(label):
-                            continue
-                        lifespans.setdefault(sp, []).append({'breed': label, 'lifespan': lifespan})
-            except Exception:
-                pass
+            with METRICS.stage('read_csv') as reading:
+                with CsvStream(Path(pet_breeds_csv)) as stream:
+                    if {'物種', '品種標籤', '預期壽命'} <= set(stream.fieldnames or []):
+                        for row in reading.iter(stream):
+                            sp = row.get('物種')
+                            label = row.get('品種標籤')
+                            lifespan = row.get('預期壽命')
+                            if not sp or not label:
+                                continue
+                            lifespans.setdefault(sp, []).append({'breed': label, 'lifespan': lifespan})
         else:
             # fallback: use data['hamster']['breeds'] if present
             if 'hamster' in data and isinstance(data['hamster'].get('breeds'), dict):
@@ -62,10 +123,18 @@ def convert_health_guidelines():
                 for bkey, binfo in data['hamster']['breeds'].items():
                     lifespans['倉鼠'].append({'breed': binfo.get('label', bkey), 'lifespan': binfo.get('lifespanRange', '')})
 
-        with (data_dir / 'temp_breeds_lifespans.json').open('w', encoding='utf-8') as f:
-            json.dump(lifespans, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+        artifacts.append((data_dir / 'temp_breeds_lifespans.json', lifespans))
+        timing.add_rows(len(artifacts))
+        timing.add_results(write_data_artifacts(artifacts))
+
+    # 依物種延遲載入的 bundle 與 manifest（data/health/，供 health-calculator.js 使用）
+    with METRICS.stage('species_bundles') as timing:
+        serializer = dumps_json_compact if COMPACT else dumps_json
+        bundle_results = write_species_bundles(data, data_dir, serializer=serializer,
+                                               precompress=COMPACT, workers=WORKERS)
+        update_build_report(Path(REPORT_PATH), bundle_results)
+        timing.add_rows(len(bundle_results))
+        timing.add_results(bundle_results)
 
     # species_keys 在上面已定義
     
@@ -84,7 +153,7 @@ def convert_health_guidelines():
                 '照護重點': " | ".join(info.get('healthTips', [])),
                 '常見問題': " | ".join(info.get('commonIssues', []))
             })
-    pd.DataFrame(stages_data).to_csv(f'{OUTPUT_DIR}/health_life_stages.csv', index=False, encoding='utf-8-sig')
+    write_csv(f'{OUTPUT_DIR}/health_life_stages.csv', stages_data)
 
     # 1-1. 物種專用選項表 (Activity/Body Options)
     options_rows = []
@@ -114,7 +183,7 @@ def convert_health_guidelines():
                 'description': v.get('description', '')
             })
     if options_rows:
-        pd.DataFrame(options_rows).to_csv(f'{OUTPUT_DIR}/activity_body_options.csv', index=False, encoding='utf-8-sig')
+        write_csv(f'{OUTPUT_DIR}/activity_body_options.csv', options_rows)
 
     # 2. 常見疾病與飲食建議表 (Conditions)
     import re
@@ -138,7 +207,7 @@ def convert_health_guidelines():
             })
             # 同步補齊原始 JSON 內的 id 欄位（避免下次轉出還是缺）
             cond['id'] = cid
-    pd.DataFrame(conditions_data).to_csv(f'{OUTPUT_DIR}/health_conditions.csv', index=False, encoding='utf-8-sig')
+    write_csv(f'{OUTPUT_DIR}/health_conditions.csv', conditions_data, ['物種', 'id', '疾病項目', '飲食注意', '專家叮嚀'])
 
     # 3. 倉鼠品種資料表：與既有 CSV 對齊，匯出時帶「品種key」供網站與匯入對齊用（不依硬編碼）
     #     CSV 內「物種≠倉鼠」的列（犬/貓/兔）僅合併保留、不從 JSON 匯出（JSON 目前只有 hamster.breeds；
@@ -154,80 +223,63 @@ def convert_health_guidelines():
             '俗名': " / ".join(binfo['commonNames']),
             '預期壽命': binfo['lifespanRange']
         })
-    hamster_df = pd.DataFrame(hamster_rows)
 
     # Merge with existing pet_breeds CSV if present (preserve non-hamster rows)
     existing = None
     # prefer an explicitly configured CSV_HAMSTER_BREEDS, otherwise check for OUTPUT_DIR/pet_breeds.csv
     if CSV_HAMSTER_BREEDS and os.path.exists(CSV_HAMSTER_BREEDS):
-        existing = pd.read_csv(CSV_HAMSTER_BREEDS, encoding='utf-8-sig')
+        existing = CSV_HAMSTER_BREEDS
     elif os.path.exists(f"{OUTPUT_DIR}/pet_breeds.csv"):
-        existing = pd.read_csv(f"{OUTPUT_DIR}/pet_breeds.csv", encoding='utf-8-sig')
-
-    if existing is not None and '物種' in existing.columns:
-        # keep non-hamster rows from existing
-        other = existing[existing['物種'] != '倉鼠'].copy()
-        if '品種key' not in other.columns:
-            other['品種key'] = ''
-        out_df = pd.concat([hamster_df, other], ignore_index=True)
-        out_df = out_df.drop_duplicates(subset=['物種', '品種標籤'], keep='first')
-    else:
-        out_df = hamster_df
+        existing = f"{OUTPUT_DIR}/pet_breeds.csv"
+    with METRICS.stage('merge_pet_breeds') as timing:
+        pet_rows, pet_columns = merge_pet_breeds(hamster_rows, existing)
+        timing.add_rows(len(pet_rows))
 
     # 統一輸出為 OUTPUT_DIR/pet_breeds.csv（包含倉鼠與非倉鼠列）
     target_pet = f"{OUTPUT_DIR}/pet_breeds.csv"
-    out_df.to_csv(target_pet, index=False, encoding='utf-8-sig')
+    write_csv(target_pet, pet_rows, pet_columns)
 
     print(f"[OK] 轉換完成！CSV 檔案已儲存至 {OUTPUT_DIR}/ 資料夾。")
 
     # 同時輸出 per-species JSON 到 data/，方便小工具直接讀取
-    try:
-        data_dir = Path('data')
-        data_dir.mkdir(parents=True, exist_ok=True)
-
+    with METRICS.stage('split_temp_json') as timing:
         # 依物種拆分 conditions
         cond_groups = {}
         for row in conditions_data:
             sp = row.get('物種') or 'unknown'
             cond_groups.setdefault(sp, []).append(row)
 
-        # 以 data/health-guidelines.json 的 species keys 為命名（若存在）
-        name2key = {}
-        if os.path.exists(JSON_PATH):
-            try:
-                with open(JSON_PATH, 'r', encoding='utf-8') as f:
-                    hg = json.load(f)
-                    name2key = {v.get('name'): k for k, v in hg.items() if isinstance(v, dict) and 'name' in v}
-            except Exception:
-                name2key = {}
+        # 以 data/health-guidelines.json 的 species keys 為命名（沿用開頭已解析的 data，不再重讀檔案）
+        name2key = {v.get('name'): k for k, v in data.items() if isinstance(v, dict) and 'name' in v}
 
+        artifacts = []
         for sp, items in cond_groups.items():
             key = name2key.get(sp)
             fname = f'temp_conditions_{key or sp.replace(" ", "_")}.json'
-            with (data_dir / fname).open('w', encoding='utf-8') as f:
-                json.dump(items, f, ensure_ascii=False, indent=2)
+            artifacts.append((data_dir / fname, items))
 
         # overall combined conditions
-        with (data_dir / 'temp_conditions_all.json').open('w', encoding='utf-8') as f:
-            json.dump(conditions_data, f, ensure_ascii=False, indent=2)
-
-        # 輸出 breeds：使用 out_df（最終 CSV）按物種拆分
-        try:
-            records = out_df.to_dict(orient='records')
-            breeds_by_species = {}
-            for b in records:
-                sp = (b.get('物種') or 'unknown')
-                breeds_by_species.setdefault(sp, []).append(b)
-            for sp, rows in breeds_by_species.items():
-                key = name2key.get(sp)
-                fname = f'temp_breeds_{key or sp.replace(" ", "_")}.json'
-                with (data_dir / fname).open('w', encoding='utf-8') as f:
-                    json.dump(rows, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
-    except Exception:
-        # 不影響主流程，僅在產生 JSON 時忽略錯誤
-        pass
+        artifacts.append((data_dir / 'temp_conditions_all.json', conditions_data))
+
+        # 輸出 breeds：使用最終 pet_breeds.csv 的列按物種拆分
+        breeds_by_species = {}
+        for b in pet_rows:
+            sp = (b.get('物種') or 'unknown')
+            breeds_by_species.setdefault(sp, []).append(b)
+        for sp, rows in breeds_by_species.items():
+            key = name2key.get(sp)
+            fname = f'temp_breeds_{key or sp.replace(" ", "_")}.json'
+            artifacts.append((data_dir / fname, rows))
+        timing.add_rows(len(conditions_data) + len(pet_rows))
+        timing.add_results(write_data_artifacts(artifacts))
+
+
+def write_data_artifacts(artifacts):
+    """依 COMPACT 設定寫出 data/ 下的 JSON 產出檔，並更新建置報告。"""
+    serializer = dumps_json_compact if COMPACT else dumps_json
+    results = write_artifacts(artifacts, workers=WORKERS, serializer=serializer, precompress=COMPACT)
+    update_build_report(Path(REPORT_PATH), results)
+    return results
 
 
 def update_health_guidelines_from_hamster_csv():
@@ -240,34 +292,15 @@ def update_health_guidelines_from_hamster_csv():
         print(f"[ERROR] 找不到檔案: {JSON_PATH}")
         return
 
-    df = pd.read_csv(target_hamster, encoding='utf-8-sig')
-    if '物種' not in df.columns:
-        print("[ERROR] CSV 缺少「物種」欄位，無法對齊。")
-        return
-    hamster_rows = df[df['物種'] == '倉鼠']
-
-    with open(JSON_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    for _, row in hamster_rows.iterrows():
-        # 優先以 CSV 的「品種key」對齊 JSON，無欄位或空值時才用品種標籤對照表（向後相容）
-        bkey = (row.get('品種key') or '').strip() if '品種key' in row else ''
-        if not bkey:
-            label = row.get('品種標籤', '').strip()
-            bkey = HAMSTER_LABEL_TO_KEY.get(label)
-        if not bkey:
-            print(f"[WARN] 略過無法對應的倉鼠列（需有品種key或品種標籤）: {row.get('品種標籤', '')}")
-            continue
-        if bkey not in data['hamster']['breeds']:
-            print(f"[WARN] JSON 中無此 key: {bkey}")
-            continue
-        # 俗名：支援 " / " 或 "、" 分隔，轉成 list
-        common_str = row.get('俗名', '') or ''
-        common_names = [s.strip() for s in common_str.replace('、', ' / ').split(' / ') if s.strip()]
-        data['hamster']['breeds'][bkey]['label'] = row.get('品種標籤', data['hamster']['breeds'][bkey]['label'])
-        data['hamster']['breeds'][bkey]['scientific'] = row.get('學名', data['hamster']['breeds'][bkey]['scientific'])
-        data['hamster']['breeds'][bkey]['commonNames'] = common_names if common_names else data['hamster']['breeds'][bkey]['commonNames']
-        data['hamster']['breeds'][bkey]['lifespanRange'] = row.get('預期壽命', data['hamster']['breeds'][bkey]['lifespanRange'])
+    with CsvStream(Path(target_hamster)) as stream:
+        if '物種' not in (stream.fieldnames or []):
+            print("[ERROR] CSV 缺少「物種」欄位，無法對齊。")
+            return
+        with open(JSON_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for row in stream:
+            if row.get('物種') == '倉鼠':
+                _apply_hamster_row(data, row)
 
     with open(JSON_PATH, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
@@ -275,21 +308,57 @@ def update_health_guidelines_from_hamster_csv():
     print(f"[OK] 已從 {target_hamster} 更新 {JSON_PATH} 的倉鼠品種資料。")
 
 
+def _apply_hamster_row(data, row):
+    """以一列倉鼠 CSV 更新 data['hamster']['breeds'] 中對應的品種。"""
+    # 優先以 CSV 的「品種key」對齊 JSON，無欄位或空值時才用品種標籤對照表（向後相容）
+    bkey = row.get('品種key') or ''
+    if not bkey:
+        label = row.get('品種標籤') or ''
+        bkey = HAMSTER_LABEL_TO_KEY.get(label)
+    if not bkey:
+        print(f"[WARN] 略過無法對應的倉鼠列（需有品種key或品種標籤）: {row.get('品種標籤', '')}")
+        return
+    if bkey not in data['hamster']['breeds']:
+        print(f"[WARN] JSON 中無此 key: {bkey}")
+        return
+    breed = data['hamster']['breeds'][bkey]
+    # 俗名：支援 " / " 或 "、" 分隔，轉成 list
+    common_str = row.get('俗名', '') or ''
+    common_names = [s.strip() for s in common_str.replace('、', ' / ').split(' / ') if s.strip()]
+    breed['label'] = row.get('品種標籤', breed['label'])
+    breed['scientific'] = row.get('學名', breed['scientific'])
+    breed['commonNames'] = common_names if common_names else breed['commonNames']
+    breed['lifespanRange'] = row.get('預期壽命', breed['lifespanRange'])
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='健康指引 JSON ↔ CSV 轉換')
     parser.add_argument('--import-csv', action='store_true', help='從 hamster_breeds.csv 匯入並更新 JSON 倉鼠品種')
     parser.add_argument('--out-dir', default='docs', help='輸出 CSV 的目錄（預設: docs）')
+    parser.add_argument('--pandas', action='store_true', help='改用 pandas 輸出 CSV（需安裝 pandas，僅供比對舊行為）')
+    parser.add_argument('--workers', type=int, help='平行寫出 per-species JSON 的執行緒數（預設: CPU 數）')
+    parser.add_argument('--compact', action='store_true', help='data/ 下的 JSON 以緊湊格式輸出，並產生 .gz / .br 預壓縮檔')
+    parser.add_argument('--report', default=REPORT_PATH, help=f'建置報告路徑（預設: {REPORT_PATH}）')
+    add_arguments(parser)
     args = parser.parse_args()
 
     # 設定輸出路徑全域變數，讓舊有函式沿用變數名稱
     globals()['OUTPUT_DIR'] = args.out_dir
     globals()['CSV_HAMSTER_BREEDS'] = f"{args.out_dir}/hamster_breeds.csv"
+    globals()['USE_PANDAS'] = args.pandas
+    globals()['WORKERS'] = args.workers
+    globals()['COMPACT'] = args.compact
+    globals()['REPORT_PATH'] = args.report
+    if args.compact and brotli is None:
+        print("[WARN] 未安裝 brotli，略過 .br 預壓縮檔（pip install brotli）")
 
     # 建立目錄
     os.makedirs(args.out_dir, exist_ok=True)
 
-    if args.import_csv:
-        update_health_guidelines_from_hamster_csv()
-    else:
-        convert_health_guidelines()
+    with instrumented(args, 'convert_health_data') as metrics:
+        globals()['METRICS'] = metrics
+        if args.import_csv:
+            update_health_guidelines_from_hamster_csv()
+        else:
+            convert_health_guidelines()
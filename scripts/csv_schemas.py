@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+docs/*.csv 的宣告式 schema 與逐列驗證器。
+
+每個 CSV 以 Schema 描述欄位（必填、型別、數值範圍、列舉、格式、參照）、唯一鍵與跨檔參照；
+compile_schema() 依實際標頭把 schema 編譯成一組「欄位位置 → 檢查函式」，
+每列只需依序呼叫這些函式，不再逐列查欄名或解析設定。
+
+型別：
+  str    任意文字
+  int    整數；float 數字（min / max 為範圍）
+  range  「下限-上限」（也接受 ~ – —），兩端皆為數字且下限 ≤ 上限，如 ageRange 的 0.0-1.0
+  list   以 " | " 分隔的清單（照護重點、常見問題）
+  hours  營業時段（09:00~18:00）或 enum 中的文字（公休、恢復正常營業）
+
+參照（ref / foreign_keys）以預先建立的 hash set 查詢：
+  species  health-guidelines.json 的物種名稱（貓咪、狗狗…）
+  store    mapping/PetStores_BranchInfo.csv 的門市簡稱
+  breed    pet_breeds.csv 的 (物種, 品種key)（由該檔的 provides 宣告，驗證前先讀取）
+"""
+from __future__ import annotations
+
+import json
+import re
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from stream_io import CsvStream
+
+# 「下限-上限」的分隔符號，與 update_health_json.update_life_stages 相同
+_RANGE_SPLIT = re.compile(r"\s*[-~–—]\s*")
+_HOURS = re.compile(r'\d{1,2}:\d{2}\s*[-~～]\s*\d{1,2}:\d{2}')
+_SLUG = r'[a-z0-9_]+'
+LIST_SEPARATOR = ' | '
+
+
+class Column(NamedTuple):
+    name: str
+    required: bool = False
+    type: str = 'str'
+    enum: Optional[FrozenSet[str]] = None
+    pattern: Optional[str] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    ref: Optional[str] = None
+
+
+class Schema(NamedTuple):
+    columns: Tuple[Column, ...]
+    # 組合唯一鍵（欄名 tuple）
+    unique: Tuple[Tuple[str, ...], ...] = ()
+    # (欄名 tuple, 參照集合名稱)：多欄組合必須存在於參照集合中
+    foreign_keys: Tuple[Tuple[Tuple[str, ...], str], ...] = ()
+    # 本檔提供給其他檔參照的集合：(集合名稱, 欄名 tuple)
+    provides: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+    # 固定欄位之後的其餘欄位：標頭須符合 rest_header，每格以 rest 檢查（如春節營運時間的日期欄）
+    rest: Optional[Column] = None
+    rest_header: Optional[str] = None
+    # 標頭之後、資料之前要略過的列數（如春節營運時間的備註列）
+    skip_rows: int = 0
+
+
+_SPECIES = Column('物種', required=True, ref='species')
+
+SCHEMAS: Dict[str, Schema] = {
+    'health_conditions.csv': Schema(
+        columns=(
+            _SPECIES,
+            Column('id', pattern=_SLUG),
+            Column('疾病項目', required=True),
+            Column('飲食注意'),
+            Column('專家叮嚀'),
+        ),
+        unique=(('物種', 'id'), ('物種', '疾病項目')),
+    ),
+    'health_life_stages.csv': Schema(
+        columns=(
+            _SPECIES,
+            Column('階段', required=True),
+            Column('ageRange', type='range', min=0),
+            Column('對應人類年齡'),
+            Column('建議健檢頻率'),
+            Column('照護重點', type='list'),
+            Column('常見問題', type='list'),
+        ),
+        unique=(('物種', '階段'),),
+    ),
+    'pet_breeds.csv': Schema(
+        columns=(
+            _SPECIES,
+            Column('品種key', required=True, pattern=_SLUG),
+            Column('品種標籤', required=True),
+            Column('學名'),
+            Column('俗名'),
+            Column('預期壽命', pattern=r'\d+(\.\d+)?(\s*[-~–—]\s*\d+(\.\d+)?)?\s*年'),
+        ),
+        unique=(('物種', '品種key'),),
+        provides=(('breed', ('物種', '品種key')),),
+    ),
+    'hamster_breeds.csv': Schema(
+        columns=(
+            Column('物種', required=True, enum=frozenset({'倉鼠'}), ref='species'),
+            Column('品種key', required=True, pattern=_SLUG),
+            Column('品種標籤', required=True),
+            Column('學名'),
+            Column('俗名'),
+            Column('預期壽命', pattern=r'\d+(\.\d+)?(\s*[-~–—]\s*\d+(\.\d+)?)?\s*年'),
+        ),
+        unique=(('物種', '品種key'),),
+        foreign_keys=((('物種', '品種key'), 'breed'),),
+    ),
+    'activity_body_options.csv': Schema(
+        columns=(
+            _SPECIES,
+            Column('類型', required=True, enum=frozenset({'activity', 'body'})),
+            Column('key', required=True, pattern=_SLUG),
+            Column('label', required=True),
+            Column('description'),
+        ),
+        unique=(('物種', '類型', 'key'),),
+    ),
+    '各門市春節營運時間.csv': Schema(
+        columns=(Column('', required=True, ref='store'),),
+        unique=(('',),),
+        rest=Column('*', type='hours', enum=frozenset({'公休', '休息', '店休', 'OFF', '恢復正常營業'})),
+        rest_header=r'(?:\d{4}\s*年\s*)?\d{1,2}\s*月\s*\d{1,2}\s*日|(?:\d{4}/)?\d{1,2}/\d{1,2}',
+        skip_rows=1,
+    ),
+}
+
+References = Dict[str, FrozenSet]
+
+
+class ValidationError(NamedTuple):
+    file: str
+    line: int  # 0 表示標頭或整份檔案的問題
+    column: str
+    code: str  # missing_column / extra_column / required / type / range / enum / pattern / ref / unique
+    message: str
+
+    def __str__(self) -> str:
+        where = f'{self.file} 第{self.line}列' if self.line else self.file
+        return f'{where}: {self.message}'
+
+
+# 檢查函式：回傳 (code, 訊息) 或 None
+Check = Callable[[str], Optional[Tuple[str, str]]]
+
+
+def parse_range(text: str) -> Optional[Tuple[float, float]]:
+    parts = _RANGE_SPLIT.split(text.strip())
+    if len(parts) != 2:
+        return None
+    try:
+        low, high = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    return (low, high) if low <= high else None
+
+
+def _compile_column(column: Column, refs: References) -> Optional[Check]:
+    """將單一欄位的宣告編譯為檢查函式（只處理非空值；必填檢查由呼叫端負責）。
+
+    沒有任何檢查的欄位回傳 None，逐列驗證時直接略過。
+    """
+    name = column.name or '(第一欄)'
+    checks: List[Check] = []
+    low, high = column.min, column.max
+
+    def bounds(value: float) -> bool:
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    if column.type in ('int', 'float'):
+        cast = int if column.type == 'int' else float
+
+        def check_number(text: str) -> Optional[Tuple[str, str]]:
+            try:
+                value = cast(text)
+            except ValueError:
+                return 'type', f"欄位 '{name}' 應為{'整數' if cast is int else '數字'}：{text!r}"
+            if not bounds(value):
+                return 'range', f"欄位 '{name}' 超出範圍 [{low}, {high}]：{text!r}"
+            return None
+        checks.append(check_number)
+    elif column.type == 'range':
+        def check_range(text: str) -> Optional[Tuple[str, str]]:
+            parsed = parse_range(text)
+            if parsed is None:
+                return 'type', f"欄位 '{name}' 應為「下限-上限」且下限不大於上限：{text!r}"
+            if not (bounds(parsed[0]) and bounds(parsed[1])):
+                return 'range', f"欄位 '{name}' 超出範圍 [{low}, {high}]：{text!r}"
+            return None
+        checks.append(check_range)
+    elif column.type == 'list':
+        def check_list(text: str) -> Optional[Tuple[str, str]]:
+            if any(not item.strip() for item in text.split(LIST_SEPARATOR)):
+                return 'type', f"欄位 '{name}' 有空白的清單項目（以 '{LIST_SEPARATOR}' 分隔）：{text!r}"
+            return None
+        checks.append(check_list)
+    elif column.type == 'hours':
+        allowed = column.enum or frozenset()
+
+        def check_hours(text: str) -> Optional[Tuple[str, str]]:
+            if text in allowed or _HOURS.fullmatch(text):
+                return None
+            return 'type', f"欄位 '{name}' 不是營業時段或 {sorted(allowed)}：{text!r}"
+        checks.append(check_hours)
+
+    if column.enum is not None and column.type != 'hours':
+        allowed = column.enum
+
+        def check_enum(text: str) -> Optional[Tuple[str, str]]:
+            return None if text in allowed else ('enum', f"欄位 '{name}' 應為 {sorted(allowed)} 之一：{text!r}")
+        checks.append(check_enum)
+    if column.pattern is not None:
+        regex = re.compile(column.pattern)
+
+        def check_pattern(text: str) -> Optional[Tuple[str, str]]:
+            return None if regex.fullmatch(text) else ('pattern', f"欄位 '{name}' 格式不符：{text!r}")
+        checks.append(check_pattern)
+    if column.ref is not None and column.ref in refs:
+        members = refs[column.ref]
+
+        def check_ref(text: str) -> Optional[Tuple[str, str]]:
+            return None if text in members else ('ref', f"欄位 '{name}' 的值不存在於 {column.ref}：{text!r}")
+        checks.append(check_ref)
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(text: str) -> Optional[Tuple[str, str]]:
+        for check in checks:
+            problem = check(text)
+            if problem is not None:
+                return problem
+        return None
+    return check_all
+
+
+class CompiledSchema:
+    """依實際標頭編譯的驗證器：header_errors 為標頭問題，validate(line, cells) 檢查一列。"""
+
+    def __init__(self, file: str, schema: Schema, header: Sequence[str], refs: References):
+        self.file = file
+        self.schema = schema
+        self.header_errors: List[ValidationError] = []
+        index = {name: i for i, name in enumerate(header)}
+        fixed = {c.name for c in schema.columns}
+        for column in schema.columns:
+            if column.name not in index:
+                self._header_error('missing_column', column.name, f'缺少欄位: {column.name!r}')
+        extra = [h for h in header if h not in fixed]
+        if schema.rest is not None:
+            pattern = re.compile(schema.rest_header or '.*')
+            bad = [h for h in extra if not pattern.fullmatch(h)]
+            rest_positions = [index[h] for h in extra if pattern.fullmatch(h)]
+        else:
+            bad, rest_positions = extra, []
+        if bad:
+            # 只是警告，不當作致命錯誤
+            self._header_error('extra_column', '', f'有額外欄位: {bad}')
+
+        # (欄位位置, 欄名, 是否必填, 檢查函式)；既非必填也沒有檢查的欄位不列入
+        cells = [(index[c.name], c.name or '(第一欄)', c.required, _compile_column(c, refs))
+                 for c in schema.columns if c.name in index]
+        if schema.rest is not None:
+            cells += [(i, header[i], schema.rest.required, _compile_column(schema.rest._replace(name=header[i]), refs))
+                      for i in rest_positions]
+        self._cells: List[Tuple[int, str, bool, Optional[Check]]] = [c for c in cells if c[2] or c[3] is not None]
+        # 每列先補齊到 _width 欄，之後以位置直接取值
+        self._width = len(header)
+        self._unique = [(names, self._key_getter([index[n] for n in names]), {})
+                        for names in schema.unique if all(n in index for n in names)]
+        self._foreign = [(names, self._key_getter([index[n] for n in names]), refs[ref])
+                         for names, ref in schema.foreign_keys if ref in refs and all(n in index for n in names)]
+
+    @staticmethod
+    def _key_getter(positions: List[int]) -> Callable[[Sequence[str]], Tuple[str, ...]]:
+        """取出多欄組合鍵的函式（一律回傳 tuple）。"""
+        if len(positions) == 1:
+            i = positions[0]
+            return lambda cells: (cells[i],)
+        return itemgetter(*positions)
+
+    def _header_error(self, code: str, column: str, message: str) -> None:
+        self.header_errors.append(ValidationError(self.file, 0, column, code, message))
+
+    def validate(self, line: int, cells: Sequence[str]) -> List[ValidationError]:
+        """回傳該列的錯誤（沒有錯誤時為空 list）。"""
+        errors: List[ValidationError] = []
+        if len(cells) < self._width:
+            cells = list(cells) + [''] * (self._width - len(cells))
+        for i, name, required, check in self._cells:
+            value = cells[i]
+            if not value:
+                if required:
+                    errors.append(ValidationError(self.file, line, name, 'required', f"欄位 '{name}' 不可為空"))
+                continue
+            if check is not None:
+                problem = check(value)
+                if problem is not None:
+                    errors.append(ValidationError(self.file, line, name, *problem))
+        for names, key_of, seen in self._unique:
+            key = key_of(cells)
+            if not all(key):
+                continue  # 空值不參與唯一性檢查（必填由欄位檢查負責）
+            first = seen.setdefault(key, line)
+            if first != line:
+                errors.append(ValidationError(self.file, line, ','.join(names), 'unique',
+                                              f'{names} 重複 {key}（第{first}列已出現）'))
+        for names, key_of, members in self._foreign:
+            key = key_of(cells)
+            if all(key) and key not in members:
+                errors.append(ValidationError(self.file, line, ','.join(names), 'ref',
+                                              f'{names} = {key} 不存在於參照資料'))
+        return errors
+
+
+def compile_schema(file: str, header: Sequence[str], refs: References,
+                   schema: Optional[Schema] = None) -> Optional[CompiledSchema]:
+    """依檔名取得 schema 並編譯；沒有 schema 的檔案回傳 None。"""
+    schema = schema or SCHEMAS.get(file)
+    return CompiledSchema(file, schema, header, refs) if schema is not None else None
+
+
+def iter_errors(path: Path, refs: References, schema: Optional[Schema] = None,
+                stats: Optional[Dict[str, int]] = None) -> Iterator[ValidationError]:
+    """逐列驗證並串流產生錯誤；記憶體用量只與唯一鍵數量有關，與錯誤數量無關。
+
+    stats 不為 None 時，走訪結束後寫入 stats['rows']（驗證過的非空白列數）。
+    """
+    path = Path(path)
+    if not path.exists():
+        yield ValidationError(path.name, 0, '', 'missing_file', f'檔案不存在: {path}')
+        return
+    with CsvStream(path) as stream:
+        if stream.fieldnames is None:
+            yield ValidationError(path.name, 0, '', 'header', f'無法讀取標頭: {path}')
+            return
+        compiled = compile_schema(path.name, stream.fieldnames, refs, schema)
+        if compiled is None:
+            return
+        yield from compiled.header_errors
+        rows = iter(stream)
+        for _ in range(compiled.schema.skip_rows):
+            next(rows, None)
+        # 行號以 CSV 的實際列為準（標頭為第 1 列，略過的空白列也計入）
+        count = 0
+        for row in rows:
+            if row.is_blank():
+                continue
+            count += 1
+            yield from compiled.validate(row.line, row.cells())
+        if stats is not None:
+            stats['rows'] = count
+
+
+def load_species_names(guidelines_path: Path) -> FrozenSet[str]:
+    with Path(guidelines_path).open('r', encoding='utf-8') as f:
+        data = json.load(f)
+    return frozenset(v['name'] for v in data.values() if isinstance(v, dict) and 'name' in v)
+
+
+def load_store_names(stores_csv: Path) -> FrozenSet[str]:
+    """門市簡稱（去掉結尾「店」，與 mapping/store_hours_index.normalize_store_name 相同）與加上「店」的全名。"""
+    with CsvStream(Path(stores_csv)) as stream:
+        names = {re.sub(r'店$', '', row.get('Store Name') or '') for row in stream if row.get('Store Name')}
+    return frozenset(names | {name + '店' for name in names})
+
+
+def load_provided(path: Path, columns: Tuple[str, ...]) -> FrozenSet[Tuple[str, ...]]:
+    """讀取某檔提供給其他檔參照的欄位組合（只取這幾欄，不做其他驗證）。"""
+    with CsvStream(Path(path)) as stream:
+        return frozenset(tuple(row.get(c) or '' for c in columns) for row in stream if not row.is_blank())
+
+
+def build_references(docs_dir: Path, guidelines_path: Optional[Path] = None,
+                     stores_csv: Optional[Path] = None) -> Tuple[References, List[str]]:
+    """建立所有參照集合；來源不存在的集合不建立（對應的參照檢查會略過），並回傳提示訊息。"""
+    refs: References = {}
+    notes: List[str] = []
+    sources = [('species', guidelines_path, load_species_names), ('store', stores_csv, load_store_names)]
+    for name, path, loader in sources:
+        if path is not None and Path(path).exists():
+            refs[name] = loader(Path(path))
+        else:
+            notes.append(f'找不到 {path}，略過 {name} 參照檢查')
+    for file, schema in SCHEMAS.items():
+        for name, columns in schema.provides:
+            path = Path(docs_dir) / file
+            if path.exists():
+                refs[name] = load_provided(path, columns)
+            else:
+                notes.append(f'找不到 {path}，略過 {name} 參照檢查')
+    return refs, notes
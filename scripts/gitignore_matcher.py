@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+.gitignore 規則的編譯與比對（供 project_tree_generator.py 在走訪時提前剪枝）。
+
+  - 逐層讀取 .gitignore：子目錄的規則疊加在父目錄之上，後出現的規則優先（與 git 相同）
+  - 每個目錄只編譯一個比對器：沒有 .gitignore 的目錄直接沿用父目錄的比對器
+  - 比對器將規則分為兩類：
+      純檔名（如 node_modules/、Thumbs.db）→ dict 查詢
+      其餘 glob（*.log、/build、docs/**/*.pdf）→ 合併成一個 regex，依規則順序反向排列，
+      第一個命中的分支就是最後出現的規則
+  - 被忽略的目錄不再往下走訪，因此也無法以 ! 重新納入其中的檔案（與 git 相同）
+
+支援的語法：# 註解、\\# / \\! 跳脫、行尾空白、! 否定、結尾 / 只比對目錄、
+開頭或中間的 / 表示相對於 .gitignore 所在目錄、* ? [...]、**/ 與 /** 與 /**/。
+另外也會讀取儲存庫頂層的 .git/info/exclude，以及掃描根目錄以上各層（到儲存庫頂層為止）的 .gitignore。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+GITIGNORE_NAME = '.gitignore'
+_GLOB_CHARS = re.compile(r'[*?\[\\]')
+
+
+class IgnorePattern(NamedTuple):
+    regex: str          # 比對「相對於儲存庫頂層的路徑」的 regex（不含 ^ $）
+    negate: bool
+    dir_only: bool
+    literal: Optional[str]  # 不含 / 與 glob 字元的純檔名規則，可直接以 dict 查詢
+
+
+def _translate_class(pattern: str, i: int) -> Tuple[Optional[str], int]:
+    """[...] 字元集合；沒有對應的 ] 時回傳 (None, i)，由呼叫端當作一般字元。"""
+    j = i + 1
+    if j < len(pattern) and pattern[j] in '!^':
+        j += 1
+    if j < len(pattern) and pattern[j] == ']':
+        j += 1
+    while j < len(pattern) and pattern[j] != ']':
+        j += 1
+    if j >= len(pattern):
+        return None, i
+    body = pattern[i + 1:j]
+    negate = body[:1] in ('!', '^')
+    if negate:
+        body = body[1:]
+    body = body.replace('[', '\\[')
+    # 字元集合不會比對到路徑分隔符號
+    return ('[^/' if negate else '(?!/)[') + body + ']', j + 1
+
+
+def _translate_glob(pattern: str) -> str:
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            j = i
+            while j < n and pattern[j] == '*':
+                j += 1
+            stars = j - i
+            at_start = i == 0 or pattern[i - 1] == '/'
+            at_end = j == n or pattern[j] == '/'
+            if stars >= 2 and at_start and at_end:
+                if j == n:
+                    # 結尾的 /**：目錄內的所有東西
+                    out.append('.*')
+                else:
+                    # **/：零或多層目錄
+                    out.append('(?:.*/)?')
+                    j += 1
+            else:
+                out.append('[^/]*')
+            i = j
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            translated, i = _translate_class(pattern, i)
+            if translated is None:
+                out.append(re.escape('['))
+                i += 1
+            else:
+                out.append(translated)
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+
+def _strip_trailing_spaces(line: str) -> str:
+    """去掉行尾空白（以 \\ 跳脫的空白保留）。"""
+    end = len(line)
+    while end > 0 and line[end - 1] == ' ':
+        backslashes = 0
+        k = end - 2
+        while k >= 0 and line[k] == '\\':
+            backslashes += 1
+            k -= 1
+        if backslashes % 2:
+            break
+        end -= 1
+    return line[:end]
+
+
+def parse_gitignore(text: str, base: str = '') -> List[IgnorePattern]:
+    """解析一個 .gitignore 的內容；base 為其所在目錄相對於儲存庫頂層的路徑（頂層為 ''）。"""
+    prefix = re.escape(base + '/') if base else ''
+    patterns = []
+    for raw in text.splitlines():
+        line = _strip_trailing_spaces(raw)
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        elif line.startswith('\\!') or line.startswith('\\#'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        anchored = '/' in line
+        line = line.lstrip('/') if anchored else line
+        body = _translate_glob(line)
+        literal = None
+        if not anchored and not _GLOB_CHARS.search(line):
+            literal = line
+        regex = prefix + body if anchored else prefix + '(?:.*/)?' + body
+        try:
+            re.compile(regex)
+        except re.error:
+            continue  # 無效的規則（如不完整的跳脫）不比對任何路徑
+        patterns.append(IgnorePattern(regex, negate, dir_only, literal))
+    return patterns
+
+
+class IgnoreRules:
+    """某個目錄適用的所有規則（父目錄規則 + 本目錄 .gitignore），編譯為一個比對器。"""
+
+    def __init__(self, patterns: Optional[List[IgnorePattern]] = None, fingerprint: str = ''):
+        self.patterns = list(patterns or [])
+        self.fingerprint = fingerprint
+        self.empty = not self.patterns
+        # 純檔名規則：名稱 → [(規則順序, 否定, 只比對目錄)]
+        self._literals: Dict[str, List[Tuple[int, bool, bool]]] = {}
+        globs = []
+        for order, pattern in enumerate(self.patterns):
+            if pattern.literal is not None:
+                self._literals.setdefault(pattern.literal, []).append((order, pattern.negate, pattern.dir_only))
+            else:
+                globs.append((order, pattern))
+        self._dir_regex, self._dir_orders = self._compile(globs, for_dirs=True)
+        self._file_regex, self._file_orders = self._compile(globs, for_dirs=False)
+
+    @staticmethod
+    def _compile(globs, for_dirs):
+        """將 glob 規則反向排列合併為一個 regex；m.lastindex 對應命中的規則。"""
+        selected = [(order, p) for order, p in reversed(globs) if for_dirs or not p.dir_only]
+        if not selected:
+            return None, []
+        regex = re.compile('(?:' + '|'.join(f'({p.regex})' for _, p in selected) + r')\Z', re.DOTALL)
+        return regex, [(order, p.negate) for order, p in selected]
+
+    def child(self, base: str, text: str) -> 'IgnoreRules':
+        """加入 base 目錄下 .gitignore 的規則（後加入的規則優先）。"""
+        patterns = parse_gitignore(text, base)
+        if not patterns:
+            return self
+        digest = hashlib.sha1(f'{self.fingerprint}\0{base}\0{text}'.encode('utf-8')).hexdigest()
+        return IgnoreRules(self.patterns + patterns, digest)
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """path 為相對於儲存庫頂層、以 / 分隔的路徑。
+
+        path 必須位於每條規則來源目錄之下（純檔名規則以 dict 查詢，不再檢查目錄）；
+        走訪時以各目錄自己的比對器比對該目錄的項目即可滿足。
+        """
+        if self.empty:
+            return False
+        best_order, best_negate = -1, False
+        name = path.rpartition('/')[2]
+        for order, negate, dir_only in self._literals.get(name, ()):
+            if (is_dir or not dir_only) and order > best_order:
+                best_order, best_negate = order, negate
+        regex, orders = (self._dir_regex, self._dir_orders) if is_dir else (self._file_regex, self._file_orders)
+        if regex is not None:
+            m = regex.match(path)
+            if m is not None:
+                order, negate = orders[m.lastindex - 1]
+                if order > best_order:
+                    best_order, best_negate = order, negate
+        return best_order >= 0 and not best_negate
+
+
+def read_gitignore(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, GITIGNORE_NAME), 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def find_repo_top(path: str) -> Optional[str]:
+    """往上找含 .git 的目錄（儲存庫頂層）；找不到時回傳 None。"""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, '.git')):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def rules_for_root(root: str) -> Tuple[IgnoreRules, str]:
+    """掃描根目錄「上方」適用的規則與根目錄相對於儲存庫頂層的路徑前綴。
+
+    回傳的規則包含 .git/info/exclude 與頂層到根目錄父目錄各層的 .gitignore；
+    根目錄本身的 .gitignore 由走訪時讀取。不在 git 儲存庫中時以根目錄為頂層。
+    """
+    root = os.path.abspath(root)
+    top = find_repo_top(root) or root
+    rules = IgnoreRules()
+    try:
+        with open(os.path.join(top, '.git', 'info', 'exclude'), 'r', encoding='utf-8', errors='replace') as f:
+            rules = rules.child('', f.read())
+    except OSError:
+        pass
+    rel = os.path.relpath(root, top).replace(os.sep, '/')
+    if rel == '.':
+        return rules, ''
+    parts = rel.split('/')
+    for depth in range(len(parts)):
+        base = '/'.join(parts[:depth])
+        text = read_gitignore(os.path.join(top, *parts[:depth]))
+        if text is not None:
+            rules = rules.child(base, text)
+    return rules, rel + '/'
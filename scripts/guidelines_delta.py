@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+health-guidelines.json 的增量更新：每次發布新版本時，對上一版產生一份 JSON Patch（RFC 6902）。
+
+輸出（預設 data/）：
+  - health-guidelines.version.json：版本指標——目前版本、完整檔的大小，以及依序串接的 delta 清單
+    （每筆含 from / to 版本、檔名與位元組數）；內容不含時間戳，資料沒變時位元組也不變
+  - health-deltas/{from}.{to}.json：從 from 版更新到 to 版的 JSON Patch
+
+版本號為內容的 sha256 前綴（以排序鍵、緊湊格式序列化，與縮排及鍵順序無關），只改輸出格式（--compact）
+時版本不變；檔案位元組與上一版相同時不必重新序列化或比較。
+species_bundles.py 以同樣的方式為各物種 bundle 產生 delta（記錄在 data/health/manifest.json）。
+已快取 from 版的前端只需下載版本指標，再依序套用到目前版本的 delta，不必重新下載完整檔；
+找不到自己的版本、或 delta 合計比完整檔還大時，改為下載完整檔。
+
+Diff 規則：
+  - 物件逐鍵比較（lifeStages 以階段名稱、hamster.breeds 以品種 key 對齊）
+  - 元素都是具唯一 id 的物件的陣列（commonConditions）以 id 對齊：被刪除的以 remove、
+    新增的以 add、換了位置的以 move 表示；移動或修改元素前先以 test 確認該位置的 id，
+    套用到不同的舊版時會失敗而不是改錯元素
+  - 其他陣列與型別改變的值整個 replace
+  - 產生後會把 patch 套回舊版並確認與新版相同
+
+版本指標只保留最近 DELTA_HISTORY 筆 delta，不再被參照的舊 delta 檔會被刪除。
+上一版與指標記錄的版本不同（例如指標遺失、JSON 曾被手動修改而沒有重建）時，delta 串接從上一版重新開始。
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from artifact_writer import (HASH_LENGTH, HASH_PATTERN, ArtifactResult, dumps_json_compact, remove_unreferenced,
+                             write_artifacts)
+
+POINTER_NAME = 'health-guidelines.version.json'
+DELTA_DIR_NAME = 'health-deltas'
+# 版本指標保留的 delta 筆數
+DELTA_HISTORY = 20
+# patch 大於完整檔的這個比例時不產生 delta（前端直接下載完整檔較省）
+MAX_DELTA_RATIO = 0.5
+
+Patch = List[Dict[str, Any]]
+
+
+def content_version(data: Any) -> str:
+    """內容的版本號：以排序鍵、緊湊格式序列化後的 sha256 前綴，與縮排、鍵順序無關。"""
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def _token(key: Any) -> str:
+    """JSON Pointer 的路徑片段跳脫（~ → ~0、/ → ~1）。"""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def _id_list(items: Any) -> Optional[List[str]]:
+    """items 若是元素皆為具唯一字串 id 的物件的陣列，回傳 id 清單；否則 None。"""
+    if not isinstance(items, list):
+        return None
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    if not all(isinstance(i, str) and i for i in ids) or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+
+def _diff_keyed(old: List[Dict[str, Any]], new: List[Dict[str, Any]], old_ids: List[str], new_ids: List[str],
+                path: str, ops: Patch) -> None:
+    """以 id 對齊兩個陣列；各 op 的索引是套用到前面的 op 之後的位置。"""
+    wanted = set(new_ids)
+    for pos in range(len(old_ids) - 1, -1, -1):
+        if old_ids[pos] not in wanted:
+            ops.append({'op': 'test', 'path': f'{path}/{pos}/id', 'value': old_ids[pos]})
+            ops.append({'op': 'remove', 'path': f'{path}/{pos}'})
+    by_id = {item['id']: item for item in old}
+    current = [i for i in old_ids if i in wanted]
+    for pos, item in enumerate(new):
+        cid = item['id']
+        if cid not in by_id:
+            ops.append({'op': 'add', 'path': f'{path}/{pos}', 'value': item})
+            current.insert(pos, cid)
+            continue
+        moved = current[pos] != cid
+        if moved:
+            src = current.index(cid)
+            ops.append({'op': 'test', 'path': f'{path}/{src}/id', 'value': cid})
+            ops.append({'op': 'move', 'from': f'{path}/{src}', 'path': f'{path}/{pos}'})
+            current.insert(pos, current.pop(src))
+        changes: Patch = []
+        _diff(by_id[cid], item, f'{path}/{pos}', changes)
+        if changes and not moved:
+            ops.append({'op': 'test', 'path': f'{path}/{pos}/id', 'value': cid})
+        ops.extend(changes)
+
+
+def _diff(old: Any, new: Any, path: str, ops: Patch) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_token(key)}'})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': f'{path}/{_token(key)}', 'value': value})
+            else:
+                _diff(old[key], value, f'{path}/{_token(key)}', ops)
+        return
+    if old == new and type(old) is type(new):
+        return
+    old_ids, new_ids = _id_list(old), _id_list(new)
+    if old_ids is not None and new_ids is not None:
+        _diff_keyed(old, new, old_ids, new_ids, path, ops)
+        return
+    ops.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def diff_json(old: Any, new: Any) -> Patch:
+    """產生把 old 變成 new 的 JSON Patch。"""
+    ops: Patch = []
+    _diff(old, new, '', ops)
+    return ops
+
+
+def _resolve(doc: Any, pointer: str) -> tuple:
+    """回傳 (父容器, 最後一段 key)；陣列的 key 轉成 int（'-' 表示結尾）。"""
+    tokens = [t.replace('~1', '/').replace('~0', '~') for t in pointer.split('/')[1:]]
+    parent = doc
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+    key: Any = tokens[-1]
+    if isinstance(parent, list):
+        key = len(parent) if key == '-' else int(key)
+    return parent, key
+
+
+def apply_patch(doc: Any, ops: Patch, in_place: bool = False) -> Any:
+    """套用 diff_json 產生的 patch（add / remove / replace / move / test），回傳新文件。
+
+    in_place=False 時不修改 doc；doc 之後不再使用時可傳 True 省去整份複製。
+    """
+    if not in_place:
+        doc = copy.deepcopy(doc)
+    for op in ops:
+        kind, path = op['op'], op['path']
+        if path == '':
+            if kind in ('add', 'replace'):
+                doc = copy.deepcopy(op['value'])
+                continue
+            raise ValueError(f'不支援對根節點 {kind}')
+        if kind == 'move':
+            src_parent, src_key = _resolve(doc, op['from'])
+            value = src_parent.pop(src_key)
+            parent, key = _resolve(doc, path)
+            kind, op = 'add', {'value': value}
+        else:
+            parent, key = _resolve(doc, path)
+        if kind == 'test':
+            if parent[key] != op['value']:
+                raise ValueError(f'test 失敗：{path}')
+        elif kind == 'remove':
+            del parent[key]
+        elif kind == 'add' and isinstance(parent, list):
+            parent.insert(key, copy.deepcopy(op['value']))
+        elif kind in ('add', 'replace'):
+            if kind == 'replace' and isinstance(parent, dict) and key not in parent:
+                raise ValueError(f'replace 的路徑不存在：{path}')
+            parent[key] = copy.deepcopy(op['value'])
+        else:
+            raise ValueError(f'不支援的 op：{kind}')
+    return doc
+
+
+def delta_filename(old_version: str, new_version: str) -> str:
+    return f'{old_version}.{new_version}.json'
+
+
+# delta 檔名：[{prefix}.]{from}.{to}.json（prefix 為物種 bundle 的 key）
+DELTA_PATTERN = rf'(?:[^.]+\.)?{HASH_PATTERN}\.{HASH_PATTERN}\.json'
+
+
+def load_pointer(path: Path) -> Dict[str, Any]:
+    try:
+        with Path(path).open('r', encoding='utf-8') as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return pointer if isinstance(pointer, dict) else {}
+
+
+def extend_chain(chain: List[Dict[str, Any]], old: Any, new: Any, old_version: Optional[str], new_version: str,
+                 full_bytes: int, delta_dir: Path, rel_dir: str, prefix: str = '',
+                 serializer: Callable[[Any], bytes] = dumps_json_compact) -> Tuple[List[Dict[str, Any]], list]:
+    """在以 old_version 結尾的 delta 串接後面接上 old → new，回傳 (新串接, 要寫出的 [(路徑, patch 位元組)])。
+
+    chain 必須是上一次發布時的串接（最後一筆的 to 為 old_version）；old 會被就地修改（用於驗證 patch）。
+    沒有上一版、或 patch 比完整檔的 MAX_DELTA_RATIO 還大時串接從頭開始（舊快取改為下載完整檔）。
+    delta 檔名為 {prefix}{from}.{to}.json，串接中記錄的路徑為 rel_dir/檔名。
+    """
+    if old is None or old_version is None:
+        return [], []
+    if old_version == new_version:
+        return chain, []
+    ops = diff_json(old, new)
+    if apply_patch(old, ops, in_place=True) != new:
+        raise AssertionError('delta 套用後與新版內容不同')
+    payload = serializer(ops)
+    if len(payload) > full_bytes * MAX_DELTA_RATIO:
+        return [], []
+    fname = f'{prefix}{delta_filename(old_version, new_version)}'
+    link = {'from': old_version, 'to': new_version, 'file': f'{rel_dir}/{fname}', 'bytes': len(payload)}
+    return (list(chain) + [link])[-DELTA_HISTORY:], [(Path(delta_dir) / fname, payload)]
+
+
+def valid_chain(chain: Any) -> List[Dict[str, Any]]:
+    return [link for link in chain if isinstance(link, dict)] if isinstance(chain, list) else []
+
+
+def write_delta(old_raw: Optional[bytes], new: Dict[str, Any], published: ArtifactResult,
+                serializer: Callable[[Any], bytes] = dumps_json_compact,
+                precompress: bool = False) -> List[ArtifactResult]:
+    """發布 new：產生上一版 → new 的 delta（可行時）並更新版本指標。
+
+    old_raw 為上一版 JSON 檔的位元組（沒有上一版時為 None），檔案內容有變時才解析與比較；
+    published 為 new 寫出成完整 JSON 檔的結果，版本指標與 delta 寫在同一個目錄。
+    回傳寫出檔案的結果（delta 在前、版本指標在最後）；檔案與指標都沒變時不寫任何檔案。
+    """
+    data_dir = Path(published.path).parent
+    full_name, full_bytes = Path(published.path).name, published.size
+    pointer_path = data_dir / POINTER_NAME
+    pointer = load_pointer(pointer_path)
+    unchanged = old_raw is not None and hashlib.sha256(old_raw).hexdigest() == published.sha256
+    if unchanged and (pointer.get('file'), pointer.get('sha256')) == (full_name, published.sha256):
+        return []
+
+    new_version = content_version(new)
+    old = None if unchanged or old_raw is None else json.loads(old_raw)
+    old_version = new_version if unchanged else (content_version(old) if old is not None else None)
+    chain = valid_chain(pointer.get('deltas')) if pointer.get('version') == old_version else []
+    if unchanged:
+        old = new  # 版本相同，不會產生 delta
+    chain, artifacts = extend_chain(chain, old, new, old_version, new_version, full_bytes,
+                                    data_dir / DELTA_DIR_NAME, DELTA_DIR_NAME, serializer=serializer)
+    results = write_artifacts(artifacts, workers=1, serializer=serializer, precompress=precompress)
+
+    pointer = {'version': new_version, 'file': full_name, 'bytes': full_bytes, 'sha256': published.sha256,
+               'deltas': chain}
+    results.extend(write_artifacts([(pointer_path, pointer)], workers=1, serializer=serializer,
+                                   precompress=precompress))
+    remove_unreferenced(data_dir / DELTA_DIR_NAME, [Path(link['file']).name for link in chain], DELTA_PATTERN)
+    return results
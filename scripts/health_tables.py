@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+由 health-guidelines.json 預先計算人類年齡與熱量查表，輸出精簡的 base64 型別陣列。
+
+用法：
+  python scripts/health_tables.py --json data/health-guidelines.json --out data/health-tables.json
+
+行為：
+  - 人類年齡：各物種（狗依體型、倉鼠依品種）每個月齡一格，uint8，已依前端 Math.round 規則取整
+  - 生命階段：每個月齡對應的階段索引，uint8
+  - 熱量：犬貓為 MER = RER × 活動係數 × 體型係數（weight × activity × bodyShape），
+    兔為 caloriesPerKgMin/Max × 體重（weight × [min, max]），皆為 uint16 並乘上 scale
+  - 倉鼠的熱量為固定區間，不需查表
+  - 陣列皆為 little-endian、row-major，前端以 atob + TypedArray 直接使用；
+    權重索引 = round((體重 - start) / step)，超出範圍時夾在兩端
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from age_conversion import AgeConversionEngine
+from instrumentation import add_arguments, instrumented
+
+# 各物種人類年齡表涵蓋的最大月齡（每月一格）
+HUMAN_AGE_MAX_MONTHS = {
+    'cat': 300,
+    'dog': 240,
+    'rabbit': 180,
+    'hamster': 48,
+}
+DEFAULT_MAX_MONTHS = 240
+
+# 熱量表的體重格點 (start, stop, step)，單位公斤
+KCAL_WEIGHT_GRID = {
+    'cat': (0.1, 15.0, 0.1),
+    'dog': (0.5, 90.0, 0.5),
+    'rabbit': (0.1, 8.0, 0.1),
+}
+
+# uint16 熱量值的放大倍率（0.1 kcal 精度）
+KCAL_SCALE = 10
+
+_RER_PATTERN = re.compile(r"([\d.]+)\s*\*\s*weight\(kg\)\s*\^\s*([\d.]+)")
+
+
+def pack_array(arr: np.ndarray, dtype: str) -> Dict[str, Any]:
+    """將陣列轉為 little-endian 後 base64 編碼。"""
+    packed = np.ascontiguousarray(arr, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {
+        'dtype': dtype,
+        'shape': list(packed.shape),
+        'data': base64.b64encode(packed.tobytes()).decode('ascii'),
+    }
+
+
+def unpack_array(obj: Dict[str, Any]) -> np.ndarray:
+    """pack_array 的反向操作（供驗證與除錯使用）。"""
+    dtype = np.dtype(obj['dtype']).newbyteorder('<')
+    raw = base64.b64decode(obj['data'])
+    return np.frombuffer(raw, dtype=dtype).reshape(obj['shape'])
+
+
+def js_round(values: np.ndarray) -> np.ndarray:
+    """與 JavaScript Math.round 相同的取整（.5 一律進位）。"""
+    return np.floor(np.asarray(values, dtype=float) + 0.5)
+
+
+def weight_axis(start: float, stop: float, step: float) -> Dict[str, Any]:
+    count = int(round((stop - start) / step)) + 1
+    return {'start': start, 'step': step, 'count': count}
+
+
+def parse_rer_formula(text: str):
+    """解析 "70 * weight(kg)^0.75" 形式，回傳 (係數, 指數)；無法解析時使用 70 / 0.75。"""
+    m = _RER_PATTERN.search(text or '')
+    if not m:
+        return 70.0, 0.75
+    return float(m.group(1)), float(m.group(2))
+
+
+def build_human_age_tables(engine: AgeConversionEngine, skey: str) -> Dict[str, Any]:
+    model = engine.models[skey]
+    max_months = HUMAN_AGE_MAX_MONTHS.get(skey, DEFAULT_MAX_MONTHS)
+    years = np.arange(max_months + 1) / 12
+    variants = list(model.variants)
+    grid = np.stack([model.human_age(v, years) for v in variants]) if variants else np.zeros((0, years.size))
+    grid = np.clip(js_round(np.nan_to_num(grid)), 0, 255)
+    stage_idx = np.clip(model.stage_index(years), 0, max(len(model.stages) - 1, 0))
+    human_age = pack_array(grid, 'uint8')
+    human_age.update({'variants': variants, 'monthStep': 1})
+    stage = pack_array(stage_idx, 'uint8')
+    stage.update({'labels': model.stages, 'monthStep': 1})
+    return {'humanAge': human_age, 'stage': stage}
+
+
+def build_kcal_table(skey: str, ng: Dict[str, Any]):
+    if skey not in KCAL_WEIGHT_GRID:
+        return None
+    axis = weight_axis(*KCAL_WEIGHT_GRID[skey])
+    weights = axis['start'] + axis['step'] * np.arange(axis['count'])
+
+    if 'rerFormula' in ng:
+        coef, exp = parse_rer_formula(ng['rerFormula'])
+        activity = ng.get('activityMultipliers') or {}
+        body = ng.get('bodyShapeMultipliers') or {}
+        act_keys: List[str] = list(activity)
+        body_keys: List[str] = list(body)
+        rer = coef * np.power(weights, exp)
+        act = np.array([activity[k] for k in act_keys], dtype=float)
+        shape = np.array([body[k] for k in body_keys], dtype=float)
+        mer = rer[:, None, None] * act[None, :, None] * shape[None, None, :]
+        table = pack_array(np.clip(js_round(mer * KCAL_SCALE), 0, 65535), 'uint16')
+        table.update({'kind': 'mer', 'scale': KCAL_SCALE, 'weight': axis,
+                      'activity': act_keys, 'bodyShape': body_keys})
+        return table
+
+    if 'caloriesPerKgMin' in ng or 'caloriesPerKgMax' in ng:
+        per_kg = np.array([ng.get('caloriesPerKgMin', 80), ng.get('caloriesPerKgMax', 120)], dtype=float)
+        cal = weights[:, None] * per_kg[None, :]
+        table = pack_array(np.clip(js_round(cal * KCAL_SCALE), 0, 65535), 'uint16')
+        table.update({'kind': 'perKg', 'scale': KCAL_SCALE, 'weight': axis, 'bound': ['min', 'max']})
+        return table
+    return None
+
+
+def build_lookup_tables(data: Dict[str, Any]) -> Dict[str, Any]:
+    """建立所有物種的查表資料（不含時間戳，內容相同時輸出位元組也相同）。"""
+    engine = AgeConversionEngine.from_guidelines(data)
+    species: Dict[str, Any] = {}
+    for skey in engine.models:
+        entry = build_human_age_tables(engine, skey)
+        ng = data[skey].get('nutritionGuidelines')
+        if isinstance(ng, dict):
+            kcal = build_kcal_table(skey, ng)
+            if kcal is not None:
+                entry['kcal'] = kcal
+        species[skey] = entry
+    return {
+        'version': data.get('metadata', {}).get('version', ''),
+        'species': species,
+    }
+
+
+def dumps_tables(tables: Dict[str, Any]) -> str:
+    return json.dumps(tables, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_lookup_tables(path: Path, data: Dict[str, Any]) -> int:
+    """寫出查表 JSON，回傳位元組數。"""
+    text = dumps_tables(build_lookup_tables(data))
+    with path.open('w', encoding='utf-8') as f:
+        f.write(text)
+    return len(text.encode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='預先計算人類年齡與熱量查表')
+    parser.add_argument('--json', default='data/health-guidelines.json', help='健康指引 JSON 路徑')
+    parser.add_argument('--out', default='data/health-tables.json', help='輸出查表 JSON 路徑')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    js = Path(args.json)
+    if not js.exists():
+        print(f"[ERROR] JSON not found: {js}")
+        return 2
+    with instrumented(args, 'health_tables') as metrics:
+        with metrics.stage('load_json'):
+            with js.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        with metrics.stage('write_tables') as timing:
+            size = write_lookup_tables(Path(args.out), data)
+            timing.add_bytes(size)
+    print(f"已輸出: {args.out} ({size} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
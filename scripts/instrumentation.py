@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+各腳本共用的分階段量測：每個具名階段的牆鐘時間、CPU 時間、tracemalloc 峰值、處理列數與寫出位元組數。
+
+用法（腳本端）：
+  parser = argparse.ArgumentParser(...)
+  add_arguments(parser)                      # 加入 --profile / --metrics-out
+  args = parser.parse_args(argv)
+  with instrumented(args, 'update_health_json') as metrics:
+      with metrics.stage('read_csv') as timing:
+          rows = list(timing.iter(read_csv(path)))     # 逐列計數
+      with metrics.stage('write_json') as timing:
+          timing.add_results(write_artifacts(...))     # 累計實際寫出的位元組數
+
+行為：
+  - 沒有指定 --profile / --metrics-out 時，metrics 為不做任何事的 NULL_METRICS，不影響執行速度
+  - 階段可巢狀，名稱以 / 串接（例如 split_species/cat）；報告依開始順序列出，名稱與順序固定，方便在 commit 間比對
+  - tracemalloc 峰值：每個階段開始時重設峰值，結束時取「本階段與其子階段」的最大值；
+    開啟 tracemalloc 會讓 Python 程式碼變慢數倍，時間數字請與同樣開啟量測的結果比較
+  - CPU 時間為整個行程（含 thread pool）的 process_time；process pool 子行程中的階段可由
+    Metrics.records() 取出、回傳給主行程後以 Metrics.extend() 併入
+  - --metrics-out 以副檔名決定格式：.ndjson 為每列一個 JSON（第一列為整體摘要），其他為單一 JSON；
+    --profile 在結束時把各階段的表格印到 stderr
+  - 階段內發生例外時記錄 error 欄位後照常拋出，報告仍會寫出
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+REPORT_VERSION = 1
+
+
+def _ljust(text: str, width: int) -> str:
+    """依顯示寬度補空白（全形字元佔兩格），讓含中文檔名的階段名稱對齊。"""
+    shown = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    return text + ' ' * max(0, width - shown)
+
+
+class StageRecord:
+    """單一階段的量測值；rows / bytes 由呼叫端累計，其餘於階段結束時填入。"""
+
+    __slots__ = ('name', 'rows', 'bytes', 'wall', 'cpu', 'peak', 'error', '_child_peak')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak: Optional[int] = None
+        self.error: Optional[str] = None
+        self._child_peak = 0
+
+    def add_rows(self, count: int = 1) -> None:
+        self.rows = (self.rows or 0) + count
+
+    def add_bytes(self, count: int) -> None:
+        self.bytes = (self.bytes or 0) + count
+
+    def add_results(self, results: Iterable[Any]) -> None:
+        """累計 ArtifactResult 中實際寫出（內容有變）的檔案大小。"""
+        self.add_bytes(sum(r.size for r in results if r.written))
+
+    def add_file(self, path: Path) -> None:
+        """累計剛寫出的檔案大小（檔案不存在時略過）。"""
+        try:
+            self.add_bytes(os.stat(path).st_size)
+        except OSError:
+            pass
+
+    def iter(self, rows: Iterable[T]) -> Iterator[T]:
+        """原樣產生 rows 並逐列計數。"""
+        count = self.rows or 0
+        try:
+            for row in rows:
+                count += 1
+                yield row
+        finally:
+            self.rows = count
+
+    def to_dict(self) -> Dict[str, Any]:
+        record: Dict[str, Any] = {'stage': self.name, 'wall_s': round(self.wall, 6), 'cpu_s': round(self.cpu, 6)}
+        for key, value in (('peak_bytes', self.peak), ('rows', self.rows), ('bytes', self.bytes),
+                           ('error', self.error)):
+            if value is not None:
+                record[key] = value
+        return record
+
+
+class _NullStage(StageRecord):
+    """停用量測時的階段：所有累計都不做事。"""
+
+    def add_rows(self, count: int = 1) -> None:
+        pass
+
+    def add_bytes(self, count: int) -> None:
+        pass
+
+    def add_results(self, results: Iterable[Any]) -> None:
+        pass
+
+    def add_file(self, path: Path) -> None:
+        pass
+
+    def iter(self, rows: Iterable[T]) -> Iterable[T]:
+        return rows
+
+
+class Metrics:
+    """一次執行的所有階段。enabled=False 時 stage() 只回傳共用的空階段。"""
+
+    def __init__(self, script: str = '', enabled: bool = True, trace_memory: bool = False):
+        self.script = script
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self._records: List[StageRecord] = []
+        self._extra: List[Dict[str, Any]] = []
+        self._stack: List[StageRecord] = []
+        self._null = _NullStage('')
+        self._started_tracing = False
+        self._peak = 0
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    def _take_peak(self) -> int:
+        peak = tracemalloc.get_traced_memory()[1]
+        self._peak = max(self._peak, peak)
+        return peak
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        if not self.enabled:
+            yield self._null
+            return
+        parent = self._stack[-1] if self._stack else None
+        record = StageRecord(f'{parent.name}/{name}' if parent else name)
+        self._records.append(record)
+        if self.trace_memory:
+            if parent is not None:
+                parent._child_peak = max(parent._child_peak, self._take_peak())
+            tracemalloc.reset_peak()
+        self._stack.append(record)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            record.wall = time.perf_counter() - wall0
+            record.cpu = time.process_time() - cpu0
+            self._stack.pop()
+            if self.trace_memory:
+                record.peak = max(record._child_peak, self._take_peak())
+                if parent is not None:
+                    parent._child_peak = max(parent._child_peak, record.peak)
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [r.to_dict() for r in self._records] + list(self._extra)
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        """併入其他行程回傳的階段（例如 process pool 中各檔案的驗證）。"""
+        if self.enabled:
+            self._extra.extend(records)
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            'version': REPORT_VERSION,
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'python': platform.python_version(),
+            'wall_s': round(time.perf_counter() - self._wall0, 6),
+            'cpu_s': round(time.process_time() - self._cpu0, 6),
+        }
+        if self.trace_memory:
+            summary['peak_bytes'] = max(self._peak, tracemalloc.get_traced_memory()[1])
+        return summary
+
+    def write(self, path: Path) -> None:
+        from artifact_writer import atomic_write_bytes, dumps_json
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == '.ndjson':
+            lines = [self.summary()] + self.records()
+            payload = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+        else:
+            payload = dumps_json({**self.summary(), 'stages': self.records()})
+        atomic_write_bytes(path, payload)
+
+    def print_table(self, file=None) -> None:
+        file = file or sys.stderr
+        summary = self.summary()
+        print(f"{'stage':<32} {'wall (s)':>9} {'cpu (s)':>9} {'peak MiB':>9} {'rows':>9} {'bytes':>11}", file=file)
+        for r in self.records() + [dict(summary, stage='(total)')]:
+            peak = f"{r['peak_bytes'] / (1024 * 1024):.1f}" if 'peak_bytes' in r else ''
+            line = (f"{_ljust(r['stage'], 32)} {r['wall_s']:>9.3f} {r['cpu_s']:>9.3f} {peak:>9} "
+                    f"{r.get('rows', ''):>9} {r.get('bytes', ''):>11}")
+            print(line + (f"  ✗ {r['error']}" if 'error' in r else ''), file=file)
+
+    def close(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+NULL_METRICS = Metrics(enabled=False)
+
+
+def add_arguments(parser) -> None:
+    """加入 --profile / --metrics-out 選項。"""
+    parser.add_argument('--profile', action='store_true',
+                        help='量測各階段的時間、CPU、記憶體峰值、列數與寫出位元組，結束時印出表格')
+    parser.add_argument('--metrics-out', help='量測報告輸出路徑（.ndjson 為每列一個 JSON，其他為單一 JSON）')
+
+
+@contextmanager
+def instrumented(args, script: str) -> Iterator[Metrics]:
+    """依 --profile / --metrics-out 建立 Metrics；結束時（含例外）印出表格與寫出報告。"""
+    if not (getattr(args, 'profile', False) or getattr(args, 'metrics_out', None)):
+        yield NULL_METRICS
+        return
+    metrics = Metrics(script, trace_memory=True)
+    try:
+        yield metrics
+    finally:
+        if args.profile:
+            metrics.print_table()
+        if args.metrics_out:
+            metrics.write(Path(args.metrics_out))
+        metrics.close()
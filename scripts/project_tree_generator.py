@@ -6,6 +6,13 @@ File: project_tree_generator.py
 說明: 簡單的專案目錄樹結構生成工具，建立專案資料夾結構的視覺化表示
      將目錄樹結構儲存到 project_structure.txt，適用於文件記錄和專案結構概覽
      自動掃描專案資料夾並生成層級式目錄結構
+     --cache：保存各目錄的 mtime / inode 與清單快照，重跑時只重新掃描有變動的目錄，
+              沒變的子樹直接沿用上次輸出中的區段
+     --watch：持續監看（定期 stat 目錄，沒有變動時不掃描也不寫檔）
+     預設依各層 .gitignore 排除項目（被忽略的目錄不會往下走訪），--no-gitignore 停用
+     --format ndjson / json：機器可讀輸出，每個目錄附上由下而上加總的位元組數與檔案數；
+              --top N 列出最大的 N 個子目錄與檔案（追蹤 assets/ 等資源的膨脹）
+     --profile / --metrics-out：掃描與輸出兩個階段的時間、記憶體峰值、項目數與寫出位元組
 重要提醒: 輸出檔案為根目錄的 project_structure.txt
 Authors: 楊翔志 & AI Collective
 Studio: tranquility-base
@@ -13,8 +20,17 @@ Studio: tranquility-base
 """
 import os
 import argparse
+import hashlib
+import heapq
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+from artifact_writer import atomic_open, atomic_write_bytes, write_if_changed
+from gitignore_matcher import GITIGNORE_NAME, read_gitignore, rules_for_root
+from instrumentation import add_arguments, instrumented
+
 EXCLUDE_DIRS = {
     '.git', '__pycache__', '.mypy_cache', '.pytest_cache', '.DS_Store', 
     'dist', 'build', '.coverage', '.tox', '.eggs'
@@ -25,59 +41,78 @@ SHOW_DIRS_ONLY = {
 }
 
 EXCLUDE_FILES = {
-    '.gitignore', '.DS_Store', 'Thumbs.db', '.env', '.env.local',
-    '.coverage', '.pyc', '.pyo', '.pyd', '.log', '.tmp', '.cache'
+    '.gitignore', '.DS_Store', 'Thumbs.db', '.env', '.env.local', '.coverage'
+}
+
+# 依副檔名排除的檔案（*.pyc 等）
+EXCLUDE_EXTENSIONS = {
+    '.pyc', '.pyo', '.pyd', '.log', '.tmp', '.cache'
+}
+
+# 快照快取（--cache / --watch）
+SNAPSHOT_VERSION = 3
+DEFAULT_SNAPSHOT = os.path.join('.build', 'project_tree_snapshot.json')
+# 目錄 mtime 距掃描開始不到此時間時不信任（檔案系統的 mtime 精度可能只有 1–2 秒）
+RACY_NS = 2_000_000_000
+
+# 輸出格式與預設輸出檔
+OUTPUT_FORMATS = ('text', 'ndjson', 'json')
+DEFAULT_OUTPUTS = {
+    'text': 'project_structure.txt',
+    'ndjson': 'project_structure.ndjson',
+    'json': 'project_structure.json',
+}
+
+# 副檔名 → emoji（模組層級建立一次，避免每個檔案都重建對照表）
+FILE_EMOJI = {
+    # 程式碼檔案
+    '.py': '🐍', '.js': '🟨', '.ts': '🔷', '.jsx': '⚛️', '.tsx': '⚛️',
+    '.html': '🌐', '.css': '🎨', '.scss': '🎨', '.sass': '🎨',
+    '.java': '☕', '.cpp': '⚡', '.c': '⚡', '.cs': '💎', '.php': '🐘',
+    '.rb': '💎', '.go': '🐹', '.rs': '🦀', '.swift': '🍎', '.kt': '🤖',
+    '.vue': '💚', '.svelte': '🧡', '.dart': '🎯', '.scala': '🔴',
+    
+    # 資料檔案
+    '.json': '📋', '.xml': '📋', '.yaml': '📋', '.yml': '📋',
+    '.csv': '📊', '.xlsx': '📈', '.xls': '📈', '.sql': '🗃️',
+    '.db': '🗃️', '.sqlite': '🗃️', '.sqlite3': '🗃️',
+    
+    # 文件檔案
+    '.md': '📝', '.txt': '📄', '.pdf': '📕', '.doc': '📘', '.docx': '📘',
+    '.rtf': '📄', '.odt': '📄', '.pages': '📄',
+    
+    # 圖片檔案
+    '.jpg': '🖼️', '.jpeg': '🖼️', '.png': '🖼️', '.gif': '🖼️',
+    '.bmp': '🖼️', '.tiff': '🖼️', '.svg': '🎨', '.ico': '🖼️',
+    '.webp': '🖼️', '.heic': '🖼️', '.raw': '📸',
+    
+    # 影音檔案
+    '.mp4': '🎬', '.avi': '🎬', '.mkv': '🎬', '.mov': '🎬',
+    '.wmv': '🎬', '.flv': '🎬', '.webm': '🎬',
+    '.mp3': '🎵', '.wav': '🎵', '.flac': '🎵', '.aac': '🎵',
+    '.ogg': '🎵', '.m4a': '🎵',
+    
+    # 壓縮檔案
+    '.zip': '📦', '.rar': '📦', '.7z': '📦', '.tar': '📦',
+    '.gz': '📦', '.bz2': '📦', '.xz': '📦',
+    
+    # 設定檔案
+    '.config': '⚙️', '.conf': '⚙️', '.cfg': '⚙️', '.ini': '⚙️',
+    '.toml': '⚙️', '.env': '🔧', '.properties': '⚙️',
+    
+    # 其他常見檔案
+    '.log': '📋', '.tmp': '🗂️', '.cache': '🗂️', '.lock': '🔒',
+    '.key': '🔑', '.pem': '🔑', '.crt': '🔑', '.cert': '🔑',
+    '.gitignore': '🚫', '.dockerignore': '🚫',
+    '.dockerfile': '🐳', '.docker': '🐳',
+    'makefile': '🔨', '.mk': '🔨',
+    '.sh': '💻', '.bat': '💻', '.cmd': '💻', '.ps1': '💻',
 }
 
 def get_file_emoji(filename):
     """根據檔案類型返回對應的 emoji"""
     ext = os.path.splitext(filename)[1].lower()
     
-    emoji_map = {
-        # 程式碼檔案
-        '.py': '🐍', '.js': '🟨', '.ts': '🔷', '.jsx': '⚛️', '.tsx': '⚛️',
-        '.html': '🌐', '.css': '🎨', '.scss': '🎨', '.sass': '🎨',
-        '.java': '☕', '.cpp': '⚡', '.c': '⚡', '.cs': '💎', '.php': '🐘',
-        '.rb': '💎', '.go': '🐹', '.rs': '🦀', '.swift': '🍎', '.kt': '🤖',
-        '.vue': '💚', '.svelte': '🧡', '.dart': '🎯', '.scala': '🔴',
-        
-        # 資料檔案
-        '.json': '📋', '.xml': '📋', '.yaml': '📋', '.yml': '📋',
-        '.csv': '📊', '.xlsx': '📈', '.xls': '📈', '.sql': '🗃️',
-        '.db': '🗃️', '.sqlite': '🗃️', '.sqlite3': '🗃️',
-        
-        # 文件檔案
-        '.md': '📝', '.txt': '📄', '.pdf': '📕', '.doc': '📘', '.docx': '📘',
-        '.rtf': '📄', '.odt': '📄', '.pages': '📄',
-        
-        # 圖片檔案
-        '.jpg': '🖼️', '.jpeg': '🖼️', '.png': '🖼️', '.gif': '🖼️',
-        '.bmp': '🖼️', '.tiff': '🖼️', '.svg': '🎨', '.ico': '🖼️',
-        '.webp': '🖼️', '.heic': '🖼️', '.raw': '📸',
-        
-        # 影音檔案
-        '.mp4': '🎬', '.avi': '🎬', '.mkv': '🎬', '.mov': '🎬',
-        '.wmv': '🎬', '.flv': '🎬', '.webm': '🎬',
-        '.mp3': '🎵', '.wav': '🎵', '.flac': '🎵', '.aac': '🎵',
-        '.ogg': '🎵', '.m4a': '🎵',
-        
-        # 壓縮檔案
-        '.zip': '📦', '.rar': '📦', '.7z': '📦', '.tar': '📦',
-        '.gz': '📦', '.bz2': '📦', '.xz': '📦',
-        
-        # 設定檔案
-        '.config': '⚙️', '.conf': '⚙️', '.cfg': '⚙️', '.ini': '⚙️',
-        '.toml': '⚙️', '.env': '🔧', '.properties': '⚙️',
-        
-        # 其他常見檔案
-        '.log': '📋', '.tmp': '🗂️', '.cache': '🗂️', '.lock': '🔒',
-        '.key': '🔑', '.pem': '🔑', '.crt': '🔑', '.cert': '🔑',
-        '.gitignore': '🚫', '.dockerignore': '🚫',
-        '.dockerfile': '🐳', '.docker': '🐳',
-        'makefile': '🔨', '.mk': '🔨',
-        '.sh': '💻', '.bat': '💻', '.cmd': '💻', '.ps1': '💻',
-    }
-    
     # 特殊檔案名稱處理
     lower_name = filename.lower()
     if lower_name in ['readme', 'readme.md', 'readme.txt']:
@@ -101,14 +136,16 @@ def get_file_emoji(filename):
     elif lower_name in ['go.mod', 'go.sum']:
         return '🐹'
     
-    return emoji_map.get(ext, '📄')
+    return FILE_EMOJI.get(ext, '📄')
 
 def should_exclude(name, is_dir=False):
     """檢查是否應該排除此項目"""
     if is_dir:
         return name in EXCLUDE_DIRS
     else:
-        return name in EXCLUDE_FILES or name.startswith('.') and name not in ['.env', '.gitignore']
+        if name in EXCLUDE_FILES or os.path.splitext(name)[1].lower() in EXCLUDE_EXTENSIONS:
+            return True
+        return name.startswith('.') and name not in ['.env', '.gitignore']
 
 def group_files_by_extension(files):
     """將檔案按副檔名分組，重要檔案類型不省略"""
@@ -140,128 +177,572 @@ def group_files_by_extension(files):
     
     return result
 
+def format_size(size):
+    """將位元組數轉為人類可讀格式"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}TB"
+
 def get_file_size(path):
     """獲取檔案大小（以人類可讀格式）"""
     try:
-        size = os.path.getsize(path)
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f}{unit}"
-            size /= 1024.0
-        return f"{size:.1f}TB"
+        return format_size(os.path.getsize(path))
     except OSError:
         return ""
 
-def print_tree(root, prefix="", file=None, show_size=False, max_depth=None, current_depth=0):
-    """遞歸打印目錄樹"""
-    if max_depth is not None and current_depth >= max_depth:
-        return
-    
+class DirScan:
+    """單一目錄的掃描結果（一次 scandir，沿用 DirEntry 快取的型別與 stat）"""
+    __slots__ = ('path', 'rel', 'depth', 'dirs', 'files', 'sizes', 'error', 'children',
+                 'stat', 'clean', 'span', 'total_bytes', 'total_files', 'total_dirs', 'complete',
+                 'ignore', 'has_gitignore')
+
+    def __init__(self, path, depth, rel=''):
+        self.path = path
+        self.rel = rel        # 相對於根目錄的路徑（'/' 分隔，根目錄為 ''），快照的 key
+        self.depth = depth
+        self.dirs = []        # 要列出的子目錄名稱（已排序）
+        self.files = []       # 要列出的檔案名稱（scandir 順序，與 os.listdir 相同）
+        self.sizes = {}       # 檔案名稱 → 位元組數（需要大小時才取得）
+        self.error = None     # 'permission' 或錯誤訊息
+        self.children = {}    # 子目錄名稱 → DirScan（只含需要展開的目錄）
+        self.stat = None      # (mtime_ns, inode, device)；None 表示下次一定重新掃描
+        self.clean = False    # 與快照相同（render 前會擴展為「整棵子樹都相同」）
+        self.span = None      # 上次輸出中的位置：(相對父目錄區塊的行偏移, 行數, 前綴片段)
+        # 整棵子樹的加總（scan 結束時由下而上計算）；complete 為 False 表示子樹中有未展開的目錄
+        self.total_bytes = 0
+        self.total_files = 0
+        self.total_dirs = 0
+        self.complete = True
+        self.ignore = None          # 本目錄適用的 .gitignore 比對器（IgnoreRules；停用時為 None）
+        self.has_gitignore = False  # 本目錄是否有 .gitignore
+
+    def listing(self):
+        return self.dirs, self.files, self.sizes, self.error
+
+def _stat_key(st, started_ns):
+    """可信任的目錄 stat key；mtime 太接近掃描時間時回傳 None"""
+    if st.st_mtime_ns + RACY_NS > started_ns:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_dev)
+
+def scan_directory(path, depth, show_size=False, rel='', track=False, rules=None, match_prefix=''):
+    """以 os.scandir 掃描單一目錄，套用排除規則；track 時記錄目錄的 stat key 供快照使用
+
+    rules 為父目錄的 .gitignore 比對器：本目錄有 .gitignore 時疊加其規則，被忽略的項目不列出，
+    被忽略的子目錄因此也不會再往下走訪。match_prefix 為根目錄相對於儲存庫頂層的路徑前綴。
+    """
+    node = DirScan(path, depth, rel)
+    node.ignore = rules
     try:
-        all_entries = os.listdir(root)
-        
-        # 分離目錄和檔案
-        directories = []
-        files = []
-        
-        for entry in all_entries:
-            path = os.path.join(root, entry)
-            if os.path.isdir(path):
-                # 檢查是否為只顯示目錄的特殊目錄
-                if entry in SHOW_DIRS_ONLY:
-                    directories.append(entry)
-                elif not should_exclude(entry, True):
-                    directories.append(entry)
-            else:
-                if not should_exclude(entry, False):
-                    files.append(entry)
-        
-        # 對目錄排序
-        directories.sort()
-        
-        # 對檔案按副檔名分組並限制數量
-        grouped_files = group_files_by_extension(files)
-        grouped_files.sort()
-        
-        # 合併目錄和檔案
-        all_entries = directories + grouped_files
-        
-        for idx, entry in enumerate(all_entries):
-            connector = "└── " if idx == len(all_entries) - 1 else "├── "
-            
+        if track:
+            started_ns = time.time_ns()
+            st = os.stat(path)
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # 只顯示目錄的特殊目錄也要列出
+                    if name in SHOW_DIRS_ONLY or not should_exclude(name, True):
+                        entries.append((name, True, entry))
+                else:
+                    if name == GITIGNORE_NAME:
+                        node.has_gitignore = True
+                    if not should_exclude(name, False):
+                        entries.append((name, False, entry))
+        if rules is not None and node.has_gitignore:
+            text = read_gitignore(path)
+            if text is not None:
+                node.ignore = rules.child((match_prefix + rel).rstrip('/'), text)
+        check = node.ignore is not None and not node.ignore.empty
+        base = match_prefix + (f"{rel}/" if rel else '')
+        for name, is_dir, entry in entries:
+            if check and not (is_dir and name in SHOW_DIRS_ONLY) and node.ignore.ignored(base + name, is_dir):
+                continue
+            if is_dir:
+                node.dirs.append(name)
+                continue
+            node.files.append(name)
+            if show_size:
+                try:
+                    node.sizes[name] = entry.stat().st_size
+                except OSError:
+                    pass
+        if track:
+            node.stat = _stat_key(st, started_ns)
+    except PermissionError:
+        node.dirs, node.files, node.sizes = [], [], {}
+        node.error = 'permission'
+    except Exception as e:
+        node.dirs, node.files, node.sizes = [], [], {}
+        node.error = str(e)
+    node.dirs.sort()
+    return node
+
+def rules_fingerprint(use_gitignore=False):
+    """排除規則的指紋；規則改變時舊快照作廢（.gitignore 內容另記在各目錄的快照中）"""
+    rules = [sorted(EXCLUDE_DIRS), sorted(SHOW_DIRS_ONLY), sorted(EXCLUDE_FILES), sorted(EXCLUDE_EXTENSIONS),
+             use_gitignore]
+    return hashlib.sha256(json.dumps(rules).encode('utf-8')).hexdigest()[:16]
+
+class TreeScan:
+    """整棵樹的掃描結果與統計（目錄數、檔案數與 count_items 的定義相同）
+
+    previous 為上次的快照（load_snapshot 的結果）：目錄的 mtime / inode 未變時直接沿用
+    上次的清單，不再 scandir；render 時整棵子樹都沒變的目錄直接從上次的輸出剪下貼上。
+    use_gitignore 時依各層 .gitignore 剪枝（含根目錄以上到儲存庫頂層的規則）。
+    """
+
+    def __init__(self, root, max_depth=None, show_size=False, previous=None, track=False,
+                 collect_sizes=False, use_gitignore=False):
+        self.root = root
+        self.use_gitignore = use_gitignore
+        self.root_rules, self.match_prefix = rules_for_root(root) if use_gitignore else (None, '')
+        self.max_depth = max_depth
+        self.show_size = show_size
+        # 顯示大小或需要加總（機器可讀輸出、--top）時才 stat 檔案
+        self.collect_sizes = show_size or collect_sizes
+        self.previous = previous or {}
+        self.track = track or previous is not None
+        self.dir_count = 0
+        self.file_count = 0
+        self.rescanned = 0
+        self.root_node = None
+        self.nodes = []       # 掃描順序（父目錄一定在子目錄之前）
+
+    def _expandable(self, node):
+        """node 底下需要再掃描的子目錄"""
+        if self.max_depth is not None and node.depth + 1 >= self.max_depth:
+            return []
+        return [name for name in node.dirs if name not in SHOW_DIRS_ONLY]
+
+    def _add(self, node):
+        self.nodes.append(node)
+        self.dir_count += len(node.dirs)
+        self.file_count += len(node.files)
+
+    def _rules_for(self, path, rel, parent_rules, has_gitignore):
+        """本目錄的 .gitignore 比對器；快照記錄有 .gitignore 但讀不到時回傳 False（需重新掃描）"""
+        if parent_rules is None or not has_gitignore:
+            return parent_rules
+        text = read_gitignore(path)
+        if text is None:
+            return False
+        return parent_rules.child((self.match_prefix + rel).rstrip('/'), text)
+
+    def _reuse(self, path, depth, rel, entry, parent_rules):
+        """目錄未變時由快照還原；需要大小時仍要重新取得（檔案內容改變不會更新目錄 mtime）
+
+        .gitignore 就地修改也不會更新目錄 mtime，因此每次都重新讀取有 .gitignore 的目錄，
+        適用規則（含所有上層）的指紋與快照不同時改為重新掃描。"""
+        if entry is None or entry.get('stat') is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if [st.st_mtime_ns, st.st_ino, st.st_dev] != entry['stat']:
+            return None
+        rules = self._rules_for(path, rel, parent_rules, entry.get('gitignore'))
+        if rules is False or (rules.fingerprint if rules is not None else None) != entry.get('ignore'):
+            return None
+        node = DirScan(path, depth, rel)
+        node.dirs, node.files, node.error = entry['dirs'], entry['files'], entry.get('error')
+        node.ignore, node.has_gitignore = rules, bool(entry.get('gitignore'))
+        node.stat = tuple(entry['stat'])
+        node.clean = True
+        if self.collect_sizes:
+            old_sizes = entry.get('sizes') or {}
+            for name in node.files:
+                try:
+                    node.sizes[name] = os.stat(os.path.join(path, name)).st_size
+                except OSError:
+                    pass
+            node.clean = node.sizes == old_sizes
+        return node
+
+    def _load(self, path, depth, rel, parent_rules):
+        entry = self.previous.get(rel)
+        node = self._reuse(path, depth, rel, entry, parent_rules)
+        if node is None:
+            node = scan_directory(path, depth, self.collect_sizes, rel, self.track,
+                                  parent_rules, self.match_prefix)
+            self.rescanned += 1
+            node.clean = entry is not None and node.listing() == (
+                entry['dirs'], entry['files'], entry.get('sizes') or {}, entry.get('error'))
+        if entry is not None and entry.get('span') is not None:
+            node.span = tuple(entry['span'])
+        return node
+
+    def _child(self, node, name):
+        rel = f"{node.rel}/{name}" if node.rel else name
+        return os.path.join(node.path, name), node.depth + 1, rel, node.ignore
+
+    def scan(self, workers=None):
+        """以明確堆疊走訪；workers > 1 時以 thread pool 平行掃描子目錄"""
+        if self.max_depth is not None and self.max_depth <= 0:
+            return self
+        self.root_node = self._load(self.root, 0, '', self.root_rules)
+        self._add(self.root_node)
+        if workers and workers > 1:
+            self._scan_parallel(workers)
+        else:
+            stack = [self.root_node]
+            while stack:
+                node = stack.pop()
+                for name in self._expandable(node):
+                    child = self._load(*self._child(node, name))
+                    node.children[name] = child
+                    self._add(child)
+                    stack.append(child)
+        self._aggregate()
+        return self
+
+    def _aggregate(self):
+        """由下而上（掃描順序的反序，子目錄一定先於父目錄）加總子樹大小，並擴展 clean：
+        子樹中任何目錄有變動，祖先都不能整段沿用上次的輸出"""
+        for node in reversed(self.nodes):
+            children = node.children.values()
+            node.total_bytes = sum(node.sizes.values()) + sum(child.total_bytes for child in children)
+            node.total_files = len(node.files) + sum(child.total_files for child in children)
+            node.total_dirs = len(node.dirs) + sum(child.total_dirs for child in children)
+            node.complete = (node.error is None and len(node.children) == len(node.dirs)
+                             and all(child.complete for child in children))
+            if node.clean and not all(child.clean for child in children):
+                node.clean = False
+
+    def _scan_parallel(self, workers):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def submit(node):
+                for name in self._expandable(node):
+                    future = executor.submit(self._load, *self._child(node, name))
+                    pending[future] = (node, name)
+
+            submit(self.root_node)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parent, name = pending.pop(future)
+                    child = future.result()
+                    parent.children[name] = child
+                    self._add(child)
+                    submit(child)
+
+    def render_lines(self, prefix="", previous_lines=None):
+        """產生樹狀文字的各行（與逐層遞迴的 print_tree 輸出相同）
+
+        previous_lines 為上次輸出的樹狀部分；整棵子樹未變的目錄直接沿用其中的區段，
+        前綴（│ 縱線與縮排）不同時只替換行首。渲染後各目錄的 span 更新為這次的位置。
+        """
+        out = []
+        if self.root_node is None:
+            return out
+        stack = []
+        starts = {}   # rel → 這次輸出中的起始行
+        old = {}      # rel → (上次輸出中的起始行, 上次的前綴)
+
+        def enter(node, node_prefix, segment, parent):
+            start = len(out)
+            starts[node.rel] = start
+            parent_start = starts[parent.rel] if parent is not None else 0
+            position = None
+            if previous_lines is not None and node.span is not None:
+                if parent is None:
+                    position = (node.span[0], node.span[2])
+                elif parent.rel in old:
+                    parent_old_start, parent_old_prefix = old[parent.rel]
+                    position = (parent_old_start + node.span[0], parent_old_prefix + node.span[2])
+            if position is not None:
+                old[node.rel] = position
+                old_start, old_prefix = position
+                length = node.span[1]
+                if node.clean and old_start + length <= len(previous_lines):
+                    block = previous_lines[old_start:old_start + length]
+                    if old_prefix != node_prefix:
+                        cut = len(old_prefix)
+                        block = [node_prefix + line[cut:] for line in block]
+                    out.extend(block)
+                    node.span = (start - parent_start, length, segment)
+                    return
+            if node.error is not None:
+                if node.error == 'permission':
+                    out.append(node_prefix + "├── 🚫 [權限不足]\n")
+                else:
+                    out.append(node_prefix + f"├── ❌ [錯誤: {node.error}]\n")
+                node.span = (start - parent_start, 1, segment)
+                return
+            # 對檔案按副檔名分組並限制數量
+            grouped_files = group_files_by_extension(node.files)
+            grouped_files.sort()
+            stack.append([node, node_prefix, node.dirs + grouped_files, set(node.dirs), 0,
+                          parent_start, segment])
+
+        enter(self.root_node, prefix, prefix, None)
+        while stack:
+            frame = stack[-1]
+            node, node_prefix, entries, dir_names, idx, parent_start, segment = frame
+            if idx >= len(entries):
+                stack.pop()
+                start = starts[node.rel]
+                node.span = (start - parent_start, len(out) - start, segment)
+                continue
+            frame[4] = idx + 1
+            entry = entries[idx]
+            is_last = idx == len(entries) - 1
+            connector = "└── " if is_last else "├── "
+
             # 檢查是否為統計資訊
             if entry.startswith("... 還有"):
-                file.write(prefix + connector + f"📊 {entry}\n")
+                out.append(node_prefix + connector + f"📊 {entry}\n")
                 continue
-            
-            path = os.path.join(root, entry)
-            
-            # 準備顯示文字
-            if os.path.isdir(path):
-                # 目錄圖示
-                if entry in SHOW_DIRS_ONLY:
-                    emoji = "📁"
-                else:
-                    emoji = "📂"
-                display_text = f"{emoji} {entry}"
+
+            if entry in dir_names:
+                emoji = "📁" if entry in SHOW_DIRS_ONLY else "📂"
+                out.append(node_prefix + connector + f"{emoji} {entry}\n")
+                child = node.children.get(entry)
+                if child is not None:
+                    child_segment = "    " if is_last else "│   "
+                    enter(child, node_prefix + child_segment, child_segment, node)
             else:
-                # 檔案圖示
-                emoji = get_file_emoji(entry)
-                display_text = f"{emoji} {entry}"
-                
-                if show_size:
-                    size = get_file_size(path)
-                    if size:
-                        display_text += f" ({size})"
-            
-            file.write(prefix + connector + display_text + "\n")
-            
-            # 如果是目錄且不在只顯示目錄的清單中，遞歸處理
-            if os.path.isdir(path) and entry not in SHOW_DIRS_ONLY:
-                extension = "    " if idx == len(all_entries) - 1 else "│   "
-                print_tree(path, prefix + extension, file, show_size, max_depth, current_depth + 1)
-                
-    except PermissionError:
-        file.write(prefix + "├── 🚫 [權限不足]\n")
-    except Exception as e:
-        file.write(prefix + f"├── ❌ [錯誤: {str(e)}]\n")
+                display_text = f"{get_file_emoji(entry)} {entry}"
+                if self.show_size and entry in node.sizes:
+                    display_text += f" ({format_size(node.sizes[entry])})"
+                out.append(node_prefix + connector + display_text + "\n")
+        return out
+
+    def render(self, file, prefix=""):
+        """輸出樹狀文字（與逐層遞迴的 print_tree 輸出相同）"""
+        file.write(''.join(self.render_lines(prefix)))
+
+    def snapshot(self):
+        """目前掃描結果的快照（render_lines 之後呼叫，才有各目錄在輸出中的位置）"""
+        dirs = {}
+        for node in self.nodes:
+            entry = {'stat': list(node.stat) if node.stat else None,
+                     'dirs': node.dirs, 'files': node.files, 'error': node.error,
+                     'span': list(node.span) if node.span else None,
+                     'gitignore': node.has_gitignore,
+                     'ignore': node.ignore.fingerprint if node.ignore is not None else None}
+            if self.collect_sizes:
+                entry['sizes'] = node.sizes
+            dirs[node.rel] = entry
+        return {
+            'version': SNAPSHOT_VERSION,
+            'root': self.root,
+            'sizes': self.collect_sizes,
+            'max_depth': self.max_depth,
+            'rules': rules_fingerprint(self.use_gitignore),
+            'dirs': dirs,
+        }
+
+def print_tree(root, prefix="", file=None, show_size=False, max_depth=None, current_depth=0):
+    """打印目錄樹（單次 scandir 走訪後輸出）"""
+    remaining = None if max_depth is None else max_depth - current_depth
+    TreeScan(root, remaining, show_size).scan().render(file, prefix)
 
 def count_items(root, max_depth=None, current_depth=0):
     """計算目錄和檔案數量"""
-    if max_depth is not None and current_depth >= max_depth:
-        return 0, 0
-    
-    dirs = 0
-    files = 0
-    
+    remaining = None if max_depth is None else max_depth - current_depth
+    tree = TreeScan(root, remaining).scan()
+    return tree.dir_count, tree.file_count
+
+def load_snapshot(snapshot_path, root, collect_sizes, use_gitignore=False):
+    """讀取快照；版本、根目錄、是否記錄大小或排除規則不同時視為沒有快照"""
     try:
-        for entry in os.listdir(root):
-            path = os.path.join(root, entry)
-            if os.path.isdir(path):
-                if entry in SHOW_DIRS_ONLY:
-                    dirs += 1
-                elif not should_exclude(entry, True):
-                    dirs += 1
-                    sub_dirs, sub_files = count_items(path, max_depth, current_depth + 1)
-                    dirs += sub_dirs
-                    files += sub_files
-            else:
-                if not should_exclude(entry, False):
-                    files += 1
-    except (PermissionError, OSError):
-        pass
-    
-    return dirs, files
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('version') != SNAPSHOT_VERSION or data.get('root') != root
+            or data.get('sizes') != collect_sizes or data.get('rules') != rules_fingerprint(use_gitignore)):
+        return None
+    return data
+
+def previous_tree_lines(snapshot, output_path, max_depth, show_size):
+    """上次輸出檔中的樹狀部分；輸出檔被改過、深度限制或是否顯示大小不同時回傳 None（改為全部重新產生）"""
+    output = (snapshot or {}).get('output')
+    if (not output or snapshot.get('max_depth') != max_depth or output.get('show_size') != show_size
+            or output.get('path') != os.path.abspath(output_path)):
+        return None
+    try:
+        data = Path(output_path).read_bytes()
+    except OSError:
+        return None
+    if hashlib.sha256(data).hexdigest() != output.get('sha256'):
+        return None
+    lines = data.decode('utf-8').split('\n')
+    count = output.get('tree_lines', 0)
+    if len(lines) < count + 1:
+        return None
+    # 第一行為標題（📁 根目錄名稱）
+    return [line + '\n' for line in lines[1:count + 1]]
+
+def save_snapshot(snapshot_path, tree, output_path, text=None, lines=None):
+    snapshot = tree.snapshot()
+    # 只有文字輸出能剪貼重用；檔名含換行時無法依行對應，只保存目錄清單
+    if text is not None and sum(line.count('\n') for line in lines) == len(lines):
+        snapshot['output'] = {
+            'path': os.path.abspath(output_path),
+            'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            'tree_lines': len(lines),
+            'show_size': tree.show_size,
+        }
+    data = json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    atomic_write_bytes(Path(snapshot_path), data)
+
+def build_output(tree, folder_name, show_stats, previous_lines=None):
+    """組合輸出檔內容，回傳 (全文, 樹狀部分的各行)"""
+    lines = tree.render_lines(previous_lines=previous_lines)
+    parts = [f"📁 {folder_name}\n", ''.join(lines)]
+    if show_stats:
+        dirs, files = tree.dir_count, tree.file_count
+        parts.append(f"\n📊 統計資訊:\n")
+        parts.append(f"📂 目錄數量: {dirs}\n")
+        parts.append(f"📄 檔案數量: {files}\n")
+        parts.append(f"📋 總計: {dirs + files} 個項目\n")
+    return ''.join(parts), lines
+
+def _dir_record(node):
+    record = {'type': 'dir', 'path': node.rel or '.', 'depth': node.depth, 'scanned': True,
+              'bytes': node.total_bytes, 'files': node.total_files, 'dirs': node.total_dirs,
+              'complete': node.complete}
+    if node.error is not None:
+        record['error'] = node.error
+    return record
+
+def iter_records(tree):
+    """依前序（目錄名稱排序）逐筆產生目錄與檔案紀錄；目錄紀錄帶有整棵子樹的加總。
+    只顯示名稱或超過深度限制而未展開的目錄 scanned 為 False，不含加總。"""
+    if tree.root_node is None:
+        return
+    stack = [(tree.root_node, None, 0)]
+    while stack:
+        node, rel, depth = stack.pop()
+        if node is None:
+            yield {'type': 'dir', 'path': rel, 'depth': depth, 'scanned': False}
+            continue
+        yield _dir_record(node)
+        base = f"{node.rel}/" if node.rel else ''
+        for name in sorted(node.files):
+            yield {'type': 'file', 'path': base + name, 'bytes': node.sizes.get(name),
+                   'ext': os.path.splitext(name)[1].lower()}
+        for name in reversed(node.dirs):
+            stack.append((node.children.get(name), base + name, node.depth + 1))
+
+def top_subtrees(tree, n):
+    """位元組數最大的 n 個子目錄（不含根目錄）"""
+    nodes = (node for node in tree.nodes if node is not tree.root_node)
+    return [{'path': node.rel, 'bytes': node.total_bytes, 'files': node.total_files}
+            for node in heapq.nlargest(n, nodes, key=lambda node: (node.total_bytes, node.rel))]
+
+def top_files(tree, n):
+    """最大的 n 個檔案"""
+    def files():
+        for node in tree.nodes:
+            base = f"{node.rel}/" if node.rel else ''
+            for name, size in node.sizes.items():
+                yield size, base + name
+    return [{'path': path, 'bytes': size} for size, path in heapq.nlargest(n, files())]
+
+def summary_record(tree, folder_name, top):
+    root = tree.root_node
+    record = {
+        'type': 'summary',
+        'root': folder_name,
+        'max_depth': tree.max_depth,
+        'bytes': root.total_bytes if root else 0,
+        'files': tree.file_count,
+        'dirs': tree.dir_count,
+        'complete': root.complete if root else False,
+    }
+    if top:
+        record['top_dirs'] = top_subtrees(tree, top)
+        record['top_files'] = top_files(tree, top)
+    return record
+
+def write_records(tree, folder_name, output_path, output_format, top):
+    """串流寫出 NDJSON（第一行為 summary，其後每行一筆）或 JSON（{"summary": …, "entries": […]}）"""
+    def dumps(record):
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+    summary = summary_record(tree, folder_name, top)
+    with atomic_open(Path(output_path), 'w', encoding='utf-8') as f:
+        if output_format == 'ndjson':
+            f.write(dumps(summary) + '\n')
+            for record in iter_records(tree):
+                f.write(dumps(record) + '\n')
+            return
+        f.write('{"summary":' + dumps(summary) + ',"entries":[')
+        for i, record in enumerate(iter_records(tree)):
+            f.write((',\n' if i else '\n') + dumps(record))
+        f.write('\n]}\n')
+
+def write_output(args, tree, folder_name, previous_lines=None):
+    """依 --format 寫出輸出檔；回傳 (是否寫入, 樹狀部分的各行, 全文)，後兩者只有文字輸出才有"""
+    if args.format == 'text':
+        text, lines = build_output(tree, folder_name, args.stats, previous_lines)
+        return write_if_changed(Path(args.output), text.encode('utf-8')), lines, text
+    write_records(tree, folder_name, args.output, args.format, args.top)
+    return True, None, None
+
+def print_top(tree, top):
+    print(f"📦 最大的 {top} 個子目錄：")
+    for item in top_subtrees(tree, top):
+        print(f"   {format_size(item['bytes']):>9}  {item['files']:>7} 個檔案  {item['path']}")
+    print(f"📄 最大的 {top} 個檔案：")
+    for item in top_files(tree, top):
+        print(f"   {format_size(item['bytes']):>9}  {item['path']}")
+
+def watch(args, root_path, folder_name, tree, lines):
+    """定期檢查目錄的 mtime，只重新掃描有變動的目錄；輸出內容改變時才寫檔"""
+    print(f"👀 監看中（每 {args.interval:g} 秒檢查一次，Ctrl+C 結束）")
+    try:
+        while True:
+            time.sleep(args.interval)
+            previous = tree.snapshot()['dirs']
+            tree = TreeScan(root_path, args.depth, args.size, previous, collect_sizes=args.collect_sizes,
+                            use_gitignore=args.gitignore).scan(args.workers)
+            if tree.root_node is None or tree.root_node.clean:
+                continue  # 沒有任何目錄變動：不需重新產生輸出
+            written, lines, text = write_output(args, tree, folder_name, lines)
+            if written:
+                print(f"🔄 {time.strftime('%H:%M:%S')} 已更新 {args.output}"
+                      f"（重新掃描 {tree.rescanned} 個目錄）")
+                if args.cache:
+                    save_snapshot(args.cache, tree, args.output, text, lines)
+    except KeyboardInterrupt:
+        print("\n👋 已停止監看")
 
 def main():
     parser = argparse.ArgumentParser(description='生成目錄樹結構')
-    parser.add_argument('-o', '--output', default='project_structure.txt', help='輸出檔案名稱')
+    parser.add_argument('-o', '--output', help='輸出檔案名稱（預設: project_structure.txt / .ndjson / .json）')
     parser.add_argument('-s', '--size', action='store_true', help='顯示檔案大小')
     parser.add_argument('-d', '--depth', type=int, help='最大深度限制')
     parser.add_argument('-p', '--path', default='.', help='指定掃描路徑')
     parser.add_argument('--stats', action='store_true', help='顯示統計資訊')
+    parser.add_argument('-w', '--workers', type=int, help='平行掃描子目錄的執行緒數（預設: 單執行緒）')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_SNAPSHOT,
+                        help=f'使用快照快取，只重新掃描有變動的目錄（預設路徑: {DEFAULT_SNAPSHOT}）')
+    parser.add_argument('--watch', action='store_true', help='持續監看目錄變動並更新輸出檔')
+    parser.add_argument('--interval', type=float, default=2.0, help='--watch 的檢查間隔秒數（預設: 2）')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help='輸出格式：text（樹狀圖）、ndjson、json（含目錄加總大小）')
+    parser.add_argument('--top', type=int, default=0, help='列出最大的 N 個子目錄與檔案')
+    parser.add_argument('--no-gitignore', dest='gitignore', action='store_false',
+                        help='不依 .gitignore 排除項目（只套用內建的排除清單）')
+    add_arguments(parser)
     
     args = parser.parse_args()
+    args.output = args.output or DEFAULT_OUTPUTS[args.format]
+    args.collect_sizes = args.format != 'text' or args.top > 0
     
     root_path = os.path.abspath(args.path)
     if not os.path.exists(root_path):
@@ -273,29 +754,46 @@ def main():
         folder_name = root_path
     
     try:
-        with open(args.output, "w", encoding="utf-8") as f:
-            # 寫入標題
-            f.write(f"📁 {folder_name}\n")
-            
-            # 生成樹狀結構
-            print_tree(root_path, file=f, show_size=args.size, max_depth=args.depth)
-            
-            # 添加統計資訊
-            if args.stats:
-                dirs, files = count_items(root_path, args.depth)
-                f.write(f"\n📊 統計資訊:\n")
-                f.write(f"📂 目錄數量: {dirs}\n")
-                f.write(f"📄 檔案數量: {files}\n")
-                f.write(f"📋 總計: {dirs + files} 個項目\n")
+        with instrumented(args, 'project_tree_generator') as metrics:
+            # 單次走訪：樹狀結構、檔案大小、目錄加總與統計都來自同一份掃描結果
+            with metrics.stage('scan') as timing:
+                collect_sizes = args.size or args.collect_sizes
+                snapshot = load_snapshot(args.cache, root_path, collect_sizes, args.gitignore) if args.cache else None
+                previous = snapshot['dirs'] if snapshot else None
+                tree = TreeScan(root_path, args.depth, args.size, previous, track=bool(args.cache) or args.watch,
+                                collect_sizes=args.collect_sizes, use_gitignore=args.gitignore)
+                tree.scan(args.workers)
+                dirs, files = tree.dir_count, tree.file_count
+                timing.add_rows(dirs + files)
+
+            with metrics.stage('write_output') as timing:
+                previous_lines = None
+                if args.format == 'text':
+                    previous_lines = previous_tree_lines(snapshot, args.output, args.depth, args.size)
+                written, lines, text = write_output(args, tree, folder_name, previous_lines)
+                if written:
+                    timing.add_file(args.output)
+                if args.cache:
+                    save_snapshot(args.cache, tree, args.output, text, lines)
         
-        print(f"🌳 樹狀圖已輸出到 {args.output}（根目錄為：{folder_name}）")
+        if args.format == 'text':
+            print(f"🌳 樹狀圖已輸出到 {args.output}（根目錄為：{folder_name}）")
+        else:
+            print(f"🌳 {args.format.upper()} 已輸出到 {args.output}（根目錄為：{folder_name}）")
+        if snapshot:
+            print(f"♻️  沿用快照，重新掃描 {tree.rescanned}/{len(tree.nodes)} 個目錄")
         
         if args.stats:
-            dirs, files = count_items(root_path, args.depth)
             print(f"📊 統計：{dirs} 個目錄，{files} 個檔案")
+        if args.top:
+            print_top(tree, args.top)
             
     except Exception as e:
         print(f"錯誤：無法寫入檔案 {args.output}: {str(e)}")
+        return
+
+    if args.watch:
+        watch(args, root_path, folder_name, tree, lines)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+健康指引與最新消息的全文檢索索引（中日韓文字以 bigram 切詞）。
+
+收錄的文件：
+  - condition：各物種 commonConditions 的 label、dietaryNote、tip
+  - stage：各物種 lifeStages 每個階段的名稱、healthTips、commonIssues
+  - news：news.json 的標題、摘要與 posts/*.md 內文
+
+切詞（tokenize）：
+  - 先做 NFKC 正規化並轉小寫（全形英數字會變成半形）
+  - 連續的中日韓文字切成 bigram（「腎病」「病貓」…），另外收錄單字，供單字查詢使用
+  - 英數字以連續的 [a-z0-9] 為一個詞（fiv、fic、7）；其餘符號與 emoji 略過
+  - 查詢時長度 ≥ 2 的中文片段只用 bigram，單一中文字才用單字；英數字詞以字首比對（fi → fiv）
+
+索引依「範圍」（scope）分割：每個物種一份，news 另一份；查詢某物種時只讀該物種與 news。
+每個範圍的 postings 再依詞的第一個字元切成 shard（ord(詞[0]) % shard_count），
+瀏覽器只需下載查詢詞所在的 shard。postings 為 (文件, 加權詞頻) 依文件排序後，
+以「文件差值、詞頻」兩個 varint 交錯編碼，再以 base64 存入 JSON。
+
+輸出（預設 data/search/，檔名含內容雜湊，可永久快取）：
+  - manifest.json：切詞設定與各範圍的文件檔、shard 檔、文件數、平均文件長度
+  - {scope}.docs.{hash}.json：文件清單（id、kind、title、ref）與各文件長度
+  - {scope}.{shard}.{hash}.json：詞 → postings
+
+查詢（BM25）：
+  index = SearchIndex.from_dir('data/search')
+  index.search('腎病', species='cat')          # [Hit(score, doc), ...]
+  index.search('疫苗', kinds=('stage',), limit=5)
+
+用法：
+  python scripts/search_index.py                    # 建置索引
+  python scripts/search_index.py --query 腎病 --species cat
+"""
+from __future__ import annotations
+
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from artifact_writer import (HASH_LENGTH, HASH_PATTERN, ArtifactResult, dumps_json, dumps_json_compact,
+                             remove_unreferenced, update_build_report, write_artifact, write_artifacts)
+from instrumentation import add_arguments, instrumented
+from species_bundles import species_keys
+
+JSON_PATH = 'data/health-guidelines.json'
+NEWS_DIR = 'news'
+OUT_DIR = 'data/search'
+MANIFEST_NAME = 'manifest.json'
+REPORT_PATH = '.build/build-report.json'
+NEWS_SCOPE = 'news'
+# 調整切詞或編碼方式時遞增，前端可據此判斷索引格式
+INDEX_VERSION = 1
+# 每個 shard 的目標大小（postings base64 字元數）；範圍越大切越多 shard（2 的次方）
+SHARD_TARGET_CHARS = 16 * 1024
+MAX_SHARDS = 64
+# 欄位權重：標題類欄位的詞頻加倍計算
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+# BM25 參數
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_CJK = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+_TOKEN_PATTERN = re.compile(f'([{_CJK}]+)|([a-z0-9]+)')
+_MD_LINK_TARGET = re.compile(r'\]\([^)]*\)')
+_ASCII_TERM = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def _terms(text: str, unigrams: str) -> Iterator[str]:
+    """unigrams：'all' 收錄每個中文字；'single' 只在片段只有一個字時收錄。"""
+    for m in _TOKEN_PATTERN.finditer(normalize(text)):
+        run = m.group(1)
+        if run is None:
+            yield m.group(2)
+            continue
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+        if unigrams == 'all' or len(run) == 1:
+            yield from run
+
+
+def index_terms(text: str) -> List[str]:
+    """建索引用的詞（含重複）：bigram + 每個中文字 + 英數字詞。"""
+    return list(_terms(text, 'all'))
+
+
+def query_terms(text: str) -> List[str]:
+    """查詢用的詞（去重、保留順序）：中文片段用 bigram，單一中文字才用單字。"""
+    return list(dict.fromkeys(_terms(text, 'single')))
+
+
+def shard_of(term: str, shard_count: int) -> int:
+    """詞所在的 shard；前端以 term.codePointAt(0) % shardCount 計算，結果相同。"""
+    return ord(term[0]) % shard_count
+
+
+def encode_postings(postings: Sequence[Tuple[int, int]]) -> str:
+    """[(文件編號遞增, 詞頻), ...] → 交錯的 varint（文件差值、詞頻）→ base64。"""
+    out = bytearray()
+    previous = 0
+    for doc, tf in postings:
+        for value in (doc - previous, tf):
+            while value >= 0x80:
+                out.append(value & 0x7F | 0x80)
+                value >>= 7
+            out.append(value)
+        previous = doc
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+def decode_postings(encoded: str) -> List[Tuple[int, int]]:
+    data = base64.b64decode(encoded)
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    postings = []
+    doc = 0
+    for i in range(0, len(values), 2):
+        doc += values[i]
+        postings.append((doc, values[i + 1]))
+    return postings
+
+
+class Document(NamedTuple):
+    id: str
+    kind: str
+    title: str
+    ref: str
+    # (權重, 文字)：權重為該欄位每個詞計入的詞頻
+    fields: Tuple[Tuple[int, str], ...]
+
+
+def health_documents(data: Dict[str, Any]) -> Dict[str, List[Document]]:
+    """health-guidelines.json 中各物種的 condition 與 stage 文件，依物種 key 分組。"""
+    scopes: Dict[str, List[Document]] = {}
+    for key in species_keys(data):
+        info = data[key]
+        docs = scopes.setdefault(key, [])
+        for i, cond in enumerate(info.get('commonConditions') or []):
+            ref = cond.get('id') or str(i)
+            docs.append(Document(f'condition:{key}:{ref}', 'condition', cond.get('label', ''), ref, (
+                (TITLE_WEIGHT, cond.get('label', '')),
+                (BODY_WEIGHT, cond.get('dietaryNote', '')),
+                (BODY_WEIGHT, cond.get('tip', '')),
+            )))
+        for stage, detail in (info.get('lifeStages') or {}).items():
+            docs.append(Document(f'stage:{key}:{stage}', 'stage', f"{info.get('name', key)} {stage}", stage, (
+                (TITLE_WEIGHT, stage),
+                (BODY_WEIGHT, '\n'.join(detail.get('healthTips') or [])),
+                (BODY_WEIGHT, '\n'.join(detail.get('commonIssues') or [])),
+            )))
+    return scopes
+
+
+def news_documents(news_dir: Path) -> List[Document]:
+    """最新消息的文件；Markdown 只去掉連結網址，其餘符號在切詞時略過。"""
+    from build_news import load_news, sort_news
+
+    docs = []
+    for item in sort_news(load_news(news_dir)):
+        body = (news_dir / item['content']).read_text(encoding='utf-8')
+        docs.append(Document(f"news:{item['id']}", 'news', item['title'], item['id'], (
+            (TITLE_WEIGHT, item['title']),
+            (BODY_WEIGHT, item.get('excerpt', '')),
+            (BODY_WEIGHT, _MD_LINK_TARGET.sub(']', body)),
+        )))
+    return docs
+
+
+class Hit(NamedTuple):
+    score: float
+    doc: Dict[str, Any]
+
+
+class Partition:
+    """單一範圍的索引：文件清單、文件長度與依 shard 分割的 postings。
+
+    shards 中為 None 的 shard 在第一次用到時才由 loader(shard 編號) 載入。
+    """
+
+    def __init__(self, scope: str, docs: List[Dict[str, Any]], lengths: List[int], shard_count: int,
+                 shards: Optional[List[Optional[Dict[str, str]]]] = None,
+                 loader: Optional[Callable[[int], Dict[str, str]]] = None):
+        self.scope = scope
+        self.docs = docs
+        self.lengths = lengths
+        self.shard_count = shard_count
+        self.shards = shards if shards is not None else [None] * shard_count
+        self.loader = loader
+        self.avgdl = sum(lengths) / len(lengths) if lengths else 0.0
+        # BM25 分母中與詞無關的部分：k1 * (1 - b + b * 文件長度 / 平均長度)
+        # 所有文件都沒有可索引的詞時 avgdl 為 0，長度比視為 0
+        self.norms = [BM25_K1 * (1 - BM25_B + BM25_B * (length / self.avgdl if self.avgdl else 0.0))
+                      for length in lengths]
+        self._decoded: Dict[str, List[Tuple[int, int]]] = {}
+        self._sorted_terms: Dict[int, List[str]] = {}
+
+    @classmethod
+    def build(cls, scope: str, documents: Iterable[Document]) -> 'Partition':
+        docs: List[Dict[str, Any]] = []
+        lengths: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for number, document in enumerate(documents):
+            docs.append({'id': document.id, 'kind': document.kind, 'title': document.title, 'ref': document.ref})
+            counts: Dict[str, int] = {}
+            length = 0
+            for weight, text in document.fields:
+                for term in index_terms(text):
+                    counts[term] = counts.get(term, 0) + weight
+                    length += weight
+            lengths.append(length)
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((number, tf))
+        encoded = {term: encode_postings(p) for term, p in sorted(postings.items())}
+        total = sum(len(term) + len(p) for term, p in encoded.items())
+        shard_count = 1
+        while shard_count < MAX_SHARDS and total / shard_count > SHARD_TARGET_CHARS:
+            shard_count *= 2
+        shards: List[Optional[Dict[str, str]]] = [{} for _ in range(shard_count)]
+        for term, p in encoded.items():
+            shards[shard_of(term, shard_count)][term] = p
+        return cls(scope, docs, lengths, shard_count, shards)
+
+    def shard(self, number: int) -> Dict[str, str]:
+        shard = self.shards[number]
+        if shard is None:
+            shard = self.loader(number) if self.loader else {}
+            self.shards[number] = shard
+        return shard
+
+    def postings(self, term: str) -> List[Tuple[int, int]]:
+        postings = self._decoded.get(term)
+        if postings is None:
+            encoded = self.shard(shard_of(term, self.shard_count)).get(term)
+            postings = decode_postings(encoded) if encoded else []
+            self._decoded[term] = postings
+        return postings
+
+    def expand(self, term: str) -> List[str]:
+        """英數字詞展開為索引中以它為字首的所有詞（同字首的詞在同一個 shard）；中文詞原樣回傳。"""
+        if not _ASCII_TERM.fullmatch(term):
+            return [term]
+        number = shard_of(term, self.shard_count)
+        terms = self._sorted_terms.get(number)
+        if terms is None:
+            terms = self._sorted_terms[number] = sorted(self.shard(number))
+        start = bisect.bisect_left(terms, term)
+        end = bisect.bisect_left(terms, term + '\x7f', start)
+        return terms[start:end]
+
+    def score(self, terms: Sequence[str]) -> Dict[int, float]:
+        """BM25：各文件（編號）的分數；沒有命中任何詞的文件不列出。"""
+        n = len(self.docs)
+        norms = self.norms
+        scores: Dict[int, float] = {}
+        get = scores.get
+        expanded = dict.fromkeys(t for term in terms for t in self.expand(term))
+        for term in expanded:
+            postings = self.postings(term)
+            if not postings:
+                continue
+            weight = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) * (BM25_K1 + 1)
+            for doc, tf in postings:
+                scores[doc] = get(doc, 0.0) + weight * tf / (tf + norms[doc])
+        return scores
+
+
+def _rank(candidate: Tuple[float, str, str, int]) -> Tuple[float, str]:
+    """分數高者在前，同分依文件 id 排序（結果穩定）。"""
+    return -candidate[0], candidate[1]
+
+
+class SearchIndex:
+    """所有範圍的索引與查詢 API。"""
+
+    def __init__(self, partitions: Dict[str, Partition]):
+        self.partitions = partitions
+
+    @classmethod
+    def build(cls, data: Dict[str, Any], news_dir: Optional[Path] = None) -> 'SearchIndex':
+        scopes: Dict[str, List[Document]] = health_documents(data)
+        if news_dir is not None and (Path(news_dir) / 'news.json').exists():
+            scopes[NEWS_SCOPE] = news_documents(Path(news_dir))
+        return cls({scope: Partition.build(scope, docs) for scope, docs in scopes.items()})
+
+    @classmethod
+    def from_dir(cls, out_dir: Path) -> 'SearchIndex':
+        """讀取 manifest 與各範圍的文件檔；shard 在查詢用到時才載入。"""
+        out_dir = Path(out_dir)
+        with (out_dir / MANIFEST_NAME).open('r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支援的索引版本：{manifest.get('version')}")
+
+        def loader(files: List[str]) -> Callable[[int], Dict[str, str]]:
+            def load(number: int) -> Dict[str, str]:
+                with (out_dir / files[number]).open('r', encoding='utf-8') as f:
+                    return json.load(f)
+            return load
+
+        partitions = {}
+        for scope, entry in manifest['scopes'].items():
+            with (out_dir / entry['docs']).open('r', encoding='utf-8') as f:
+                docs = json.load(f)
+            partitions[scope] = Partition(scope, docs['docs'], docs['lengths'], len(entry['shards']),
+                                          loader=loader(entry['shards']))
+        return cls(partitions)
+
+    def search(self, query: str, species: Optional[str] = None, kinds: Optional[Sequence[str]] = None,
+               limit: Optional[int] = 10) -> List[Hit]:
+        """依 BM25 分數排序的結果；species 指定時只查該物種與 news，kinds 可限定文件類型。"""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        if species is None:
+            scopes = list(self.partitions)
+        else:
+            scopes = [s for s in (species, NEWS_SCOPE) if s in self.partitions]
+        candidates = []
+        for scope in scopes:
+            partition = self.partitions[scope]
+            docs = partition.docs
+            for doc, score in partition.score(terms).items():
+                if kinds and docs[doc]['kind'] not in kinds:
+                    continue
+                candidates.append((score, docs[doc]['id'], scope, doc))
+        if limit is None:
+            top = sorted(candidates, key=_rank)
+        else:
+            top = heapq.nsmallest(limit, candidates, key=_rank)
+        return [Hit(score, {**self.partitions[scope].docs[doc], 'scope': scope}) for score, _, scope, doc in top]
+
+
+def _hashed_name(stem: str, payload: bytes) -> str:
+    return f'{stem}.{hashlib.sha256(payload).hexdigest()[:HASH_LENGTH]}.json'
+
+
+def write_search_index(index: SearchIndex, out_dir: Path,
+                       serializer: Callable[[Any], bytes] = dumps_json_compact,
+                       precompress: bool = False,
+                       workers: Optional[int] = None) -> List[ArtifactResult]:
+    """寫出文件檔、shard 與 manifest（manifest 最後寫），並刪除不再參照的舊檔。"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    artifacts = []
+    scopes = {}
+    for scope, partition in index.partitions.items():
+        payload = serializer({'docs': partition.docs, 'lengths': partition.lengths})
+        docs_name = _hashed_name(f'{scope}.docs', payload)
+        artifacts.append((out_dir / docs_name, payload))
+        shard_names = []
+        for number in range(partition.shard_count):
+            payload = serializer(partition.shard(number))
+            shard_names.append(_hashed_name(f'{scope}.{number}', payload))
+            artifacts.append((out_dir / shard_names[-1], payload))
+        scopes[scope] = {
+            'docs': docs_name,
+            'shards': shard_names,
+            'doc_count': len(partition.docs),
+            'avgdl': round(partition.avgdl, 4),
+        }
+    results = write_artifacts(artifacts, workers=workers, serializer=serializer, precompress=precompress)
+
+    manifest = {
+        'version': INDEX_VERSION,
+        'tokenizer': {'normalize': 'NFKC+lower', 'cjk': 'bigram+unigram', 'ascii': '[a-z0-9]+'},
+        'shard_key': 'codepoint(term[0]) % shard_count',
+        'bm25': {'k1': BM25_K1, 'b': BM25_B},
+        'scopes': scopes,
+    }
+    results.append(write_artifact(out_dir / MANIFEST_NAME, manifest, dumps_json, precompress))
+    # 只刪除 {scope}.{docs 或 shard 編號}.{雜湊}.json，--out 指到其他目錄時不會誤刪別的 JSON
+    remove_unreferenced(out_dir, [Path(path).name for path, _ in artifacts], rf'[^.]+\.(?:docs|\d+)\.{HASH_PATTERN}\.json')
+    return results
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description='建置或查詢健康指引與最新消息的全文檢索索引')
+    parser.add_argument('--json', default=JSON_PATH, help=f'健康指引 JSON 路徑（預設: {JSON_PATH}）')
+    parser.add_argument('--news-dir', default=NEWS_DIR, help=f'news.json 所在目錄（預設: {NEWS_DIR}）')
+    parser.add_argument('--out-dir', default=OUT_DIR, help=f'索引輸出目錄（預設: {OUT_DIR}）')
+    parser.add_argument('--compact', action='store_true', help='另外產生 .gz / .br 預壓縮檔')
+    parser.add_argument('--report', default=REPORT_PATH, help=f'建置報告路徑（預設: {REPORT_PATH}）')
+    parser.add_argument('--query', help='查詢已建置的索引（不重新建置）')
+    parser.add_argument('--species', help='查詢時限定物種（另含 news）')
+    parser.add_argument('--limit', type=int, default=10)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with instrumented(args, 'search_index') as metrics:
+        if args.query is not None:
+            with metrics.stage('query') as timing:
+                index = SearchIndex.from_dir(Path(args.out_dir))
+                hits = index.search(args.query, species=args.species, limit=args.limit)
+                timing.add_rows(len(hits))
+            for hit in hits:
+                print(f"{hit.score:7.3f}  [{hit.doc['kind']}] {hit.doc['scope']}  {hit.doc['title']}")
+            return 0
+
+        with metrics.stage('load_json') as timing:
+            with open(args.json, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            timing.add_rows(1)
+        with metrics.stage('build_index') as timing:
+            index = SearchIndex.build(data, Path(args.news_dir))
+            timing.add_rows(sum(len(p.docs) for p in index.partitions.values()))
+        with metrics.stage('write_json') as timing:
+            results = write_search_index(index, Path(args.out_dir), precompress=args.compact)
+            update_build_report(Path(args.report), results)
+            timing.add_rows(len(results))
+            timing.add_results(results)
+    written = sum(1 for r in results if r.written)
+    docs = sum(len(p.docs) for p in index.partitions.values())
+    print(f'✅ 已輸出 {args.out_dir}：{len(index.partitions)} 個範圍、{docs} 份文件，'
+          f'更新 {written}/{len(results)} 個檔案')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+健康小工具的「依物種延遲載入」資料包：一個很小的 manifest + 每個物種一個以內容雜湊命名的 bundle。
+
+輸出（預設 data/health/）：
+  - manifest.json：物種清單（key、名稱、emoji、bundle 檔名、sha256、位元組數）、
+    common 選項（活動量 / 體型 / 性別等）與 metadata；內容不含時間戳，資料沒變時位元組也不變
+  - {key}.{hash}.json：單一物種報告所需的全部資料——該物種的 guidelines，
+    以及 sexHealthFocus[key]、neuteredFocus[key]
+  - deltas/{key}.{from}.{to}.json：物種 bundle 從上一版到新版的 JSON Patch（見 guidelines_delta.py）；
+    manifest 的各物種項目記錄內容版本（version）與最近的 delta 串接（deltas），
+    前端已快取舊版 bundle 時只下載 delta
+
+前端只需下載 manifest 與所選物種的 bundle；bundle 檔名含內容雜湊，可永久快取。
+不再被 manifest 參照的舊 bundle（含 .gz / .br）會在寫出新 manifest 後刪除。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from artifact_writer import (HASH_LENGTH, HASH_PATTERN, ArtifactResult, dumps_json, remove_unreferenced,
+                             write_artifact, write_artifacts)
+from guidelines_delta import DELTA_PATTERN, content_version, extend_chain, load_pointer, valid_chain
+
+BUNDLE_DIR_NAME = 'health'
+MANIFEST_NAME = 'manifest.json'
+DELTA_DIR_NAME = 'deltas'
+# 各物種共用、由 manifest 直接提供的區塊
+SHARED_SECTIONS = ('common', 'metadata')
+# 以物種 key 分段、需切進各 bundle 的區塊
+PER_SPECIES_SECTIONS = ('sexHealthFocus', 'neuteredFocus')
+
+
+def species_keys(data: Dict[str, Any]) -> List[str]:
+    """health-guidelines.json 中的物種 key（具 name 欄位的頂層物件），依檔案順序。"""
+    return [k for k, v in data.items()
+            if k not in SHARED_SECTIONS and k not in PER_SPECIES_SECTIONS
+            and isinstance(v, dict) and 'name' in v]
+
+
+def build_species_bundle(data: Dict[str, Any], key: str) -> Dict[str, Any]:
+    bundle: Dict[str, Any] = {'key': key, 'guidelines': data[key]}
+    for section in PER_SPECIES_SECTIONS:
+        part = data.get(section)
+        if isinstance(part, dict) and key in part:
+            bundle[section] = part[key]
+    return bundle
+
+
+def bundle_filename(key: str, payload: bytes) -> str:
+    return f'{key}.{hashlib.sha256(payload).hexdigest()[:HASH_LENGTH]}.json'
+
+
+def bundle_chain(key: str, old_entry: Optional[Dict[str, Any]], bundle: Dict[str, Any], version: str,
+                 size: int, data_dir: Path, serializer: Callable[[Any], bytes]) -> Tuple[List[Dict[str, Any]], list]:
+    """由上一版 manifest 的物種項目延續 delta 串接，回傳 (串接, 要寫出的 delta)。"""
+    if not old_entry:
+        return [], []
+    old_version = old_entry.get('version')
+    if old_version == version:
+        return valid_chain(old_entry.get('deltas')), []
+    try:
+        with (Path(data_dir) / old_entry['file']).open('r', encoding='utf-8') as f:
+            old = json.load(f)
+    except (KeyError, TypeError, OSError, ValueError):
+        return [], []
+    # 沒有 version 的舊 manifest：由舊 bundle 的內容推算，串接從這一版開始
+    chain = valid_chain(old_entry.get('deltas')) if old_version else []
+    old_version = old_version or content_version(old)
+    bundle_dir = Path(data_dir) / BUNDLE_DIR_NAME
+    return extend_chain(chain, old, bundle, old_version, version, size, bundle_dir / DELTA_DIR_NAME,
+                        f'{BUNDLE_DIR_NAME}/{DELTA_DIR_NAME}', prefix=f'{key}.', serializer=serializer)
+
+
+def write_species_bundles(data: Dict[str, Any], data_dir: Path,
+                          serializer: Callable[[Any], bytes] = dumps_json,
+                          precompress: bool = False,
+                          workers: Optional[int] = None) -> List[ArtifactResult]:
+    """寫出各物種 bundle 與 manifest（manifest 最後寫，確保它參照的檔案都已存在）。
+
+    回傳所有寫出檔案的結果（bundle 在前、manifest 在最後）。
+    """
+    bundle_dir = Path(data_dir) / BUNDLE_DIR_NAME
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    old_entries = {e.get('key'): e for e in load_pointer(bundle_dir / MANIFEST_NAME).get('species') or []
+                   if isinstance(e, dict)}
+    artifacts = []
+    delta_artifacts = []
+    entries = []
+    for key in species_keys(data):
+        bundle = build_species_bundle(data, key)
+        payload = serializer(bundle)
+        fname = bundle_filename(key, payload)
+        artifacts.append((bundle_dir / fname, payload))
+        version = content_version(bundle)
+        chain, deltas = bundle_chain(key, old_entries.get(key), bundle, version, len(payload), data_dir, serializer)
+        delta_artifacts.extend(deltas)
+        info = data[key]
+        entries.append({
+            'key': key,
+            'name': info.get('name', key),
+            'emoji': info.get('emoji', ''),
+            'file': f'{BUNDLE_DIR_NAME}/{fname}',
+            'sha256': hashlib.sha256(payload).hexdigest(),
+            'bytes': len(payload),
+            'version': version,
+            'deltas': chain,
+        })
+    results = write_artifacts(artifacts + delta_artifacts, workers=workers, serializer=serializer,
+                              precompress=precompress)
+
+    manifest = {section: data[section] for section in SHARED_SECTIONS if section in data}
+    manifest['species'] = entries
+    results.append(write_artifact(bundle_dir / MANIFEST_NAME, manifest, serializer, precompress))
+
+    remove_unreferenced(bundle_dir, [Path(e['file']).name for e in entries], rf'[^.]+\.{HASH_PATTERN}\.json')
+    remove_unreferenced(bundle_dir / DELTA_DIR_NAME, [Path(link['file']).name for e in entries for link in e['deltas']],
+                        DELTA_PATTERN)
+    return results
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+健康資料管線共用的串流 CSV 讀取與 JSON 陣列寫出工具。
+
+  - iter_csv / CsvStream：逐列產生 CsvRow，標頭只 strip 一次、每列值在同一趟 strip，
+    不先建立整份 list；CsvRow 使用 __slots__，並共用同一份欄位索引
+  - JsonArrayWriter：逐筆寫出 JSON 陣列，輸出位元組與 json.dump(list, indent=2) 相同，
+    只有在寫入第一筆時才建立檔案（與「有資料才輸出」的既有行為一致）；
+    內容先寫入同目錄暫存檔，close() 時才以 os.replace 取代目標檔
+
+POS 匯出的 CSV 可達數百 MB，上述工具讓峰值記憶體與檔案大小無關。
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from artifact_writer import file_mode
+
+
+class CsvRow:
+    """一列 CSV 資料；以 get() 讀取，介面與 csv.DictReader 的 dict 相容。"""
+
+    __slots__ = ('_index', '_fields', '_values', 'line')
+
+    def __init__(self, index: Dict[str, int], fields: List[str], values: List[str], line: int = 0):
+        self._index = index
+        self._fields = fields
+        self._values = values
+        # 該列在檔案中的行號（標頭為第 1 行；含換行的欄位以結尾行計）
+        self.line = line
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._index.get(key)
+        if i is None or i >= len(self._values):
+            return default
+        return self._values[i]
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._index[key]
+        return self._values[i] if i < len(self._values) else None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def values(self) -> List[Optional[str]]:
+        return [self.get(k) for k in self._index]
+
+    def cells(self) -> List[str]:
+        """依欄位位置排列的原始值（已 strip；可能比標頭短或長）。"""
+        return self._values
+
+    def is_blank(self) -> bool:
+        return all(not v for v in self._values)
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """轉為 dict（欄位順序與缺值處理同 csv.DictReader，多出的欄位忽略）。"""
+        out: Dict[str, Optional[str]] = {}
+        for i, name in enumerate(self._fields):
+            out[name] = self._values[i] if i < len(self._values) else None
+        return out
+
+    def __repr__(self) -> str:
+        return f"CsvRow({self.to_dict()!r})"
+
+
+class CsvStream:
+    """以 with 開啟 CSV，讀取標頭後逐列迭代 CsvRow。"""
+
+    def __init__(self, path: Path, encoding: str = 'utf-8-sig'):
+        self.path = Path(path)
+        self.encoding = encoding
+        self.fieldnames: Optional[List[str]] = None
+        self._file = None
+        self._reader = None
+        self._index: Dict[str, int] = {}
+
+    def __enter__(self) -> 'CsvStream':
+        self._file = self.path.open('r', encoding=self.encoding, newline='')
+        self._reader = csv.reader(self._file)
+        for header in self._reader:
+            if header:
+                self.fieldnames = [h.strip() for h in header]
+                break
+        if self.fieldnames is not None:
+            # 重複欄名時以最後一欄為準（同 DictReader）
+            self._index = {name: i for i, name in enumerate(self.fieldnames)}
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self) -> Iterator[CsvRow]:
+        if self.fieldnames is None or self._reader is None:
+            return
+        index, fields, reader = self._index, self.fieldnames, self._reader
+        for raw in reader:
+            if not raw:
+                continue
+            yield CsvRow(index, fields, [v.strip() for v in raw], reader.line_num)
+
+
+def iter_csv(path: Path) -> Iterator[CsvRow]:
+    """逐列讀取 CSV；檔案不存在時不產生任何列。"""
+    path = Path(path)
+    if not path.exists():
+        return
+    with CsvStream(path) as stream:
+        yield from stream
+
+
+class JsonArrayWriter:
+    """逐筆寫出 JSON 陣列（indent=2），輸出與 json.dump(list) 一致。"""
+
+    def __init__(self, path: Path, indent: int = 2):
+        self.path = Path(path)
+        self.indent = indent
+        self.count = 0
+        self._file = None
+        self._tmp: Optional[str] = None
+
+    def append(self, item: Any) -> None:
+        text = json.dumps(item, ensure_ascii=False, indent=self.indent)
+        pad = ' ' * self.indent
+        text = pad + text.replace('\n', '\n' + pad)
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+            self._file = os.fdopen(fd, 'w', encoding='utf-8')
+            self._file.write('[\n' + text)
+        else:
+            self._file.write(',\n' + text)
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.write('\n]')
+            self._file.close()
+            self._file = None
+            os.chmod(self._tmp, file_mode(self.path))
+            os.replace(self._tmp, self.path)
+            self._tmp = None
+
+    def abort(self) -> None:
+        """放棄已寫入的內容，保留原本的目標檔。"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.unlink(self._tmp)
+            self._tmp = None
+
+    def __enter__(self) -> 'JsonArrayWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -9,15 +9,32 @@
   - 讀取 docs/health_conditions.csv、docs/health_life_stages.csv、docs/hamster_breeds.csv（若存在）
   - 以 CSV 內容更新 JSON 中對應資料（生命階段、常見疾病、倉鼠品種）
   - 具有去重與合併邏輯（以疾病名稱/品種 key 為主鍵）
+  - --tables PATH：另外產生人類年齡與熱量的預先計算查表（見 health_tables.py）；CSV 沒變時也會產生，
+    內容沒變時不重寫。前端目前不讀取，預設不產生
+  - 增量建置：以 manifest 記錄各 CSV 與輸出檔的 sha256，只重跑輸入有變的 update 階段，
+    且只重寫內容實際改變的輸出檔（--force 可強制全部重建）
+  - 輸出檔以 thread pool 平行序列化，並以暫存檔 + rename 原子寫入
+  - --compact：輸出不含縮排的 JSON，並產生 .gz / .br 預壓縮檔；各檔原始與壓縮後大小
+    記錄於建置報告（--report）
+  - JSON 內容改變時，對上一版產生 JSON Patch（data/health-deltas/）並更新版本指標
+    data/health-guidelines.version.json，讓已快取上一版的前端只下載差異（見 guidelines_delta.py；
+    --no-deltas 可停用）
 """
 from __future__ import annotations
 
 import argparse
-import csv
+import bisect
 import json
 import re
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from artifact_writer import ArtifactResult, brotli, dumps_json, dumps_json_compact, update_build_report, write_artifact
+from build_manifest import BuildManifest, sha256_file
+from guidelines_delta import write_delta
+from health_tables import build_lookup_tables, dumps_tables
+from instrumentation import NULL_METRICS, Metrics, add_arguments, instrumented
+from stream_io import CsvRow, iter_csv
 
 
 def slugify(s: str) -> str:
@@ -34,17 +51,9 @@ def load_json(path: Path) -> Dict[str, Any]:
         return json.load(f)
 
 
-def write_json(path: Path, data: Dict[str, Any]) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-def read_csv(path: Path) -> List[Dict[str, str]]:
-    if not path.exists():
-        return []
-    with path.open("r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        return [ {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()} for row in reader ]
+def read_csv(path: Path) -> Iterator[CsvRow]:
+    """逐列串流讀取 CSV（鍵與值已 strip）；檔案不存在時不產生任何列。"""
+    return iter_csv(path)
 
 
 def map_name_to_key(data: Dict[str, Any]) -> Dict[str, str]:
@@ -55,7 +64,7 @@ def map_name_to_key(data: Dict[str, Any]) -> Dict[str, str]:
     return mapping
 
 
-def update_life_stages(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
+def update_life_stages(data: Dict[str, Any], rows: Iterable[CsvRow]) -> int:
     """Update lifeStages in-place. Returns number of updates."""
     name2key = map_name_to_key(data)
     updated = 0
@@ -97,9 +106,79 @@ def update_life_stages(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
     return updated
 
 
-def update_conditions(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
+class ConditionIndex:
+    """單一物種 commonConditions 的 id / label 索引，整批 upsert 期間持續維護。
+
+    每個 id（或 label）對應目前持有該值之項目的位置（遞增排序）；查詢取最後一個位置，
+    與「每列重建 dict、後者覆蓋前者」的結果相同，但每列只需 O(1) 攤銷成本。
+    """
+
+    def __init__(self, conds: List[Dict[str, Any]]):
+        self.conds = conds
+        self.by_id: Dict[Any, List[int]] = {}
+        self.by_label: Dict[Any, List[int]] = {}
+        for pos, c in enumerate(conds):
+            if c.get('id'):
+                self.by_id.setdefault(c.get('id'), []).append(pos)
+            if c.get('label'):
+                self.by_label.setdefault(c.get('label'), []).append(pos)
+
+    @staticmethod
+    def _move(index: Dict[Any, List[int]], pos: int, old: Any, new: Any) -> None:
+        if old == new:
+            return
+        if old:
+            positions = index[old]
+            positions.remove(pos)
+            if not positions:
+                del index[old]
+        if new:
+            bisect.insort(index.setdefault(new, []), pos)
+
+    def find_position(self, cid: str, label: str) -> Optional[int]:
+        positions = self.by_id.get(cid) or self.by_label.get(label)
+        return positions[-1] if positions else None
+
+    def update(self, pos: int, cid: str, label: str, dietary: str, tip: str) -> None:
+        obj = self.conds[pos]
+        old_id, old_label = obj.get('id'), obj.get('label')
+        obj['label'] = label or obj.get('label', '')
+        obj['dietaryNote'] = dietary or obj.get('dietaryNote', '')
+        obj['tip'] = tip or obj.get('tip', '')
+        obj['id'] = cid
+        self._move(self.by_id, pos, old_id if old_id else None, obj.get('id') or None)
+        self._move(self.by_label, pos, old_label if old_label else None, obj.get('label') or None)
+
+    def append(self, obj: Dict[str, Any]) -> None:
+        pos = len(self.conds)
+        self.conds.append(obj)
+        if obj.get('id'):
+            self.by_id.setdefault(obj['id'], []).append(pos)
+        if obj.get('label'):
+            self.by_label.setdefault(obj['label'], []).append(pos)
+
+
+def finalize_conditions(conds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """單次反向走訪：補齊缺少的 id，同一 id 只保留最後一筆（避免重複與舊值殘留）。"""
+    seen = set()
+    dedup_rev = []
+    for cond in reversed(conds):
+        if 'id' not in cond or not cond['id']:
+            cond['id'] = slugify(cond.get('label', ''))
+        cid = cond.get('id')
+        if cid and cid in seen:
+            continue
+        if cid:
+            seen.add(cid)
+        dedup_rev.append(cond)
+    dedup_rev.reverse()
+    return dedup_rev
+
+
+def update_conditions(data: Dict[str, Any], rows: Iterable[CsvRow]) -> int:
     """Update commonConditions for each species. Dedupe by label. Returns number of upserts."""
     name2key = map_name_to_key(data)
+    indexes: Dict[str, ConditionIndex] = {}
     changes = 0
     for r in rows:
         # 支援兩種來源欄位
@@ -116,56 +195,31 @@ def update_conditions(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
 
         if 'commonConditions' not in data[key]:
             data[key]['commonConditions'] = []
-        # build index by id + label
-        idx_by_id = {c.get('id'): c for c in data[key]['commonConditions'] if c.get('id')}
-        idx_by_label = {c.get('label'): c for c in data[key]['commonConditions'] if c.get('label')}
+        index = indexes.get(key)
+        if index is None or index.conds is not data[key]['commonConditions']:
+            index = indexes[key] = ConditionIndex(data[key]['commonConditions'])
         if not cid:
             cid = slugify(label)
 
-        if cid in idx_by_id:
-            obj = idx_by_id[cid]
-        elif label in idx_by_label:
-            obj = idx_by_label[label]
+        pos = index.find_position(cid, label)
+        if pos is not None:
+            index.update(pos, cid, label, dietary, tip)
         else:
-            obj = None
-
-        if obj:
-            obj['label'] = label or obj.get('label', '')
-            obj['dietaryNote'] = dietary or obj.get('dietaryNote', '')
-            obj['tip'] = tip or obj.get('tip', '')
-            obj['id'] = cid
-        else:
-            data[key]['commonConditions'].append({
+            index.append({
                 'id': cid,
                 'label': label,
                 'dietaryNote': dietary,
                 'tip': tip,
             })
         changes += 1
-    # 確保所有 commonConditions 都有 id
-    for key in data:
-        if isinstance(data[key], dict) and 'commonConditions' in data[key]:
-            for cond in data[key]['commonConditions']:
-                if 'id' not in cond or not cond['id']:
-                    cond['id'] = slugify(cond.get('label', ''))
-    # 去重：同一 id 只保留最後一筆（避免重複與舊值殘留）
+    # 確保所有 commonConditions 都有 id，並以 id 去重
     for key in data:
         if isinstance(data[key], dict) and 'commonConditions' in data[key]:
-            conds = data[key]['commonConditions']
-            seen = set()
-            dedup_rev = []
-            for cond in reversed(conds):
-                cid = cond.get('id')
-                if cid and cid in seen:
-                    continue
-                if cid:
-                    seen.add(cid)
-                dedup_rev.append(cond)
-            data[key]['commonConditions'] = list(reversed(dedup_rev))
+            data[key]['commonConditions'] = finalize_conditions(data[key]['commonConditions'])
     return changes
 
 
-def update_hamster_breeds(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
+def update_hamster_breeds(data: Dict[str, Any], rows: Iterable[CsvRow]) -> int:
     """Update hamster.breeds keyed by '品種key' when possible. Returns number of upserts."""
     if 'hamster' not in data:
         return 0
@@ -220,10 +274,8 @@ def update_hamster_breeds(data: Dict[str, Any], rows: List[Dict[str, str]]) -> i
     return changes
 
 
-def update_activity_body_options(data: Dict[str, Any], rows: List[Dict[str, str]]) -> int:
+def update_activity_body_options(data: Dict[str, Any], rows: Iterable[CsvRow]) -> int:
     """Update per-species activity/body shape options from CSV. Returns number of upserts."""
-    if not rows:
-        return 0
     name2key = map_name_to_key(data)
     changes = 0
     for r in rows:
@@ -251,31 +303,20 @@ def update_activity_body_options(data: Dict[str, Any], rows: List[Dict[str, str]
     return changes
 
 
-def main(argv=None):
-    parser = argparse.ArgumentParser(description='Update health-guidelines.json from CSVs')
-    parser.add_argument('--docs-dir', default='docs', help='CSV source directory (default: docs)')
-    parser.add_argument('--json', default='data/health-guidelines.json', help='Target JSON file')
-    args = parser.parse_args(argv)
+# manifest 中記錄輸出格式（pretty / compact）的虛擬輸入名稱；格式改變時全部重建
+OUTPUT_FORMAT_KEY = '(output-format)'
 
-    docs = Path(args.docs_dir)
-    js = Path(args.json)
-    if not js.exists():
-        print(f"[ERROR] JSON not found: {js}")
-        return 2
-
-    data = load_json(js)
+# 每個 update 階段對應的 CSV（位於 --docs-dir）
+STAGE_INPUTS = {
+    'life_stages': 'health_life_stages.csv',
+    'conditions': 'health_conditions.csv',
+    'hamster_breeds': 'pet_breeds.csv',
+    'options': 'activity_body_options.csv',
+}
 
-    cond_rows = read_csv(docs / 'health_conditions.csv')
-    stage_rows = read_csv(docs / 'health_life_stages.csv')
-    pet_breeds_rows = read_csv(docs / 'pet_breeds.csv')
-    options_rows = read_csv(docs / 'activity_body_options.csv')
 
-    c1 = update_life_stages(data, stage_rows)
-    c2 = update_conditions(data, cond_rows)
-    c3 = update_hamster_breeds(data, pet_breeds_rows)
-    c4 = update_activity_body_options(data, options_rows)
-
-    # 補齊各物種 lifeStages 的 ageRange（從 ageConversion.range 推導）
+def backfill_age_ranges(data: Dict[str, Any]) -> None:
+    """補齊各物種 lifeStages 的 ageRange（從 ageConversion.range 推導）。"""
     for skey, sinfo in data.items():
         if not isinstance(sinfo, dict):
             continue
@@ -292,35 +333,169 @@ def main(argv=None):
             if isinstance(conv, dict) and isinstance(conv.get('range'), list):
                 stage_info['ageRange'] = conv.get('range')
 
-    write_json(js, data)
 
-    # 寫出分割後的 per-species condition JSON
-    # 以 data 中 species keys 為準
-    for key in ('cat', 'dog', 'rabbit', 'hamster'):
-        out_conditions = data.get(key, {}).get('commonConditions', [])
-        out_path = js.parent / f'temp_conditions_{key}.json'
-        with out_path.open('w', encoding='utf-8') as f:
-            json.dump(out_conditions, f, ensure_ascii=False, indent=2)
-
-    # 將 breeds 依 species 切分輸出為 data/breeds_{key}.json
-    # 使用 pet_breeds_rows 作為來源（若有）
-    breeds_by_species = {}
-    for r in pet_breeds_rows:
-        sp = (r.get('物種') or '').strip()
-        if not sp:
-            continue
-        breeds_by_species.setdefault(sp, []).append(r)
+def write_tables(path: Path, data: Dict[str, Any], metrics: Metrics, precompress: bool = False) -> ArtifactResult:
+    """寫出預先計算的人類年齡 / 熱量查表（--tables）。"""
+    with metrics.stage('build_tables') as timing:
+        result = write_artifact(path, dumps_tables(build_lookup_tables(data)).encode('utf-8'), precompress=precompress)
+        timing.add_results([result])
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Update health-guidelines.json from CSVs')
+    parser.add_argument('--docs-dir', default='docs', help='CSV source directory (default: docs)')
+    parser.add_argument('--json', default='data/health-guidelines.json', help='Target JSON file')
+    parser.add_argument('--tables', help='Also write precomputed lookup tables to this path (not used by the site)')
+    parser.add_argument('--manifest', default='.build/health_manifest.json',
+                        help='Content-hash manifest for incremental rebuilds (default: .build/health_manifest.json)')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and rebuild every stage')
+    parser.add_argument('--workers', type=int, help='Threads used to serialize/write output files (default: CPU count)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write minified JSON plus precompressed .gz/.br siblings (.br needs the brotli package)')
+    parser.add_argument('--no-deltas', action='store_true',
+                        help='Do not emit JSON Patch deltas / the version pointer for the guidelines JSON')
+    parser.add_argument('--report', default='.build/build-report.json',
+                        help='Build report with raw/gzip/brotli sizes (default: .build/build-report.json)')
+    add_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with instrumented(args, 'update_health_json') as metrics:
+        return run(args, metrics)
+
 
-    # mapping chinese name -> key for file naming
-    name2key = {v.get('name'): k for k, v in data.items() if isinstance(v, dict) and 'name' in v}
-    for sp_name, rows in breeds_by_species.items():
-        key = name2key.get(sp_name)
-        fname = f'temp_breeds_{key or slugify(sp_name)}.json'
-        out_path = js.parent / fname
-        with out_path.open('w', encoding='utf-8') as f:
-            json.dump(rows, f, ensure_ascii=False, indent=2)
+def run(args: argparse.Namespace, metrics: Metrics = NULL_METRICS, data: Optional[Dict[str, Any]] = None) -> int:
+    """執行更新；data 為已解析的 --json 內容時直接就地更新它（不再讀檔），
+    呼叫端之後可沿用同一個物件（與寫出的 JSON 內容相同）。"""
+    docs = Path(args.docs_dir)
+    js = Path(args.json)
+    if not js.exists():
+        print(f"[ERROR] JSON not found: {js}")
+        return 2
 
+    with metrics.stage('plan'):
+        manifest = BuildManifest(Path(args.manifest))
+        input_hashes = {name: sha256_file(docs / name) for name in STAGE_INPUTS.values()}
+        output_format = 'compact' if args.compact else 'pretty'
+        stale = manifest.stale_stages() if manifest.valid else set()
+        # JSON 被手動修改、輸出格式改變（或沒有可用的 manifest）時，所有階段都需重跑
+        full = (args.force or not manifest.valid or 'guidelines' in stale
+                or manifest.input_changed(OUTPUT_FORMAT_KEY, output_format))
+        dirty = {
+            stage for stage, name in STAGE_INPUTS.items()
+            if full or stage in stale or manifest.input_changed(name, input_hashes[name])
+        }
+    if args.compact and brotli is None:
+        print("[WARN] brotli not installed; skipping .br outputs (pip install brotli)")
+    if not dirty:
+        print("No changes: all CSV inputs and outputs match the manifest.")
+        if args.tables:
+            # 查表不在 manifest 中追蹤：每次都由目前的 JSON 產生，內容沒變時不會重寫
+            write_tables(Path(args.tables), data if data is not None else load_json(js), metrics, args.compact)
+        return 0
+
+    previous = None
+    if not args.no_deltas:
+        # data 會被就地更新；先保留上一版的位元組，內容有變時才解析、產生 delta
+        with metrics.stage('load_previous'):
+            previous = js.read_bytes()
+    if data is None:
+        with metrics.stage('load_json') as timing:
+            timing.add_rows(1)
+            data = load_json(js)
+
+    counts = {stage: 0 for stage in STAGE_INPUTS}
+    # 將 breeds 依 species 切分（供 temp_breeds_* 輸出），在 update_hamster_breeds 讀取的同一趟收集
+    breeds_by_species: Dict[str, List[Dict[str, Any]]] = {}
+
+    def collect_breeds(rows: Iterable[CsvRow]) -> Iterator[CsvRow]:
+        for r in rows:
+            sp = (r.get('物種') or '').strip()
+            if sp:
+                breeds_by_species.setdefault(sp, []).append(r.to_dict())
+            yield r
+
+    # CSV 為串流讀取，讀檔與更新交錯進行，兩者計入同一個 update_* 階段；rows 為讀到的列數
+    if 'life_stages' in dirty:
+        with metrics.stage('update_life_stages') as timing:
+            rows = timing.iter(read_csv(docs / STAGE_INPUTS['life_stages']))
+            counts['life_stages'] = update_life_stages(data, rows)
+    if 'conditions' in dirty:
+        with metrics.stage('update_conditions') as timing:
+            rows = timing.iter(read_csv(docs / STAGE_INPUTS['conditions']))
+            counts['conditions'] = update_conditions(data, rows)
+    if 'hamster_breeds' in dirty:
+        with metrics.stage('update_hamster_breeds') as timing:
+            pet_breeds_rows = collect_breeds(timing.iter(read_csv(docs / STAGE_INPUTS['hamster_breeds'])))
+            counts['hamster_breeds'] = update_hamster_breeds(data, pet_breeds_rows)
+            for _ in pet_breeds_rows:  # update_hamster_breeds 可能提早返回；確保所有列都被收集
+                pass
+    if 'options' in dirty:
+        with metrics.stage('update_options') as timing:
+            rows = timing.iter(read_csv(docs / STAGE_INPUTS['options']))
+            counts['options'] = update_activity_body_options(data, rows)
+
+    with metrics.stage('backfill_age_ranges'):
+        backfill_age_ranges(data)
+
+    outputs: List[tuple] = [('guidelines', js, data)]
+
+    # 寫出分割後的 per-species condition JSON
+    # 以 data 中 species keys 為準
+    if 'conditions' in dirty:
+        for key in ('cat', 'dog', 'rabbit', 'hamster'):
+            out_conditions = data.get(key, {}).get('commonConditions', [])
+            outputs.append(('conditions', js.parent / f'temp_conditions_{key}.json', out_conditions))
+
+    # 將 breeds 依 species 切分輸出為 data/temp_breeds_{key}.json
+    if 'hamster_breeds' in dirty:
+        # mapping chinese name -> key for file naming
+        name2key = {v.get('name'): k for k, v in data.items() if isinstance(v, dict) and 'name' in v}
+        for sp_name, rows in breeds_by_species.items():
+            key = name2key.get(sp_name)
+            fname = f'temp_breeds_{key or slugify(sp_name)}.json'
+            outputs.append(('hamster_breeds', js.parent / fname, rows))
+
+    for stage in {stage for stage, _, _ in outputs}:
+        manifest.forget_stage(stage)
+    serializer = dumps_json_compact if args.compact else dumps_json
+    with metrics.stage('write_json') as timing:
+        timing.add_rows(len(outputs))
+        results = manifest.write_outputs(outputs, workers=args.workers, serializer=serializer,
+                                         precompress=args.compact)
+        timing.add_results(results)
+    if not args.no_deltas:
+        with metrics.stage('write_delta') as timing:
+            # results[0] 為 --json 本身（outputs 的第一項）
+            delta_results = write_delta(previous, data, results[0], serializer=serializer,
+                                        precompress=args.compact)
+            timing.add_results(delta_results)
+    else:
+        delta_results = []
+    # 只計算 outputs 本身；delta、版本指標與查表另外列入建置報告
+    written = [r.path for r in results if r.written]
+    results = results + delta_results
+    if args.tables:
+        results.append(write_tables(Path(args.tables), data, metrics, args.compact))
+    with metrics.stage('save_manifest'):
+        for name, digest in input_hashes.items():
+            manifest.record_input(name, digest)
+        manifest.record_input(OUTPUT_FORMAT_KEY, output_format)
+        manifest.save()
+        totals = update_build_report(Path(args.report), results)
+
+    c1, c2, c3, c4 = (counts[s] for s in ('life_stages', 'conditions', 'hamster_breeds', 'options'))
     print(f"Updated life stages: {c1}, conditions upserts: {c2}, hamster breeds upserts: {c3}, options upserts: {c4}")
+    skipped = [stage for stage in STAGE_INPUTS if stage not in dirty]
+    if skipped:
+        print(f"Skipped unchanged stages: {', '.join(skipped)}")
+    print(f"Rewrote {len(written)}/{len(outputs)} outputs (unchanged files left untouched)")
+    if args.compact:
+        print(f"Sizes: {totals['bytes']} bytes raw, {totals['gzip']} gzip, {totals['brotli'] or '-'} brotli "
+              f"(report: {args.report})")
     return 0
 
 
@@ -4,25 +4,38 @@
 
 用法:
   python scripts/validate_and_convert_health_csv.py docs/health_conditions.csv docs/health_life_stages.csv
+  python scripts/validate_and_convert_health_csv.py --check            # 只驗證 docs/ 下所有 CSV，不輸出 JSON
 
 輸出:
     預設會輸出到 `data/`（或由 `--out-dir` 指定的目錄），產生 per-species JSON（例如 `data/conditions_cat.json`）。
 
 主要功能:
-  - 檢查標頭是否符合預期
-  - 檢查必要欄位是否為空
-  - 將 CSV 轉換為 JSON 陣列
+  - 依 csv_schemas.SCHEMAS 檢查標頭、必填、型別 / 範圍 / 列舉 / 格式、唯一鍵，
+    以及物種、門市、品種等跨檔參照（參照集合在開始前建好，以 hash set 查詢）
+  - 多個檔案以 process pool 同時處理
+  - 每個檔案最多保留 --max-errors 則錯誤訊息，其餘只計數，錯誤再多記憶體用量也不變
+  - 將 CSV 轉換為 JSON 陣列（逐列串流讀寫，記憶體用量與檔案大小無關）
+  - --profile / --metrics-out：參照建立與各檔案（check/{檔名}、convert/{檔名}）的時間、記憶體峰值、
+    列數與寫出位元組；各檔案的階段在 process pool 子行程中量測後併入報告
 """
 from __future__ import annotations
 
 import argparse
-import csv
 import json
-import sys
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
-import re
+from csv_schemas import SCHEMAS, References, build_references, compile_schema, iter_errors
+from instrumentation import Metrics, add_arguments, instrumented
+from stream_io import CsvStream, JsonArrayWriter
+
+GUIDELINES_PATH = 'data/health-guidelines.json'
+STORES_CSV = 'mapping/PetStores_BranchInfo.csv'
+# 每個檔案保留的錯誤訊息上限（超過的只計數）
+MAX_ERRORS = 100
 
 
 def slugify(s: str) -> str:
@@ -32,138 +45,236 @@ def slugify(s: str) -> str:
     return s or 'unknown'
 
 
-EXPECTED_SCHEMAS = {
-    "health_conditions.csv": ["物種", "疾病項目", "飲食注意", "專家叮嚀"],
-    "health_life_stages.csv": [
-        "物種",
-        "階段",
-        "對應人類年齡",
-        "建議健檢頻率",
-        "照護重點",
-        "常見問題",
-    ],
-}
+# 指定目錄時預設轉換的檔案（--check 時則驗證目錄下所有 CSV）
+DEFAULT_FILES = ("health_conditions.csv", "health_life_stages.csv")
 
 
-def validate_and_load(path: Path) -> Tuple[List[Dict[str, Any]], List[str]]:
-    errors: List[str] = []
-    rows: List[Dict[str, Any]] = []
+class ErrorLog:
+    """每個檔案的錯誤訊息：最多保留 limit 則，其餘只計數。"""
 
+    def __init__(self, limit: int = MAX_ERRORS):
+        self.limit = limit
+        self.messages: List[str] = []
+        self.count = 0
+
+    def append(self, message: str) -> None:
+        self.count += 1
+        if len(self.messages) < self.limit:
+            self.messages.append(message)
+
+    def summary(self) -> List[str]:
+        hidden = self.count - len(self.messages)
+        return self.messages + ([f"……另有 {hidden} 個錯誤未列出"] if hidden else [])
+
+
+def iter_validated(path: Path, errors, refs: Optional[References] = None) -> Iterator[Dict[str, Any]]:
+    """逐列驗證並產生清理後的 dict；錯誤訊息附加到 errors（list 或 ErrorLog）。不會一次載入整份檔案。"""
     if not path.exists():
         errors.append(f"檔案不存在: {path}")
-        return rows, errors
-
-    expected = EXPECTED_SCHEMAS.get(path.name)
+        return
 
-    with path.open("r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames is None:
+    with CsvStream(path) as stream:
+        if stream.fieldnames is None:
             errors.append(f"無法讀取標頭: {path}")
-            return rows, errors
-
-        # 標頭檢查
-        fieldnames = [h.strip() for h in reader.fieldnames]
-        if expected:
-            missing = [h for h in expected if h not in fieldnames]
-            extra = [h for h in fieldnames if h not in expected]
-            if missing:
-                errors.append(f"{path.name} 缺少欄位: {missing}")
-            if extra:
-                # 只是警告，不當作致命錯誤
-                errors.append(f"{path.name} 有額外欄位: {extra}")
-
-        # 逐列檢查必要欄位是否為空
-        for i, r in enumerate(reader, start=2):
-            clean = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in r.items()}
+            return
+
+        compiled = compile_schema(path.name, stream.fieldnames, refs or {})
+        rows = iter(stream)
+        if compiled is not None:
+            for e in compiled.header_errors:
+                errors.append(str(e))
+            for _ in range(compiled.schema.skip_rows):
+                next(rows, None)
+
+        for row in rows:
             # 忽略全空列
-            if all((v == "" or v is None) for v in clean.values()):
+            if row.is_blank():
                 continue
+            if compiled is not None:
+                for e in compiled.validate(row.line, row.cells()):
+                    errors.append(str(e))
+            yield row.to_dict()
 
-            # 檢查重要欄位存在且非空（若有 schema，則檢查 schema 中的前兩個欄位）
-            if expected:
-                for req in expected[:2]:
-                    if not clean.get(req):
-                        errors.append(f"{path.name} 第{i}列: 欄位 '{req}' 不可為空")
-
-            rows.append(clean)
 
+def validate_and_load(path: Path) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """一次載入版本（相容既有呼叫端）；大型檔案請改用 iter_validated。"""
+    errors: List[str] = []
+    rows = list(iter_validated(path, errors))
     return rows, errors
 
 
-def write_json(path: Path, data: List[Dict[str, Any]]) -> None:
-    out = path.with_suffix(".json")
-    with out.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def stream_to_json(path: Path, rows: Iterable[Dict[str, Any]]) -> int:
+    """逐列寫出 JSON 陣列，回傳筆數；沒有任何列時不建立檔案。"""
+    with JsonArrayWriter(path.with_suffix(".json")) as writer:
+        for r in rows:
+            writer.append(r)
+    return writer.count
+
+
+def load_species_keys(hg_path: Path) -> Dict[str, str]:
+    """讀取 health-guidelines.json 的物種名稱 → key 對照；讀取失敗時回傳空 dict。"""
+    if not hg_path.exists():
+        return {}
+    try:
+        with hg_path.open('r', encoding='utf-8') as f:
+            hg = json.load(f)
+        return {v.get('name'): k for k, v in hg.items() if isinstance(v, dict) and 'name' in v}
+    except Exception:
+        return {}
+
+
+def split_conditions_by_species(rows: Iterable[Dict[str, Any]], out_dir: Path,
+                                name2key: Dict[str, str]) -> List[Path]:
+    """將疾病列依物種串流寫到 temp_conditions_{key}.json，並同時寫出 temp_conditions_all.json。"""
+    writers: Dict[str, JsonArrayWriter] = {}
+    combined = JsonArrayWriter(out_dir / 'temp_conditions_all.json')
+    try:
+        for r in rows:
+            sp = (r.get('物種') or '').strip() or 'unknown'
+            writer = writers.get(sp)
+            if writer is None:
+                key = name2key.get(sp)
+                writer = writers[sp] = JsonArrayWriter(out_dir / f"temp_conditions_{key or slugify(sp)}.json")
+            writer.append(r)
+            combined.append(r)
+    except BaseException:
+        for writer in [*writers.values(), combined]:
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.close()
+    combined.close()
+    outputs = [w.path for w in writers.values()]
+    if combined.count:
+        outputs.append(combined.path)
+    return outputs
+
+
+class FileReport(NamedTuple):
+    path: Path
+    error_count: int
+    messages: List[str]
+    outputs: List[Path]
+    # profile=True 時此檔案的量測階段（instrumentation 的 records()），由主行程併入報告
+    stages: Tuple[Dict[str, Any], ...] = ()
+
+
+def check_file(path: Path, refs: References, max_errors: int, profile: bool = False) -> FileReport:
+    """只驗證、不輸出；錯誤邊讀邊計數，只保留前 max_errors 則。"""
+    errors = ErrorLog(max_errors)
+    metrics = Metrics(enabled=profile, trace_memory=profile)
+    with metrics.stage(f'check/{path.name}') as timing:
+        stats: Dict[str, int] = {}
+        for e in iter_errors(path, refs, stats=stats):
+            errors.append(str(e))
+        timing.add_rows(stats.get('rows', 0))
+    metrics.close()
+    return FileReport(path, errors.count, errors.summary(), [], tuple(metrics.records()))
+
+
+def convert_file(path: Path, out_dir: Path, refs: References, name2key: Dict[str, str],
+                 max_errors: int, split: bool = True, profile: bool = False) -> FileReport:
+    """驗證並輸出 JSON；split 時 health_conditions.csv 依物種拆分（目錄模式則整份輸出，與舊行為相同）。"""
+    errors = ErrorLog(max_errors)
+    metrics = Metrics(enabled=profile, trace_memory=profile)
+    with metrics.stage(f'convert/{path.name}') as timing:
+        rows = timing.iter(iter_validated(path, errors, refs))
+        if split and path.name == 'health_conditions.csv':
+            # 拆分為每個物種的 JSON（嘗試以 data/health-guidelines.json 的 species key 命名），
+            # 並同時輸出合併檔（intermediate，相容用）
+            outputs = split_conditions_by_species(rows, out_dir, name2key)
+        else:
+            outpath = out_dir / path.name
+            outputs = [outpath.with_suffix('.json')] if stream_to_json(outpath, rows) else []
+        for outpath in outputs:
+            timing.add_file(outpath)
+    metrics.close()
+    return FileReport(path, errors.count, errors.summary(), outputs, tuple(metrics.records()))
+
+
+def _run_job(job: Tuple[Any, ...]) -> FileReport:
+    # process pool 的進入點（需為模組層級函式才能 pickle）
+    if job[0] == 'check':
+        return check_file(*job[1:])
+    return convert_file(*job[1:])
+
+
+def run_jobs(jobs: List[Tuple[Any, ...]], workers: int) -> Iterator[FileReport]:
+    """依輸入順序產生各檔結果；workers > 1 時以 process pool 同時處理。"""
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(_run_job, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_run_job, jobs)
+
+
+def resolve_files(inputs: Iterable[str], check: bool) -> List[Tuple[Path, bool]]:
+    """展開目錄：--check 時取目錄下所有 CSV，否則只取預設檔名。回傳 (路徑, 是否為直接指定的檔案)。"""
+    files: List[Tuple[Path, bool]] = []
+    for p in inputs:
+        path = Path(p)
+        if not path.is_dir():
+            files.append((path, True))
+        elif check:
+            files.extend((f, False) for f in sorted(path.glob('*.csv')))
+        else:
+            files.extend((path / name, False) for name in DEFAULT_FILES if (path / name).exists())
+    return files
 
 
 def main(argv: List[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="驗證並轉換健康 CSV 為 JSON")
-    parser.add_argument("files", nargs="+", help="要處理的 CSV 檔案，或目錄（會自動尋找預設檔名）")
+    parser.add_argument("files", nargs="*", help="要處理的 CSV 檔案，或目錄（會自動尋找預設檔名；--check 時預設為 docs）")
     parser.add_argument("--out-dir", "-o", default="docs", help="輸出 JSON 的目錄（預設: docs）")
+    parser.add_argument("--check", action="store_true", help="只驗證，不輸出 JSON（目錄會驗證其中所有 CSV）")
+    parser.add_argument("--workers", type=int, help="同時處理的檔案數（預設: CPU 數；1 = 依序處理）")
+    parser.add_argument("--max-errors", type=int, default=MAX_ERRORS,
+                        help=f"每個檔案最多列出的錯誤數（預設: {MAX_ERRORS}）")
+    parser.add_argument("--guidelines", default=GUIDELINES_PATH, help=f"物種參照來源（預設: {GUIDELINES_PATH}）")
+    parser.add_argument("--stores", default=STORES_CSV, help=f"門市參照來源（預設: {STORES_CSV}）")
+    add_arguments(parser)
     args = parser.parse_args(argv)
+    if not args.files and not args.check:
+        parser.error("請指定要處理的 CSV 檔案或目錄")
+    with instrumented(args, 'validate_and_convert_health_csv') as metrics:
+        return run(args, metrics)
+
+
+def run(args: argparse.Namespace, metrics: Metrics) -> int:
+    files = resolve_files(args.files or ["docs"], args.check)
+    docs_dirs = {p.parent for p, _ in files} or {Path("docs")}
+    refs: References = {}
+    with metrics.stage('build_references'):
+        for docs_dir in sorted(docs_dirs):
+            found, notes = build_references(docs_dir, Path(args.guidelines), Path(args.stores))
+            refs.update(found)
+            for note in notes:
+                print("提示:", note)
 
-    total_errors = 0
     out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    for p in args.files:
-        path = Path(p)
-        # 若是目錄，嘗試找預設檔名
-        if path.is_dir():
-            for name in EXPECTED_SCHEMAS.keys():
-                candidate = path / name
-                if candidate.exists():
-                    rows, errs = validate_and_load(candidate)
-                    for e in errs:
-                        print("警告:", e)
-                    if rows:
-                        outpath = out_dir / candidate.name
-                        outpath = outpath.with_suffix('.json')
-                        write_json(outpath, rows)
-                        print(f"已輸出: {outpath}")
-                    total_errors += len(errs)
-            continue
-
-        rows, errs = validate_and_load(path)
-        for e in errs:
+    if args.check:
+        # 沒有 schema 的檔案沒有可檢查的規則，明確列為略過而不是回報通過
+        unknown = [p for p, _ in files if p.exists() and p.name not in SCHEMAS]
+        if unknown:
+            print("提示: 沒有 schema，略過不檢查:", [p.name for p in unknown])
+        jobs = [('check', p, refs, args.max_errors, metrics.enabled) for p, _ in files if p not in unknown]
+    else:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        name2key = load_species_keys(Path(args.guidelines))
+        jobs = [('convert', p, out_dir, refs, name2key, args.max_errors, explicit, metrics.enabled)
+                for p, explicit in files]
+
+    # 依輸入順序輸出；各檔在 process pool 中同時處理
+    total_errors = 0
+    for report in run_jobs(jobs, args.workers or min(len(jobs), os.cpu_count() or 1)):
+        metrics.extend(report.stages)
+        for e in report.messages:
             print("警告:", e)
-        if rows:
-            if path.name == 'health_conditions.csv':
-                # 拆分為每個物種的 JSON（嘗試以 data/health-guidelines.json 的 species key 命名）
-                hg_path = Path('data/health-guidelines.json')
-                name2key = {}
-                if hg_path.exists():
-                    try:
-                        with hg_path.open('r', encoding='utf-8') as f:
-                            hg = json.load(f)
-                            name2key = {v.get('name'): k for k, v in hg.items() if isinstance(v, dict) and 'name' in v}
-                    except Exception:
-                        name2key = {}
-
-                # group rows by species name
-                groups: Dict[str, List[Dict[str, Any]]] = {}
-                for r in rows:
-                    sp = (r.get('物種') or '').strip()
-                    groups.setdefault(sp or 'unknown', []).append(r)
-
-                # write per-species files
-                for sp, items in groups.items():
-                    key = name2key.get(sp)
-                    fname = f"temp_conditions_{key or slugify(sp)}.json"
-                    outpath = out_dir / fname
-                    write_json(outpath, items)
-                    print(f"已輸出: {outpath}")
-
-                # also write combined file for compatibility (intermediate)
-                combined = out_dir / 'temp_conditions_all.json'
-                write_json(combined, rows)
-                print(f"已輸出: {combined}")
-            else:
-                outpath = out_dir / path.name
-                outpath = outpath.with_suffix('.json')
-                write_json(outpath, rows)
-                print(f"已輸出: {outpath}")
-        total_errors += len(errs)
+        for outpath in report.outputs:
+            print(f"已輸出: {outpath}")
+        if args.check and not report.error_count:
+            print(f"通過: {report.path}")
+        total_errors += report.error_count
 
     if total_errors:
         print(f"處理完成但有 {total_errors} 個警告/錯誤（請檢查輸出訊息）")
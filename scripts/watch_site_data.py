@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+監看模式：常駐執行，docs/*.csv、門市 CSV、branches.yaml 等輸入一改就只重建受影響的階段。
+
+用法：
+  python scripts/watch_site_data.py                  # 先補建一次過期的階段，之後監看
+  python scripts/watch_site_data.py --poll           # 強制使用輪詢（網路磁碟、WSL 掛載的 Windows 路徑等）
+  python scripts/watch_site_data.py --debounce 0.3   # 最後一次變動後靜止 0.3 秒才建置
+
+行為：
+  - 階段、輸入與略過判斷沿用 build_site_data.py 的 STAGES 與 .build/site-data-manifest.json，
+    與一般建置共用紀錄；改了 health_conditions.csv 只跑 health 組（update_health_json 內部
+    也只重跑 update_conditions），改了門市 CSV 只跑 stores 組（csv_to_json、store_catalog）
+  - 變動偵測：Linux 以 ctypes 呼叫 inotify 監看輸入所在的目錄（編輯器以「寫暫存檔再改名」存檔也收得到）；
+    其他平台或 inotify 無法使用時改為每 --interval 秒比對一次 (大小, mtime)
+  - 防抖：收到第一個變動後，等到連續 --debounce 秒沒有新變動（最多等 --max-wait 秒）才建置，
+    一次存多個檔或編輯器連續寫入只觸發一次
+  - 常駐狀態：各腳本模組只 import 一次，health-guidelines.json 的解析結果與輸入檔雜湊跨建置保留
+    （以大小、mtime 判斷是否失效），建置在本行程中依序執行，省去每次冷啟動
+  - 建置自己寫出的檔案（例如 health-guidelines.json、由 JSON 匯出的 docs/*.csv）仍會收到變動，
+    但各階段以內容雜湊判斷是否過期（build_site_data.is_fresh），內容與紀錄一致時全部略過、不印出任何訊息；
+    建置期間存檔的編輯雜湊與紀錄不同，下一輪一定會重建
+  - 階段失敗時印出錯誤並繼續監看，修正輸入後會再重試；Ctrl+C 結束
+"""
+from __future__ import annotations
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from build_site_data import (MANIFEST_PATH, REPO_ROOT, STAGES, Options, SharedInputs, Stage, expand, group_plan,
+                             load_records, merge_reports, print_outcome, run_group, save_records,
+                             settle_upstream)
+from instrumentation import NULL_METRICS, Metrics, add_arguments, instrumented
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC if hasattr(os, 'O_CLOEXEC') else 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# 事件佇列溢位等無法得知哪些檔案變動時回傳的標記：視同所有輸入都可能改變
+ALL = '*'
+
+Stamp = Optional[Tuple[int, int]]
+
+
+def input_patterns() -> List[str]:
+    return sorted({pattern for stage in STAGES for pattern in stage.inputs})
+
+
+def watch_dirs(patterns: List[str]) -> List[str]:
+    """輸入所在的目錄（glob 只出現在檔名部分）。"""
+    return sorted({os.path.dirname(pattern) or '.' for pattern in patterns})
+
+
+def stamp(path: str) -> Stamp:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def snapshot(patterns: List[str]) -> Dict[str, Stamp]:
+    return {path: stamp(path) for path in expand(patterns)}
+
+
+class InotifyWatcher:
+    """以 ctypes 呼叫 Linux inotify，監看各輸入目錄中的檔案變動。"""
+
+    def __init__(self, dirs: List[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify 不可用')
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失敗')
+        self._dirs: Dict[int, str] = {}
+        for directory in dirs:
+            if not os.path.isdir(directory):
+                continue
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                self.close()
+                raise OSError(err, f'inotify_add_watch 失敗：{directory}')
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """等到有變動（或逾時）為止，回傳變動的路徑（相對於專案根目錄）。"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed: Set[str] = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(ALL)
+                elif wd in self._dirs and name:
+                    changed.add(f'{self._dirs[wd]}/{os.fsdecode(name)}')
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """每隔 interval 秒比對輸入檔的 (大小, mtime)；新增、刪除的檔案也算變動。"""
+
+    def __init__(self, patterns: List[str], interval: float):
+        self.patterns = patterns
+        self.interval = interval
+        self._last = snapshot(patterns)
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = snapshot(self.patterns)
+            changed = {path for path in current.keys() | self._last.keys()
+                       if current.get(path) != self._last.get(path)}
+            self._last = current
+            if changed:
+                return changed
+            if deadline is None:
+                time.sleep(self.interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            time.sleep(min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(patterns: List[str], poll: bool, interval: float):
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(watch_dirs(patterns))
+        except OSError as e:
+            print(f'⚠️ 無法使用 inotify（{e}），改用輪詢', file=sys.stderr)
+    return PollingWatcher(patterns, interval)
+
+
+def collect(watcher, debounce: float, max_wait: float) -> Set[str]:
+    """等第一個變動，再等到連續 debounce 秒沒有新變動（最多 max_wait 秒），回傳期間所有變動的路徑。"""
+    changed = watcher.wait(None)
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = min(debounce, deadline - time.monotonic())
+        if remaining <= 0:
+            return changed
+        more = watcher.wait(remaining)
+        if not more:
+            return changed
+        changed |= more
+
+
+def affected_stages(paths: Set[str]) -> List[Stage]:
+    """輸入符合變動路徑的階段與其所有下游，依 STAGES 的順序。"""
+    hit = {stage.name for stage in STAGES
+           if ALL in paths or any(fnmatch.fnmatch(path, pattern) for path in paths for pattern in stage.inputs)}
+    for stage in STAGES:  # deps 只指向前面的階段，依序走一次即可涵蓋所有下游
+        if any(dep in hit for dep in stage.deps):
+            hit.add(stage.name)
+    return [stage for stage in STAGES if stage.name in hit]
+
+
+class WatchSession:
+    """跨建置保留的狀態：階段紀錄、解析過的 JSON 與檔案雜湊。"""
+
+    def __init__(self, options: Options, manifest_path: Path, quiet: bool, metrics: Metrics = NULL_METRICS):
+        self.options = options
+        self.metrics = metrics
+        self.manifest_path = manifest_path
+        self.quiet = quiet
+        self.records = load_records(manifest_path)
+        self.shared = SharedInputs()
+        self.patterns = input_patterns()
+
+    def build(self, stages: List[Stage], changed: Optional[Set[str]] = None) -> bool:
+        """建置 stages 中過期的階段；changed 為觸發這次建置的變動，有階段實際執行時才印出。"""
+        start = time.perf_counter()
+        outcomes = []
+        failed: Set[str] = set()
+        for names in group_plan(stages).values():
+            for o in run_group(names, self.records, self.options, failed, self.shared):
+                outcomes.append(o)
+                self.metrics.extend(o['metrics'])
+                if o['status'] == 'ran':
+                    self.records[o['stage']] = o['record']
+                    settle_upstream(self.records, o['stage'])
+                elif o['status'] == 'failed':
+                    self.records.pop(o['stage'], None)
+                if o['status'] in ('failed', 'blocked'):
+                    failed.add(o['stage'])
+        save_records(self.manifest_path, self.records)
+        merge_reports(outcomes)
+        if all(o['status'] == 'skipped' for o in outcomes):
+            return True
+        if changed and not self.quiet:
+            shown = ', '.join(sorted(changed)[:5]) + (' …' if len(changed) > 5 else '')
+            print(f'🔄 變動：{shown}', flush=True)
+        for o in outcomes:
+            if o['status'] != 'skipped':
+                print_outcome(o, self.quiet)
+        mark = '❌' if failed else '✅'
+        ran = sum(o['status'] == 'ran' for o in outcomes)
+        print(f'{mark} [{datetime.now():%H:%M:%S}] 執行 {ran} 個階段；耗時 {time.perf_counter() - start:.2f}s',
+              flush=True)
+        return not failed
+
+
+def watch(session: WatchSession, watcher, debounce: float, max_wait: float) -> None:
+    while True:
+        changed = collect(watcher, debounce, max_wait)
+        stages = affected_stages(changed)
+        if stages:
+            session.build(stages, changed)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='監看輸入檔，變動時只重建受影響的網站資料')
+    parser.add_argument('--debounce', type=float, default=0.2, help='最後一次變動後靜止多少秒才建置（預設: 0.2）')
+    parser.add_argument('--max-wait', type=float, default=2.0,
+                        help='持續有變動時，最多延後建置多少秒（預設: 2）')
+    parser.add_argument('--poll', action='store_true', help='不使用 inotify，改以輪詢偵測變動')
+    parser.add_argument('--interval', type=float, default=0.5, help='輪詢間隔秒數（預設: 0.5）')
+    parser.add_argument('--compact', action='store_true', help='JSON 以緊湊格式輸出，並產生 .gz / .br 預壓縮檔')
+    parser.add_argument('--holiday-year', type=int,
+                        help='春節營運時間 CSV 日期標頭未標年份時使用的年份')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help=f'階段紀錄路徑（預設: {MANIFEST_PATH}）')
+    parser.add_argument('--root', default=str(REPO_ROOT), help='專案根目錄（預設: 本腳本的上一層）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不印出各階段的輸出訊息')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    os.chdir(args.root)
+    options = Options(False, args.compact, args.holiday_year, bool(args.profile or args.metrics_out), None)
+    # 先建立 watcher 再補建，補建期間的編輯不會漏掉
+    watcher = create_watcher(input_patterns(), args.poll, args.interval)
+    # --profile / --metrics-out：累計整段監看期間每次建置的各階段量測，結束監看時印出 / 寫出
+    with instrumented(args, 'watch_site_data') as metrics:
+        session = WatchSession(options, Path(args.manifest), args.quiet, metrics)
+        try:
+            print('🔧 補建過期的階段…', flush=True)
+            session.build(list(STAGES))
+            kind = '輪詢' if isinstance(watcher, PollingWatcher) else 'inotify'
+            print(f"👀 監看中（{kind}）：{', '.join(watch_dirs(session.patterns))}；Ctrl+C 結束", flush=True)
+            watch(session, watcher, args.debounce, args.max_wait)
+        except KeyboardInterrupt:
+            print('\n結束監看')
+        finally:
+            watcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())